@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Les requêtes HTTP vont à Django ; les connexions WebSocket (/ws/shopping-lists/<id>/)
+et les flux SSE (/shopping-lists/<id>/events/) au flux temps réel des listes (core.live),
+sans couche supplémentaire : un flux ouvert ne tient aucun thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -13,4 +17,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Après get_asgi_application() : les applications Django sont chargées
+from core.live import EVENTS_PATH, list_events, list_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        return await list_websocket(scope, receive, send)
+    if scope["type"] == "http" and EVENTS_PATH.match(scope["path"]):
+        return await list_events(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -38,13 +38,18 @@ CSRF_TRUSTED_ORIGINS = ["https://coursesapp.upidev.com"]
 # =========================================================
 
 INSTALLED_APPS = [
+    # En tête : remplace runserver par le serveur ASGI daphne (WebSocket et SSE, cf. config/asgi.py)
+    "daphne",
+
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-   
+
+    "rest_framework",
+
     "core.apps.CoreConfig",
 ]
 
@@ -56,7 +61,8 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
 
     # ✅ WhiteNoise: sert les static en prod (et gère cache + compression)
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Variante async (cf. core/middleware.py) : les vues async restent dans la boucle ASGI
+    "core.middleware.AsyncWhiteNoiseMiddleware",
 
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -72,6 +78,7 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "config.urls"
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
 
 # =========================================================
 # TEMPLATES
@@ -109,6 +116,38 @@ DATABASES = {
     }
 }
 
+# =========================================================
+# CACHE
+# =========================================================
+
+# Local-memory par défaut : un cache par processus. Avec plusieurs processus,
+# configurer un backend partagé (Redis, Memcached, DatabaseCache) pour que les
+# invalidations (ex: appartenance aux foyers) soient vues par tous ; sinon le cache
+# d'appartenance n'est gardé que quelques secondes (cf. core/membership_cache.py,
+# avertissement core.W001 de manage.py check --deploy).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "courses-app",
+    }
+}
+
+# =========================================================
+# API (Django REST framework)
+# =========================================================
+
+# Session (même connexion que le site) ; pagination par curseur sur les collections
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": ["rest_framework.authentication.SessionAuthentication"],
+    "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.ApiCursorPagination",
+    "DEFAULT_RENDERER_CLASSES": [
+        "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "COERCE_DECIMAL_TO_STRING": True,
+}
+
 # =========================================================
 # AUTH PASSWORD VALIDATION
 # =========================================================
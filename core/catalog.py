@@ -0,0 +1,814 @@
+"""
+Import de catalogue (ReferenceItem) par lots.
+
+Le moteur précharge une seule fois le catalogue existant du foyer dans un
+dictionnaire indexé par nom, puis écrit les créations / mises à jour par lots
+(bulk_create / bulk_update), chaque lot dans sa propre transaction courte.
+
+Les lecteurs (JSON {"items": [...]}, NDJSON, CSV) sont en flux : le fichier
+n'est jamais chargé entièrement en mémoire.
+
+Pour plusieurs foyers, le fichier est lu une seule fois puis l'import de chaque
+foyer est réparti sur un pool de processus (une connexion DB par processus).
+
+Sur PostgreSQL, le mode rapide (fast=True) envoie les lignes par COPY dans une
+table temporaire puis fusionne avec un seul INSERT ... ON CONFLICT.
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, TextIO
+
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Household, ReferenceItem, UNIT_UNIT, reference_content_hash
+
+DEFAULT_BATCH_SIZE = 1000
+
+FORMAT_JSON = "json"
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+FORMATS = [FORMAT_JSON, FORMAT_NDJSON, FORMAT_CSV]
+
+_READ_SIZE = 64 * 1024
+
+# Champs écrits par l'import lors d'une mise à jour (un produit archivé présent dans le fichier est réactivé)
+UPDATE_FIELDS = ["aisle", "default_unit", "default_qty_value", "default_note", "default_unit_price", "is_active"]
+
+
+class CatalogFormatError(ValueError):
+    pass
+
+
+class ImportResult(NamedTuple):
+    household_id: int
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deactivated: int = 0
+    deleted: int = 0
+    rows: int = 0
+    skipped: bool = False
+    diff: dict[str, list[str]] | None = None
+    error: str = ""
+
+
+def _dec(x) -> Decimal | None:
+    # Les exports CSV français utilisent la virgule décimale
+    return None if x is None or x == "" else Decimal(str(x).strip().replace(",", "."))
+
+
+def normalize_row(raw: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    Normalise une entrée brute du fichier. Retourne None si l'entrée n'a pas de nom.
+    """
+    name = (raw.get("name") or "").strip()
+    if not name:
+        return None
+    return {
+        "name": name,
+        "aisle": raw.get("aisle") or ReferenceItem.AISLE_AL_FRUITS_VEG,
+        "default_unit": raw.get("default_unit") or UNIT_UNIT,
+        "default_unit_price": _dec(raw.get("default_unit_price")),
+        "default_qty_value": _dec(raw.get("default_qty_value")),
+        "default_note": raw.get("default_note") or "",
+    }
+
+
+def apply_row(obj: ReferenceItem, row: dict[str, Any], *, overwrite_price: bool) -> bool:
+    """
+    Applique les règles de mise à jour de l'import sur un item existant.
+    Retourne True si l'objet a été modifié.
+    """
+    dirty = False
+
+    if obj.aisle != row["aisle"]:
+        obj.aisle = row["aisle"]
+        dirty = True
+    if obj.default_unit != row["default_unit"]:
+        obj.default_unit = row["default_unit"]
+        dirty = True
+
+    qty_value = row["default_qty_value"]
+    if qty_value is not None and obj.default_qty_value != qty_value:
+        obj.default_qty_value = qty_value
+        dirty = True
+
+    note = row["default_note"]
+    if note and obj.default_note != note:
+        obj.default_note = note
+        dirty = True
+
+    unit_price = row["default_unit_price"]
+    if unit_price is not None:
+        if overwrite_price or obj.default_unit_price is None:
+            if obj.default_unit_price != unit_price:
+                obj.default_unit_price = unit_price
+                dirty = True
+
+    return dirty
+
+
+# =========================================================
+# Lecteurs en flux
+# =========================================================
+def detect_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in (".ndjson", ".jsonl"):
+        return FORMAT_NDJSON
+    if suffix == ".csv":
+        return FORMAT_CSV
+    return FORMAT_JSON
+
+
+def iter_catalog_rows(path: Path, fmt: str | None = None) -> Iterator[dict[str, Any]]:
+    """
+    Itère les entrées brutes (dict) d'un fichier catalogue, sans le charger en entier.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == FORMAT_CSV:
+        with path.open(encoding="utf-8-sig", newline="") as fp:
+            yield from _iter_csv(fp)
+    elif fmt == FORMAT_NDJSON:
+        with path.open(encoding="utf-8") as fp:
+            yield from _iter_ndjson(fp)
+    else:
+        with path.open(encoding="utf-8") as fp:
+            yield from _JsonItemsStream(fp)
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    it = iter(iterable)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _iter_ndjson(fp: TextIO) -> Iterator[dict[str, Any]]:
+    for lineno, line in enumerate(fp, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise CatalogFormatError(f"NDJSON invalide ligne {lineno}: {e.msg}") from e
+        if not isinstance(obj, dict):
+            raise CatalogFormatError(f"NDJSON invalide ligne {lineno}: objet attendu")
+        yield obj
+
+
+def _iter_csv(fp: TextIO) -> Iterator[dict[str, Any]]:
+    sample = fp.read(_READ_SIZE)
+    fp.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.DictReader(fp, dialect=dialect)
+    if not reader.fieldnames or "name" not in reader.fieldnames:
+        raise CatalogFormatError("CSV invalide: colonne 'name' attendue")
+    yield from reader
+
+
+class _JsonItemsStream:
+    """
+    Parse incrémental de {"...": ..., "items": [{...}, {...}]} :
+    seuls les éléments de "items" sont produits, un par un.
+    """
+
+    def __init__(self, fp: TextIO):
+        self.fp = fp
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.fp.read(_READ_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        if self.pos > _READ_SIZE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += data
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise CatalogFormatError("JSON invalide: fin de fichier inattendue")
+
+    def _expect(self, ch: str) -> None:
+        if self._peek() != ch:
+            raise CatalogFormatError(f"JSON invalide: '{ch}' attendu (position {self.pos})")
+        self.pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise CatalogFormatError(f"JSON invalide: {e.msg}") from e
+            # Un nombre coupé en fin de tampon serait décodé partiellement
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        self._expect("{")
+        if self._peek() == "}":
+            raise CatalogFormatError("JSON invalide: clé 'items' attendue (liste)")
+
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "items":
+                yield from self._items()
+                return
+            self._value()
+            if self._peek() == ",":
+                self.pos += 1
+                continue
+            raise CatalogFormatError("JSON invalide: clé 'items' attendue (liste)")
+
+    def _items(self) -> Iterator[dict[str, Any]]:
+        self._expect("[")
+        if self._peek() == "]":
+            return
+        while True:
+            obj = self._value()
+            if not isinstance(obj, dict):
+                raise CatalogFormatError("JSON invalide: chaque item doit être un objet")
+            yield obj
+            ch = self._peek()
+            self.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise CatalogFormatError(f"JSON invalide: ',' ou ']' attendu (position {self.pos - 1})")
+
+
+# =========================================================
+# Empreintes
+# =========================================================
+def row_content_hash(row: dict[str, Any]) -> str:
+    return reference_content_hash(
+        row["aisle"],
+        row["default_unit"],
+        row["default_qty_value"],
+        row["default_note"],
+        row["default_unit_price"],
+    )
+
+
+class _Fingerprint:
+    """
+    Empreinte d'un fichier catalogue : (nom, empreinte de contenu) de chaque ligne,
+    dans l'ordre du fichier, plus les options qui changent le résultat de l'import.
+    """
+
+    def __init__(self, *, overwrite_price: bool, deactivate_missing: bool):
+        self._h = hashlib.blake2b(digest_size=16)
+        self._h.update(f"v1|{int(overwrite_price)}|{int(deactivate_missing)}".encode())
+
+    def add(self, name: str, content_hash: str) -> None:
+        self._h.update(f"\x1e{name}\x1f{content_hash}".encode())
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+# =========================================================
+# Écriture par lots
+# =========================================================
+class CatalogUpserter:
+    """
+    Synchronise le catalogue d'un foyer par lots, en ne touchant que le delta.
+
+    Le catalogue existant est chargé une fois sous forme {nom: (id, empreinte, actif)} ;
+    une ligne dont l'empreinte est identique (produit actif) est sautée sans être chargée.
+    Seules les lignes dont l'empreinte diffère, ou les produits archivés à réactiver,
+    sont relues (une requête par lot) puis comparées champ par champ.
+
+    Un nom présent plusieurs fois dans le fichier voit ses lignes appliquées dans l'ordre
+    (apply_row) ; les compteurs et le diff portent sur les noms distincts.
+
+    Usage:
+        upserter = CatalogUpserter(household_id, overwrite_price=False)
+        upserter.feed(rows)
+        upserter.finish()
+        upserter.created, upserter.updated, upserter.unchanged, upserter.deactivated
+    """
+
+    def __init__(
+        self,
+        household_id: int,
+        *,
+        overwrite_price: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        deactivate_missing: bool = False,
+        dry_run: bool = False,
+    ):
+        self.household_id = household_id
+        self.overwrite_price = overwrite_price
+        self.batch_size = max(1, batch_size)
+        self.deactivate_missing = deactivate_missing
+        self.dry_run = dry_run
+
+        self.deactivated = 0
+        # Vrai dès qu'un lot a écrit dans le catalogue
+        self.wrote = False
+
+        # Noms créés / modifiés (un doublon du fichier n'est compté qu'une fois)
+        self._created_names: set[str] = set()
+        self._updated_names: set[str] = set()
+        self._missing: list[str] = []
+
+        self._existing: dict[str, tuple[int, str, bool]] = {
+            name: (pk, content_hash, is_active)
+            for pk, name, content_hash, is_active in ReferenceItem.objects.filter(
+                household_id=household_id
+            ).values_list("id", "name", "content_hash", "is_active")
+        }
+        self._seen: set[str] = set()
+        self._touched: dict[str, ReferenceItem] = {}
+        self._fingerprint = _Fingerprint(overwrite_price=overwrite_price, deactivate_missing=deactivate_missing)
+
+        self._to_create: list[ReferenceItem] = []
+        self._to_update: dict[str, ReferenceItem] = {}
+        self._to_rehash: dict[str, ReferenceItem] = {}
+        self._pending_names: set[str] = set()
+
+    @property
+    def fingerprint(self) -> str:
+        return self._fingerprint.hexdigest()
+
+    @property
+    def created(self) -> int:
+        return len(self._created_names)
+
+    @property
+    def updated(self) -> int:
+        return len(self._updated_names - self._created_names)
+
+    @property
+    def unchanged(self) -> int:
+        return len(self._seen) - self.created - self.updated
+
+    @property
+    def diff(self) -> dict[str, list[str]]:
+        """
+        Noms à créer / mettre à jour / absents du fichier (affichage du dry-run).
+        """
+        return {
+            "insert": sorted(self._created_names),
+            "update": sorted(self._updated_names - self._created_names),
+            "deactivate": self._missing,
+        }
+
+    def feed(self, rows: Iterable[dict[str, Any]]) -> None:
+        """
+        Ajoute des lignes normalisées (cf. normalize_row). Écrit dès qu'un lot est plein.
+        """
+        for chunk in chunked(rows, self.batch_size):
+            hashes = [row_content_hash(row) for row in chunk]
+
+            # Lignes modifiées d'après l'empreinte : une seule requête pour tout le lot
+            candidate_ids = []
+            for row, h in zip(chunk, hashes):
+                known = self._existing.get(row["name"])
+                if known is not None and (known[1] != h or not known[2]) and row["name"] not in self._touched:
+                    candidate_ids.append(known[0])
+            fetched = (
+                ReferenceItem.objects.only("id", "household_id", "name", "content_hash", *UPDATE_FIELDS)
+                .in_bulk(candidate_ids)
+                if candidate_ids
+                else {}
+            )
+
+            for row, h in zip(chunk, hashes):
+                self._add(row, h, fetched)
+
+            if len(self._to_create) + len(self._to_update) + len(self._to_rehash) >= self.batch_size:
+                self.flush()
+
+    def _add(self, row: dict[str, Any], content_hash: str, fetched: dict[int, ReferenceItem]) -> None:
+        name = row["name"]
+        self._seen.add(name)
+        self._fingerprint.add(name, content_hash)
+
+        obj = self._touched.get(name)
+        if obj is None:
+            known = self._existing.get(name)
+            if known is not None and known[1] == content_hash and known[2]:
+                return
+
+            obj = fetched.get(known[0]) if known is not None else None
+            if obj is None:
+                obj = ReferenceItem(household_id=self.household_id, is_active=True, content_hash=content_hash, **row)
+                self._touched[name] = obj
+                self._to_create.append(obj)
+                self._pending_names.add(name)
+                self._created_names.add(name)
+                return
+            self._touched[name] = obj
+
+        changed = apply_row(obj, row, overwrite_price=self.overwrite_price)
+        if not obj.is_active:
+            obj.is_active = True
+            changed = True
+        if not changed:
+            # Contenu identique mais empreinte absente / obsolète : on la rafraîchit seulement
+            new_hash = obj.compute_content_hash()
+            if obj.content_hash != new_hash:
+                obj.content_hash = new_hash
+                if name not in self._pending_names and name not in self._to_update:
+                    self._to_rehash[name] = obj
+            return
+
+        obj.content_hash = obj.compute_content_hash()
+        self._updated_names.add(name)
+        # Doublon d'un item pas encore inséré : la création embarquera les modifications
+        if name not in self._pending_names:
+            self._to_update[name] = obj
+            self._to_rehash.pop(name, None)
+
+    def flush(self) -> None:
+        """
+        Écrit le lot en cours dans une transaction courte.
+        """
+        if not self.dry_run and (self._to_create or self._to_update or self._to_rehash):
+            self.wrote = True
+            with transaction.atomic():
+                if self._to_create:
+                    ReferenceItem.objects.bulk_create(self._to_create, batch_size=self.batch_size)
+                if self._to_update:
+                    # L'import écrase sans condition ; la version avance pour que les clients voient le conflit
+                    for obj in self._to_update.values():
+                        obj.version = F("version") + 1
+                    ReferenceItem.objects.bulk_update(
+                        list(self._to_update.values()),
+                        [*UPDATE_FIELDS, "content_hash", "version"],
+                        batch_size=self.batch_size,
+                    )
+                if self._to_rehash:
+                    ReferenceItem.objects.bulk_update(
+                        list(self._to_rehash.values()), ["content_hash"], batch_size=self.batch_size
+                    )
+
+        self._to_create = []
+        self._to_update = {}
+        self._to_rehash = {}
+        self._pending_names = set()
+
+    def finish(self) -> None:
+        """
+        Écrit le dernier lot, désactive les absents (si demandé) et mémorise l'empreinte du fichier.
+        """
+        self.flush()
+
+        missing = {
+            name: pk for name, (pk, _, is_active) in self._existing.items() if is_active and name not in self._seen
+        }
+        self._missing = sorted(missing)
+        if self.deactivate_missing:
+            self.deactivated = len(missing)
+
+        if self.dry_run:
+            return
+
+        with transaction.atomic():
+            if self.deactivate_missing:
+                for ids in chunked(missing.values(), self.batch_size):
+                    ReferenceItem.objects.filter(id__in=ids).bump_version(is_active=False, is_selected=False)
+            # Après les écritures : les triggers du catalogue vident l'empreinte à chacune
+            Household.objects.filter(id=self.household_id).update(catalog_fingerprint=self.fingerprint)
+
+
+def import_catalog_rows(
+    household_id: int,
+    rows: Iterable[dict[str, Any]],
+    *,
+    mode: str = "upsert",
+    overwrite_price: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    deactivate_missing: bool = False,
+    dry_run: bool = False,
+    fast: bool = False,
+    on_chunk: Callable[[int], None] | None = None,
+) -> ImportResult:
+    """
+    Importe des lignes normalisées dans le catalogue d'un foyer.
+
+    mode="replace" supprime d'abord le catalogue ; suppression + réimport restent
+    alors atomiques (pas de catalogue vide en cas d'erreur).
+    L'empreinte du fichier est calculée pendant la lecture : si c'est celle du dernier
+    import du foyer, la fin de l'import (désactivation, fusion COPY) est sautée et le
+    résultat est marqué skipped. L'empreinte stockée est vidée par trigger à toute écriture
+    dans le catalogue (migration 0024) : tant qu'elle est là, le catalogue est exactement
+    le résultat de cet import, et les lignes du même fichier n'ont rien à écrire.
+    Un résultat skipped n'a jamais rien écrit ; sinon il porte les compteurs réels.
+    fast=True utilise COPY sur PostgreSQL (ignoré sur les autres bases et en dry-run).
+    """
+    if fast and supports_fast_import() and not dry_run:
+        return _copy_import_catalog_rows(
+            household_id,
+            rows,
+            mode=mode,
+            overwrite_price=overwrite_price,
+            batch_size=batch_size,
+            deactivate_missing=deactivate_missing,
+            on_chunk=on_chunk,
+        )
+
+    stored = None
+    if mode == "upsert":
+        stored = Household.objects.filter(id=household_id).values_list("catalog_fingerprint", flat=True).first()
+
+    deleted = 0
+    read = 0
+
+    with transaction.atomic() if mode == "replace" else nullcontext():
+        if mode == "replace":
+            deleted, _ = ReferenceItem.objects.filter(household_id=household_id).delete()
+
+        upserter = CatalogUpserter(
+            household_id,
+            overwrite_price=overwrite_price,
+            batch_size=batch_size,
+            deactivate_missing=deactivate_missing,
+            dry_run=dry_run,
+        )
+        for chunk in chunked(rows, batch_size):
+            upserter.feed(chunk)
+            upserter.flush()
+            read += len(chunk)
+            if on_chunk is not None:
+                on_chunk(read)
+        # Un lot a écrit : le catalogue avait changé depuis (l'empreinte aurait dû être vidée),
+        # l'import va au bout et rend ses compteurs
+        if stored and upserter.fingerprint == stored and not upserter.wrote:
+            return ImportResult(household_id, rows=read, skipped=True)
+        upserter.finish()
+
+    return ImportResult(
+        household_id,
+        created=upserter.created,
+        updated=upserter.updated,
+        unchanged=upserter.unchanged,
+        deactivated=upserter.deactivated,
+        deleted=deleted,
+        rows=read,
+        diff=upserter.diff if dry_run else None,
+    )
+
+
+# =========================================================
+# Mode rapide PostgreSQL (COPY + INSERT ... ON CONFLICT)
+# =========================================================
+_STAGE_COLUMNS = [
+    "ord",
+    "name",
+    "aisle",
+    "default_unit",
+    "default_qty_value",
+    "default_note",
+    "default_unit_price",
+    "content_hash",
+]
+
+# Règles de fusion identiques à apply_row, exprimées en SQL
+_MERGED_QTY = "COALESCE(EXCLUDED.default_qty_value, t.default_qty_value)"
+_MERGED_NOTE = "CASE WHEN EXCLUDED.default_note <> '' THEN EXCLUDED.default_note ELSE t.default_note END"
+_MERGED_PRICE = (
+    "CASE WHEN EXCLUDED.default_unit_price IS NOT NULL AND (%(overwrite_price)s OR t.default_unit_price IS NULL) "
+    "THEN EXCLUDED.default_unit_price ELSE t.default_unit_price END"
+)
+
+_MERGE_SQL = f"""
+WITH src AS (
+    SELECT DISTINCT ON (name) name, aisle, default_unit, default_qty_value, default_note,
+           default_unit_price, content_hash
+    FROM catalog_stage
+    ORDER BY name, ord DESC
+),
+merged AS (
+    INSERT INTO {{table}} AS t (
+        household_id, name, aisle, default_unit, default_qty_value, default_note, default_unit_price,
+        content_hash, is_active, is_selected, created_at, version
+    )
+    SELECT %(household_id)s, name, aisle, default_unit, default_qty_value, default_note, default_unit_price,
+           content_hash, TRUE, FALSE, %(now)s, 0
+    FROM src
+    ON CONFLICT (household_id, name) DO UPDATE SET
+        version = t.version + 1,
+        is_active = TRUE,
+        aisle = EXCLUDED.aisle,
+        default_unit = EXCLUDED.default_unit,
+        default_qty_value = {_MERGED_QTY},
+        default_note = {_MERGED_NOTE},
+        default_unit_price = {_MERGED_PRICE},
+        -- l'empreinte n'est reprise que si le résultat est exactement la ligne importée
+        content_hash = CASE
+            WHEN (EXCLUDED.default_qty_value IS NOT NULL OR t.default_qty_value IS NULL)
+             AND (EXCLUDED.default_note <> '' OR t.default_note = '')
+             AND ({_MERGED_PRICE}) IS NOT DISTINCT FROM EXCLUDED.default_unit_price
+            THEN EXCLUDED.content_hash ELSE '' END
+    -- produit archivé présent dans le fichier : réactivé même si son contenu est identique
+    WHERE NOT t.is_active
+       OR (t.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+           AND (t.aisle, t.default_unit, t.default_qty_value, t.default_note, t.default_unit_price)
+               IS DISTINCT FROM
+               (EXCLUDED.aisle, EXCLUDED.default_unit, {_MERGED_QTY}, {_MERGED_NOTE}, {_MERGED_PRICE}))
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted), (SELECT COUNT(*) FROM src)
+FROM merged
+"""
+
+_DEACTIVATE_SQL = """
+UPDATE {table} AS t SET is_active = FALSE, is_selected = FALSE, version = t.version + 1
+WHERE t.household_id = %(household_id)s
+  AND t.is_active
+  AND NOT EXISTS (SELECT 1 FROM catalog_stage s WHERE s.name = t.name)
+"""
+
+
+def supports_fast_import() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def _copy_import_catalog_rows(
+    household_id: int,
+    rows: Iterable[dict[str, Any]],
+    *,
+    mode: str,
+    overwrite_price: bool,
+    batch_size: int,
+    deactivate_missing: bool,
+    on_chunk: Callable[[int], None] | None,
+) -> ImportResult:
+    """
+    Envoie les lignes par COPY dans une table temporaire, puis fusionne en une seule requête.
+    Tout se fait dans une transaction ; la table temporaire est supprimée en fin d'import
+    (ON COMMIT DROP ne suffit pas dans une transaction englobante).
+
+    Un nom présent plusieurs fois dans le fichier : seule sa dernière ligne est fusionnée
+    (DISTINCT ON), là où le mode ORM applique chaque ligne dans l'ordre. Les deux modes
+    diffèrent seulement si une ligne ultérieure laisse vide une quantité, une note ou un prix ;
+    les compteurs portent dans les deux cas sur les noms distincts.
+    """
+    table = connection.ops.quote_name(ReferenceItem._meta.db_table)
+    fp = _Fingerprint(overwrite_price=overwrite_price, deactivate_missing=deactivate_missing)
+    deleted = 0
+    deactivated = 0
+    read = 0
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        stored = None
+        if mode == "upsert":
+            # Verrou du foyer jusqu'au commit : une écriture concurrente du catalogue attend
+            # (son trigger met à jour la même ligne), l'empreinte lue reste celle du catalogue
+            households = Household.objects.select_for_update().filter(id=household_id)
+            stored = households.values_list("catalog_fingerprint", flat=True).first()
+        else:
+            deleted, _ = ReferenceItem.objects.filter(household_id=household_id).delete()
+
+        cursor.execute(
+            """
+            CREATE TEMP TABLE catalog_stage (
+                ord integer NOT NULL,
+                name text NOT NULL,
+                aisle text NOT NULL,
+                default_unit text NOT NULL,
+                default_qty_value numeric,
+                default_note text NOT NULL,
+                default_unit_price numeric,
+                content_hash text NOT NULL
+            ) ON COMMIT DROP
+            """
+        )
+
+        with cursor.copy(f"COPY catalog_stage ({', '.join(_STAGE_COLUMNS)}) FROM STDIN") as copy:
+            for chunk in chunked(rows, batch_size):
+                for row in chunk:
+                    read += 1
+                    content_hash = row_content_hash(row)
+                    fp.add(row["name"], content_hash)
+                    copy.write_row((
+                        read,
+                        row["name"],
+                        row["aisle"],
+                        row["default_unit"],
+                        row["default_qty_value"],
+                        row["default_note"],
+                        row["default_unit_price"],
+                        content_hash,
+                    ))
+                if on_chunk is not None:
+                    on_chunk(read)
+
+        if stored and fp.hexdigest() == stored:
+            cursor.execute("DROP TABLE catalog_stage")
+            return ImportResult(household_id, rows=read, skipped=True)
+
+        params = {
+            "household_id": household_id,
+            "now": timezone.now(),
+            "overwrite_price": overwrite_price,
+        }
+        cursor.execute(_MERGE_SQL.format(table=table), params)
+        created, updated, names = cursor.fetchone()
+
+        if deactivate_missing:
+            cursor.execute(_DEACTIVATE_SQL.format(table=table), params)
+            deactivated = cursor.rowcount
+        cursor.execute("DROP TABLE catalog_stage")
+
+        Household.objects.filter(id=household_id).update(catalog_fingerprint=fp.hexdigest())
+
+    return ImportResult(
+        household_id,
+        created=created,
+        updated=updated,
+        unchanged=names - created - updated,
+        deactivated=deactivated,
+        deleted=deleted,
+        rows=read,
+    )
+
+
+# =========================================================
+# Import multi-foyers (pool de processus)
+# =========================================================
+_worker_rows: list[dict[str, Any]] = []
+_worker_options: dict[str, Any] = {}
+
+
+def _init_worker(rows: list[dict[str, Any]], options: dict[str, Any]) -> None:
+    global _worker_rows, _worker_options
+
+    import django
+    from django.apps import apps
+
+    # Démarrage "spawn" : Django n'est pas encore configuré dans le processus fils
+    if not apps.ready:
+        django.setup()
+
+    _worker_rows = rows
+    _worker_options = options
+
+
+def _import_in_worker(household_id: int) -> ImportResult:
+    try:
+        return import_catalog_rows(household_id, _worker_rows, **_worker_options)
+    except Exception as e:  # un foyer en échec ne doit pas interrompre les autres
+        return ImportResult(household_id, error=f"{e.__class__.__name__}: {e}")
+
+
+def import_catalog_for_households(
+    household_ids: list[int],
+    rows: list[dict[str, Any]],
+    *,
+    jobs: int,
+    **options: Any,
+) -> Iterator[ImportResult]:
+    """
+    Importe les mêmes lignes (déjà lues) dans plusieurs foyers.
+    `options` est transmis tel quel à import_catalog_rows.
+    Les résultats sont produits au fil de l'eau, dans l'ordre de fin.
+    """
+    if jobs <= 1 or len(household_ids) <= 1:
+        _init_worker(rows, options)
+        for household_id in household_ids:
+            yield _import_in_worker(household_id)
+        return
+
+    # Les processus fils ne doivent pas hériter des connexions ouvertes du parent
+    connections.close_all()
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(rows, options)) as pool:
+        futures = [pool.submit(_import_in_worker, household_id) for household_id in household_ids]
+        for future in as_completed(futures):
+            yield future.result()
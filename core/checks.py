@@ -0,0 +1,23 @@
+"""
+Vérifications système du projet (manage.py check --deploy).
+"""
+from __future__ import annotations
+
+from django.core.checks import Tags, Warning, register
+
+from . import membership_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not membership_cache.is_process_local():
+        return []
+    return [
+        Warning(
+            "Le cache par défaut est local au processus : avec plusieurs processus, un membre retiré "
+            f"d'un foyer y garde l'accès jusqu'à {membership_cache.LOCAL_CACHE_TIMEOUT} s "
+            "et le cache des pages n'est pas partagé.",
+            hint="Configurer un cache partagé dans CACHES (Redis, Memcached ou DatabaseCache).",
+            id="core.W001",
+        )
+    ]
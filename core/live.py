@@ -0,0 +1,500 @@
+"""
+Diffusion en direct des modifications d'une liste de courses (WebSocket, Server-Sent Events).
+
+Les vues publient après commit un évènement par objet modifié (publish_list_event) ;
+la diffusion est en mémoire, dans le processus : chaque connexion ouverte sur la liste
+reçoit l'évènement dans une file bornée. Avec plusieurs processus ASGI, un membre
+connecté à un autre processus ne voit pas l'évènement (il faudrait un relais partagé,
+ex : Redis pub/sub, comme pour le cache).
+
+Évènement : {"type": "list_item" | "receipt_item" | "list", "op": "upsert" | "delete" | ...,
+"id": <id>, "data": {...} | None}, numéroté "<démarrage>-<n>" (event_id). Les derniers
+évènements de chaque liste sont gardés pour la reprise après coupure (Last-Event-ID) ;
+si la reprise n'est pas possible, l'abonné reçoit d'abord {"type": "list", "op": "resync"}
+et recharge la liste.
+
+Les droits d'une connexion (session, appartenance au foyer) sont revérifiés pendant toute
+sa durée : toutes les ACCESS_RECHECK_SECONDS, et tout de suite quand une appartenance de
+l'utilisateur change ou qu'il se déconnecte dans ce processus (recheck_user, cf. signals).
+Accès perdu : WebSocket fermé avec CLOSE_FORBIDDEN, flux SSE terminé.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import re
+import threading
+import uuid
+from collections import OrderedDict, deque
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections, transaction
+from django.http import QueryDict
+from django.http.cookie import parse_cookie
+from django.http.request import split_domain_port, validate_host
+
+# Évènements en attente par connexion : au-delà, le client est trop lent, il est déconnecté
+SUBSCRIBER_QUEUE_SIZE = 256
+# Évènements gardés par liste pour la reprise (< SUBSCRIBER_QUEUE_SIZE : un rejeu tient dans la file)
+REPLAY_BUFFER_SIZE = 128
+# Listes dont l'historique est gardé (les moins récemment actives sont oubliées)
+REPLAY_LISTS = 1024
+
+# Commentaire SSE envoyé sans évènement pendant ce délai (proxys qui coupent les flux muets)
+SSE_KEEPALIVE_SECONDS = 20
+
+# Revérification périodique des droits d'une connexion ouverte : couvre les changements faits
+# dans un autre processus (retrait du foyer, déconnexion) et l'expiration de la session
+ACCESS_RECHECK_SECONDS = 30
+
+# Code de fermeture WebSocket (plage applicative 4000-4999)
+CLOSE_FORBIDDEN = 4403
+CLOSE_OVERFLOW = 4408
+
+WEBSOCKET_PATH = re.compile(r"^/ws/shopping-lists/(?P<shopping_list_id>\d+)/$")
+# Même chemin que l'URL shopping_list_events (core/urls.py), servi avant Django (cf. list_events)
+EVENTS_PATH = re.compile(r"^/shopping-lists/(?P<shopping_list_id>\d+)/events/$")
+
+# Marqueurs de la file d'un abonné / du flux d'évènements (cf. _followed_events)
+_RECHECK = object()
+_KEEPALIVE = object()
+_FORBIDDEN = object()
+
+
+class Subscriber:
+    """
+    Une connexion abonnée à une liste. La file n'est manipulée que dans sa boucle asyncio.
+    user_id / session_key : titulaire de la connexion, dont les droits sont revérifiés
+    (None : connexion interne, jamais revérifiée).
+    """
+
+    def __init__(
+        self,
+        shopping_list_id: int,
+        loop: asyncio.AbstractEventLoop,
+        *,
+        user_id: int | None = None,
+        session_key: str | None = None,
+    ):
+        self.shopping_list_id = shopping_list_id
+        self.loop = loop
+        self.user_id = user_id
+        self.session_key = session_key
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client trop lent : on vide la file et on signale la coupure (None),
+            # il se resynchronise (instantané / sync) à la reconnexion
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    def recheck(self) -> None:
+        """
+        Demande une revérification des droits, à son tour dans la file.
+        """
+        self.push(_RECHECK)
+
+    def revoke(self) -> None:
+        """
+        Accès retiré sans revérification (session terminée).
+        """
+        self.push(_FORBIDDEN)
+
+    async def get(self):
+        """
+        (event_id, évènement), _RECHECK, _FORBIDDEN, ou None après un débordement
+        (connexion à fermer).
+        """
+        return await self.queue.get()
+
+
+class _History:
+    """
+    Derniers évènements d'une liste ; evicted : numéro du dernier évènement sorti du tampon.
+    """
+
+    def __init__(self):
+        self.events: deque[tuple[int, dict]] = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self.evicted = 0
+
+
+class ListBroadcast:
+    """
+    Abonnés par liste. publish() peut être appelé depuis n'importe quel thread (vues
+    synchrones) : la remise passe par la boucle de chaque abonné (call_soon_threadsafe).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[int, set[Subscriber]] = {}
+        # Numéros d'évènements propres à ce processus : un Last-Event-ID d'un autre démarrage
+        # ne peut pas être repris
+        self._boot = uuid.uuid4().hex[:8]
+        self._counter = itertools.count(1)
+        self._last = 0
+        self._history: OrderedDict[int, _History] = OrderedDict()
+        # Dernier numéro des historiques oubliés (cf. REPLAY_LISTS)
+        self._forgotten = 0
+
+    def _event_id(self, n: int) -> str:
+        return f"{self._boot}-{n}"
+
+    def _missed_since(self, shopping_list_id: int, last_event_id: str) -> list[tuple[int, dict]] | None:
+        """
+        Évènements de la liste après last_event_id, ou None si la reprise est impossible
+        (autre démarrage, évènements déjà sortis du tampon). Appelé sous verrou.
+        """
+        boot, _, raw = last_event_id.partition("-")
+        if boot != self._boot or not raw.isdigit():
+            return None
+        n = int(raw)
+        history = self._history.get(shopping_list_id)
+        if history is None:
+            # Rien publié sur cette liste depuis n, sauf si son historique a pu être oublié après n
+            return [] if n >= self._forgotten else None
+        if n < history.evicted:
+            return None
+        return [(m, event) for m, event in history.events if m > n]
+
+    def subscribe(
+        self,
+        shopping_list_id: int,
+        *,
+        last_event_id: str | None = None,
+        user_id: int | None = None,
+        session_key: str | None = None,
+    ) -> Subscriber:
+        """
+        Abonne la connexion courante (à appeler dans sa boucle asyncio). Avec last_event_id,
+        les évènements manqués sont remis d'abord, dans l'ordre, avant les nouveaux.
+        """
+        subscriber = Subscriber(
+            shopping_list_id, asyncio.get_running_loop(), user_id=user_id, session_key=session_key
+        )
+        with self._lock:
+            self._subscribers.setdefault(shopping_list_id, set()).add(subscriber)
+            if last_event_id:
+                missed = self._missed_since(shopping_list_id, last_event_id)
+                if missed is None:
+                    # Numéroté comme le dernier évènement publié : la reprise suivante part de là
+                    missed = [(self._last, {"type": "list", "op": "resync", "id": shopping_list_id, "data": None})]
+                # Remis sous verrou : un publish() concurrent passe après (call_soon_threadsafe)
+                for n, event in missed:
+                    subscriber.push((self._event_id(n), event))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.shopping_list_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.shopping_list_id]
+
+    def publish(self, shopping_list_id: int, event: dict) -> None:
+        with self._lock:
+            n = self._last = next(self._counter)
+            history = self._history.get(shopping_list_id)
+            if history is None:
+                history = self._history[shopping_list_id] = _History()
+                if len(self._history) > REPLAY_LISTS:
+                    _, forgotten = self._history.popitem(last=False)
+                    self._forgotten = max(self._forgotten, forgotten.events[-1][0])
+            else:
+                self._history.move_to_end(shopping_list_id)
+            if len(history.events) == history.events.maxlen:
+                history.evicted = history.events[0][0]
+            history.events.append((n, event))
+            subscribers = list(self._subscribers.get(shopping_list_id, ()))
+
+        item = (self._event_id(n), event)
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.push, item)
+
+    def recheck_user(self, user_id: int) -> None:
+        """
+        Fait revérifier les droits de toutes les connexions de l'utilisateur (appartenance
+        modifiée, déconnexion). Appelable depuis n'importe quel thread.
+        """
+        with self._lock:
+            subscribers = [s for group in self._subscribers.values() for s in group if s.user_id == user_id]
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.recheck)
+
+    def end_session(self, session_key: str) -> None:
+        """
+        Ferme les connexions ouvertes avec cette session (déconnexion : le signal précède la
+        suppression de la session, une revérification la trouverait encore valide).
+        """
+        with self._lock:
+            subscribers = [s for group in self._subscribers.values() for s in group if s.session_key == session_key]
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.revoke)
+
+    def subscriber_count(self, shopping_list_id: int) -> int:
+        with self._lock:
+            return len(self._subscribers.get(shopping_list_id, ()))
+
+
+broadcast = ListBroadcast()
+
+
+def publish_list_event(shopping_list_id: int, kind: str, op: str, object_id: int, data: dict | None = None) -> None:
+    """
+    Publie un évènement sur la liste après le commit de la transaction en cours
+    (immédiatement hors transaction) : une écriture annulée n'est jamais diffusée.
+    """
+    event = {"type": kind, "op": op, "id": object_id, "data": data}
+    transaction.on_commit(lambda: broadcast.publish(shopping_list_id, event))
+
+
+# =========================================================
+# Droits d'une connexion
+# =========================================================
+def _follower(session_key: str | None, shopping_list_id: int) -> int | None:
+    """
+    Id de l'utilisateur de la session s'il est membre du foyer de la liste, sinon None.
+    Lu en base (pas le cache des appartenances) : sert aussi aux revérifications.
+    """
+    from .models import ShoppingList
+
+    close_old_connections()
+    try:
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        # get_user ne lit que request.session
+        user = get_user(SimpleNamespace(session=session))
+        if not user.is_authenticated:
+            return None
+        if not ShoppingList.objects.filter(id=shopping_list_id, household__memberships__user=user).exists():
+            return None
+        return user.pk
+    finally:
+        close_old_connections()
+
+
+async def _still_following(subscriber: Subscriber) -> bool:
+    if subscriber.user_id is None:
+        return True
+    user_id = await sync_to_async(_follower)(subscriber.session_key, subscriber.shopping_list_id)
+    return user_id == subscriber.user_id
+
+
+async def _followed_events(subscriber: Subscriber, *, keepalive: float | None = None):
+    """
+    Évènements remis à l'abonné, dans l'ordre : (event_id, évènement), _KEEPALIVE après
+    `keepalive` secondes sans rien envoyer, et pour finir None (débordement) ou _FORBIDDEN
+    (revérification échouée, session terminée).
+    """
+    loop = asyncio.get_running_loop()
+    next_check = loop.time() + ACCESS_RECHECK_SECONDS
+    last_sent = loop.time()
+    while True:
+        deadline = next_check if keepalive is None else min(next_check, last_sent + keepalive)
+        try:
+            item = await asyncio.wait_for(subscriber.get(), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            item = _RECHECK if loop.time() >= next_check else _KEEPALIVE
+
+        if item is _RECHECK:
+            if await _still_following(subscriber):
+                next_check = loop.time() + ACCESS_RECHECK_SECONDS
+                continue
+            item = _FORBIDDEN
+
+        yield item
+        if item is None or item is _FORBIDDEN:
+            return
+        last_sent = loop.time()
+
+
+# =========================================================
+# Server-Sent Events
+# =========================================================
+async def sse_stream(
+    shopping_list_id: int,
+    last_event_id: str | None = None,
+    *,
+    user_id: int | None = None,
+    session_key: str | None = None,
+):
+    """
+    Flux text/event-stream d'une liste : une coroutine et une file bornée par auditeur,
+    aucun thread bloqué. Un auditeur trop lent voit son flux coupé : EventSource se reconnecte
+    avec Last-Event-ID et reprend depuis le tampon (ou reçoit resync). Le flux se termine
+    aussi quand l'auditeur perd l'accès : la reconnexion est alors refusée (list_events).
+    """
+    subscriber = broadcast.subscribe(
+        shopping_list_id, last_event_id=last_event_id, user_id=user_id, session_key=session_key
+    )
+    try:
+        yield "retry: 3000\n\n"
+        async for item in _followed_events(subscriber, keepalive=SSE_KEEPALIVE_SECONDS):
+            if item is _KEEPALIVE:
+                yield ": keepalive\n\n"
+                continue
+            if item is None or item is _FORBIDDEN:
+                return
+            event_id, event = item
+            yield f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        broadcast.unsubscribe(subscriber)
+
+
+# =========================================================
+# Points d'entrée WebSocket et SSE (ASGI brut, cf. config/asgi.py)
+# =========================================================
+def _headers(scope) -> dict[str, str]:
+    return {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+
+def _origin_allowed(headers: dict[str, str]) -> bool:
+    """
+    Un navigateur envoie toujours Origin : on refuse les pages d'autres sites
+    (la session suit le cookie, comme pour une requête cross-site).
+    """
+    origin = headers.get("origin")
+    if origin is None:
+        return True
+    if origin in settings.CSRF_TRUSTED_ORIGINS:
+        return True
+    host, _port = split_domain_port(origin.split("://", 1)[-1])
+    allowed = settings.ALLOWED_HOSTS or (["localhost", "127.0.0.1", "[::1]"] if settings.DEBUG else [])
+    return bool(host) and validate_host(host, allowed)
+
+
+def _session_key(headers: dict[str, str]) -> str | None:
+    return parse_cookie(headers.get("cookie", "")).get(settings.SESSION_COOKIE_NAME)
+
+
+async def list_websocket(scope, receive, send) -> None:
+    """
+    /ws/shopping-lists/<id>/[?last_event_id=...] : évènements de la liste en JSON, un message
+    texte par évènement (avec son event_id, pour reprendre après coupure).
+    Les messages du client sont ignorés (ping applicatif possible). Fermé avec CLOSE_FORBIDDEN
+    dès qu'une revérification des droits échoue.
+    """
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+
+    match = WEBSOCKET_PATH.match(scope["path"])
+    headers = _headers(scope)
+    if match is None or not _origin_allowed(headers):
+        await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        return
+
+    shopping_list_id = int(match["shopping_list_id"])
+    session_key = _session_key(headers)
+    user_id = await sync_to_async(_follower)(session_key, shopping_list_id)
+    if user_id is None:
+        await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        return
+
+    query = QueryDict(scope.get("query_string", b"").decode("latin-1"))
+    subscriber = broadcast.subscribe(
+        shopping_list_id, last_event_id=query.get("last_event_id"), user_id=user_id, session_key=session_key
+    )
+    await send({"type": "websocket.accept"})
+
+    async def forward():
+        async for item in _followed_events(subscriber):
+            if item is None:
+                await send({"type": "websocket.close", "code": CLOSE_OVERFLOW})
+                return
+            if item is _FORBIDDEN:
+                await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+                return
+            event_id, event = item
+            await send({"type": "websocket.send", "text": json.dumps({**event, "event_id": event_id})})
+
+    forwarder = asyncio.create_task(forward())
+    try:
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
+        forwarder.cancel()
+        broadcast.unsubscribe(subscriber)
+
+
+async def _wait_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _refuse(send, status: int) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def list_events(scope, receive, send) -> None:
+    """
+    GET /shopping-lists/<id>/events/ : flux Server-Sent Events de la liste (sse_stream), pour
+    les clients sans WebSocket. Reprise : en-tête Last-Event-ID (reconnexion d'EventSource)
+    ou ?last_event_id= (première connexion avec un id gardé par le client).
+
+    Servi hors de Django, comme list_websocket : la pile de middlewares garderait pour chaque
+    flux ouvert un thread (contexte thread-sensitive des middlewares synchrones) pendant toute
+    sa durée. Ici un auditeur inactif ne coûte qu'une coroutine et sa file.
+    403 sans session membre du foyer de la liste : EventSource ne se reconnecte pas.
+    """
+    match = EVENTS_PATH.match(scope["path"])
+    headers = _headers(scope)
+    if scope["method"] != "GET":
+        await _refuse(send, 405)
+        return
+    if match is None or not _origin_allowed(headers):
+        await _refuse(send, 403)
+        return
+
+    shopping_list_id = int(match["shopping_list_id"])
+    session_key = _session_key(headers)
+    user_id = await sync_to_async(_follower)(session_key, shopping_list_id)
+    if user_id is None:
+        await _refuse(send, 403)
+        return
+
+    query = QueryDict(scope.get("query_string", b"").decode("latin-1"))
+    last_event_id = headers.get("last-event-id") or query.get("last_event_id")
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            # Pas de mise en tampon par un proxy nginx
+            (b"x-accel-buffering", b"no"),
+        ],
+    })
+
+    async def forward():
+        async for chunk in sse_stream(shopping_list_id, last_event_id, user_id=user_id, session_key=session_key):
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    forwarder = asyncio.create_task(forward())
+    disconnect = asyncio.create_task(_wait_disconnect(receive))
+    try:
+        done, _ = await asyncio.wait({forwarder, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        forwarder.cancel()
+        disconnect.cancel()
+        # Désabonnement (finally de sse_stream) fait avant de rendre la main
+        await asyncio.gather(forwarder, disconnect, return_exceptions=True)
+    if forwarder in done:
+        # Fin du flux (accès perdu, débordement) ou erreur d'envoi, propagée
+        forwarder.result()
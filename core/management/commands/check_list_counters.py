@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import ShoppingList
+
+
+class Command(BaseCommand):
+    help = "Contrôle les compteurs stockés des listes (items, cochés, sans prix, total) et corrige les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Recalcule (en une requête) les compteurs des listes incohérentes.",
+        )
+
+    def handle(self, *args, **opts):
+        drifted_ids = list(ShoppingList.objects.with_drifted_counters().values_list("id", flat=True))
+
+        if not opts["fix"]:
+            self.stdout.write(f"Listes avec compteurs incohérents: {len(drifted_ids)}")
+            if drifted_ids and opts["verbosity"] >= 2:
+                self.stdout.write("  ids: " + ", ".join(map(str, drifted_ids)))
+            return
+
+        with transaction.atomic():
+            updated = ShoppingList.objects.filter(id__in=drifted_ids).recompute_counters()
+
+        self.stdout.write(self.style.SUCCESS(f"Compteurs recalculés pour {updated} listes."))
@@ -1,19 +1,67 @@
-import json
-from decimal import Decimal
+import os
+import time
 from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
 
-from core.models import Household, ReferenceItem
+from core.catalog import (
+    DEFAULT_BATCH_SIZE,
+    FORMATS,
+    CatalogFormatError,
+    ImportResult,
+    import_catalog_for_households,
+    import_catalog_rows,
+    iter_catalog_rows,
+    normalize_row,
+    supports_fast_import,
+)
+from core.models import Household
+
+
+def _parse_household_ids(specs: list[str]) -> list[int]:
+    """
+    "2" / "2,5,7" / "10-20" (bornes incluses), combinables et répétables.
+    """
+    ids: set[int] = set()
+    for spec in specs:
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                if "-" in part:
+                    start, end = (int(x) for x in part.split("-", 1))
+                    if start > end:
+                        raise ValueError
+                    ids.update(range(start, end + 1))
+                else:
+                    ids.add(int(part))
+            except ValueError:
+                raise CommandError(f"--household-id invalide: {part!r} (ex: 2 / 2,5,7 / 10-20)")
+    return sorted(ids)
 
 
 class Command(BaseCommand):
-    help = "Importe un catalogue (ReferenceItem) depuis un JSON dans un Household donné."
+    help = (
+        "Importe un catalogue (ReferenceItem) depuis un JSON / NDJSON / CSV dans un ou plusieurs Households. "
+        "Avec plusieurs foyers, le fichier est lu une fois et les imports sont répartis sur --jobs processus. "
+        "Les lignes inchangées depuis le dernier import sont sautées (empreinte de contenu)."
+    )
+
+    # Nombre maximum de noms affichés par section du diff (--dry-run)
+    DIFF_PREVIEW = 50
 
     def add_arguments(self, parser):
-        parser.add_argument("json_path", type=str, help="Chemin vers le fichier JSON (catalog_base.json)")
-        parser.add_argument("--household-id", type=int, required=True, help="ID du foyer cible (ex: 2)")
+        parser.add_argument("json_path", type=str, help="Chemin vers le fichier (catalog_base.json, .ndjson, .csv)")
+
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument(
+            "--household-id",
+            action="append",
+            help="ID(s) du/des foyer(s) cible(s) : 2 / 2,5,7 / 10-20 (répétable)",
+        )
+        target.add_argument("--all", action="store_true", help="Importe dans tous les foyers")
+
         parser.add_argument(
             "--mode",
             choices=["upsert", "replace"],
@@ -25,90 +73,194 @@ class Command(BaseCommand):
             action="store_true",
             help="Écrase default_unit_price même si déjà renseigné.",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Nombre de lignes lues et écrites par lot / transaction (défaut: {DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            default=None,
+            help="Format du fichier (défaut: déduit de l'extension .json / .ndjson / .jsonl / .csv)",
+        )
+        parser.add_argument(
+            "--deactivate-missing",
+            action="store_true",
+            help="Archive (is_active=False) les produits du catalogue absents du fichier.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="N'écrit rien : affiche le diff insert / update / deactivate.",
+        )
+        parser.add_argument(
+            "--fast",
+            action="store_true",
+            help=(
+                "PostgreSQL : COPY dans une table temporaire puis fusion en une requête (amorçage de gros catalogues). "
+                "Un nom en double dans le fichier : seule sa dernière ligne est prise."
+            ),
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=None,
+            help="Nombre de processus pour l'import multi-foyers (défaut: nombre de CPU)",
+        )
 
-    @transaction.atomic
     def handle(self, *args, **opts):
         json_path = Path(opts["json_path"])
-        household_id = opts["household_id"]
         mode = opts["mode"]
         overwrite_price = opts["overwrite_price"]
+        batch_size = opts["batch_size"]
 
         if not json_path.exists():
             raise CommandError(f"Fichier introuvable: {json_path}")
+        if batch_size < 1:
+            raise CommandError("--batch-size doit être >= 1")
+        if opts["dry_run"] and mode == "replace":
+            raise CommandError("--dry-run n'est pas disponible avec --mode replace")
 
-        household = Household.objects.filter(id=household_id).first()
-        if household is None:
-            raise CommandError(f"Household id={household_id} introuvable")
+        fast = opts["fast"]
+        if fast and not supports_fast_import():
+            self.stdout.write(self.style.WARNING("--fast n'est disponible que sur PostgreSQL : import ORM par lots."))
+            fast = False
+        elif fast and opts["dry_run"]:
+            self.stdout.write(self.style.WARNING("--fast est ignoré en --dry-run."))
+            fast = False
 
-        payload = json.loads(json_path.read_text(encoding="utf-8"))
-        items = payload.get("items")
-        if not isinstance(items, list):
-            raise CommandError("JSON invalide: clé 'items' attendue (liste)")
+        household_ids = self._resolve_households(opts)
+        options = {
+            "mode": mode,
+            "overwrite_price": overwrite_price,
+            "batch_size": batch_size,
+            "deactivate_missing": opts["deactivate_missing"],
+            "dry_run": opts["dry_run"],
+            "fast": fast,
+        }
 
-        if mode == "replace":
-            deleted, _ = ReferenceItem.objects.filter(household=household).delete()
-            self.stdout.write(self.style.WARNING(f"Catalogue supprimé: {deleted} objets supprimés."))
+        def _rows():
+            return (row for row in map(normalize_row, iter_catalog_rows(json_path, opts["format"])) if row is not None)
 
-        def _dec(x):
-            return None if x is None or x == "" else Decimal(str(x))
+        # Le fichier est lu une seule fois : son empreinte est calculée pendant l'import
+        # (un fichier identique au dernier import n'écrit rien, cf. import_catalog_rows)
+        try:
+            if len(household_ids) == 1:
+                self._import_single(household_ids[0], _rows(), options, opts["verbosity"])
+            else:
+                rows = list(_rows())
+                jobs = opts["jobs"] or os.cpu_count() or 1
+                self._import_many(household_ids, rows, options, jobs)
+        except CatalogFormatError as e:
+            raise CommandError(str(e)) from e
 
-        created = 0
-        updated = 0
+    def _resolve_households(self, opts) -> list[int]:
+        if opts["all"]:
+            household_ids = list(Household.objects.order_by("id").values_list("id", flat=True))
+            if not household_ids:
+                raise CommandError("Aucun household en base")
+            return household_ids
 
-        for it in items:
-            name = (it.get("name") or "").strip()
-            if not name:
-                continue
+        requested = _parse_household_ids(opts["household_id"])
+        if not requested:
+            raise CommandError("--household-id: aucun ID fourni")
 
-            aisle = it.get("aisle", ReferenceItem.AISLE_AL_FRUITS_VEG)
-            default_unit = it.get("default_unit", "unit")
-
-            unit_price = _dec(it.get("default_unit_price"))
-            qty_value = _dec(it.get("default_qty_value"))
-            note = it.get("default_note", "")
-
-            obj, was_created = ReferenceItem.objects.get_or_create(
-                household=household,
-                name=name,
-                defaults={
-                    "aisle": aisle,
-                    "default_unit": default_unit,
-                    "default_unit_price": unit_price,
-                    "default_qty_value": qty_value,
-                    "default_note": note,
-                    "is_active": True,
-                },
-            )
-
-            if was_created:
-                created += 1
-                continue
+        found = set(Household.objects.filter(id__in=requested).values_list("id", flat=True))
+        missing = [hid for hid in requested if hid not in found]
+        if missing:
+            raise CommandError(f"Household id={', '.join(map(str, missing))} introuvable")
+        return requested
+
+    def _import_single(self, household_id, rows, options, verbosity):
+        started = time.monotonic()
+
+        def _progress(read: int) -> None:
+            if verbosity >= 1:
+                self.stdout.write(f"  {read} lignes traitées ({self._rate(read, started):.0f} lignes/s)")
+
+        result = import_catalog_rows(household_id, rows, on_chunk=_progress, **options)
 
-            dirty = False
-
-            if obj.aisle != aisle:
-                obj.aisle = aisle
-                dirty = True
-            if obj.default_unit != default_unit:
-                obj.default_unit = default_unit
-                dirty = True
-            if qty_value is not None and obj.default_qty_value != qty_value:
-                obj.default_qty_value = qty_value
-                dirty = True
-            if note and obj.default_note != note:
-                obj.default_note = note
-                dirty = True
-
-            if unit_price is not None:
-                if overwrite_price or obj.default_unit_price is None:
-                    if obj.default_unit_price != unit_price:
-                        obj.default_unit_price = unit_price
-                        dirty = True
-
-            if dirty:
-                obj.save()
-                updated += 1
+        if result.skipped:
+            self.stdout.write(self.style.SUCCESS(
+                f"Catalogue inchangé pour household={household_id} (même fichier que le dernier import) : rien à faire."
+            ))
+            return
+        if options["mode"] == "replace":
+            self.stdout.write(self.style.WARNING(f"Catalogue supprimé: {result.deleted} objets supprimés."))
+        if result.diff is not None:
+            self._write_diff(result.diff, options["deactivate_missing"])
 
+        prefix = "Dry-run (rien n'a été écrit)" if options["dry_run"] else "Import terminé"
         self.stdout.write(self.style.SUCCESS(
-            f"Import terminé pour household={household_id}: created={created}, updated={updated}"
-        ))
\ No newline at end of file
+            f"{prefix} pour household={household_id}: {self._counts(result, options)} "
+            f"({result.rows} lignes, {self._rate(result.rows, started):.0f} lignes/s)"
+        ))
+
+    def _import_many(self, household_ids, rows, options, jobs):
+        started = time.monotonic()
+        jobs = max(1, min(jobs, len(household_ids)))
+        self.stdout.write(f"{len(rows)} lignes lues, import dans {len(household_ids)} foyers ({jobs} processus)…")
+
+        results = {}
+        for result in import_catalog_for_households(household_ids, rows, jobs=jobs, **options):
+            results[result.household_id] = result
+
+        names = dict(Household.objects.filter(id__in=household_ids).values_list("id", "name"))
+        failed = []
+        for household_id in household_ids:
+            r = results[household_id]
+            label = f"household={household_id} ({names.get(household_id, '?')})"
+            if r.error:
+                failed.append(household_id)
+                self.stdout.write(self.style.ERROR(f"  {label}: ÉCHEC {r.error}"))
+            elif r.skipped:
+                self.stdout.write(f"  {label}: inchangé")
+            else:
+                self.stdout.write(f"  {label}: {self._counts(r, options)}")
+
+        ok = [r for r in results.values() if not r.error]
+        total = ImportResult(
+            0,
+            created=sum(r.created for r in ok),
+            updated=sum(r.updated for r in ok),
+            unchanged=sum(r.unchanged for r in ok),
+            deactivated=sum(r.deactivated for r in ok),
+            deleted=sum(r.deleted for r in ok),
+        )
+        elapsed = time.monotonic() - started
+        prefix = "Dry-run (rien n'a été écrit)" if options["dry_run"] else "Import terminé"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} pour {len(ok)}/{len(household_ids)} foyers: {self._counts(total, options)} ({elapsed:.1f} s)"
+        ))
+        if failed:
+            raise CommandError(f"Import en échec pour household={', '.join(map(str, failed))}")
+
+    @staticmethod
+    def _counts(result: ImportResult, options) -> str:
+        counts = f"created={result.created}, updated={result.updated}, unchanged={result.unchanged}"
+        if options["deactivate_missing"]:
+            counts += f", deactivated={result.deactivated}"
+        if options["mode"] == "replace":
+            counts += f", deleted={result.deleted}"
+        return counts
+
+    def _write_diff(self, diff, deactivate_missing: bool) -> None:
+        sections = [
+            ("insert", "À créer"),
+            ("update", "À mettre à jour"),
+            ("deactivate", "Absents du fichier" + (" (archivés)" if deactivate_missing else " (conservés sans --deactivate-missing)")),
+        ]
+        for key, title in sections:
+            names = diff[key]
+            self.stdout.write(f"{title}: {len(names)}")
+            for name in names[: self.DIFF_PREVIEW]:
+                self.stdout.write(f"  {'+' if key == 'insert' else '~' if key == 'update' else '-'} {name}")
+            if len(names) > self.DIFF_PREVIEW:
+                self.stdout.write(f"  … et {len(names) - self.DIFF_PREVIEW} autres")
+
+    @staticmethod
+    def _rate(rows: int, started: float) -> float:
+        elapsed = time.monotonic() - started
+        return rows / elapsed if elapsed > 0 else 0.0
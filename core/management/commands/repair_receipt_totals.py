@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Receipt
+
+
+class Command(BaseCommand):
+    help = "Recalcule (en une requête) depuis leurs lignes les totaux stockés des tickets qui ont dérivé."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Affiche seulement le nombre de tickets dont les totaux stockés ont dérivé.",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["check"]:
+            drifted = Receipt.objects.with_drifted_totals().count()
+            self.stdout.write(f"Tickets avec totaux incohérents: {drifted}")
+            return
+
+        with transaction.atomic():
+            updated = Receipt.objects.recompute_totals()
+
+        self.stdout.write(self.style.SUCCESS(f"Totaux recalculés pour {updated} tickets incohérents."))
@@ -0,0 +1,111 @@
+"""
+Cache des foyers de chaque utilisateur (ensemble des household_id), partagé entre requêtes.
+
+Stocké dans le cache Django (settings.CACHES, local-memory par défaut) et invalidé
+par les signaux post_save / post_delete de Membership (cf. core/signals.py).
+
+L'invalidation n'atteint que le cache où elle est faite : avec un cache local au processus
+et plusieurs processus, un membre retiré garde l'accès ailleurs jusqu'à l'expiration de
+l'entrée. Les entrées y vivent donc quelques secondes seulement ; avec un cache partagé
+(Redis, Memcached, base de données), elles durent CACHE_TIMEOUT.
+"""
+from __future__ import annotations
+
+import threading
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+# Cache partagé : filet de sécurité si une invalidation est manquée (ex: update() en masse)
+CACHE_TIMEOUT = 15 * 60
+# Cache local au processus : délai maximal avant qu'un retrait soit vu par les autres processus
+LOCAL_CACHE_TIMEOUT = 5
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _key(user_id: int) -> str:
+    return f"core:household_ids:{user_id}"
+
+
+def is_process_local() -> bool:
+    """
+    True si le cache par défaut n'est pas partagé entre processus.
+    """
+    return isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _timeout() -> int:
+    return LOCAL_CACHE_TIMEOUT if is_process_local() else CACHE_TIMEOUT
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def household_ids_for(user) -> frozenset[int]:
+    """
+    Ids des foyers dont l'utilisateur (ou son id) est membre.
+    """
+    from .models import Membership
+
+    user_id = getattr(user, "pk", user)
+    key = _key(user_id)
+
+    ids = cache.get(key)
+    if ids is not None:
+        _count("hits")
+        return ids
+
+    _count("misses")
+    ids = frozenset(Membership.objects.filter(user_id=user_id).values_list("household_id", flat=True))
+    cache.set(key, ids, _timeout())
+    return ids
+
+
+async def ahousehold_ids_for(user) -> frozenset[int]:
+    """
+    household_ids_for() pour les vues async : cache et ORM sans bloquer la boucle.
+    """
+    from .models import Membership
+
+    user_id = getattr(user, "pk", user)
+    key = _key(user_id)
+
+    ids = await cache.aget(key)
+    if ids is not None:
+        _count("hits")
+        return ids
+
+    _count("misses")
+    ids = frozenset([
+        household_id
+        async for household_id in Membership.objects.filter(user_id=user_id).values_list("household_id", flat=True)
+    ])
+    await cache.aset(key, ids, _timeout())
+    return ids
+
+
+def invalidate(user_id: int) -> None:
+    """
+    Supprime l'entrée tout de suite, puis à nouveau au COMMIT : une lecture concurrente
+    faite avant le commit ne peut pas laisser en cache l'ancien état.
+    Seul le cache de ce processus est touché s'il est local (cf. LOCAL_CACHE_TIMEOUT).
+    """
+    key = _key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def stats() -> dict[str, float]:
+    """
+    Compteurs du processus courant.
+    """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else 0.0}
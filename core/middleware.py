@@ -0,0 +1,44 @@
+"""
+Middlewares du projet.
+"""
+from __future__ import annotations
+
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware:
+    """
+    WhiteNoise utilisable dans une chaîne async (ASGI).
+
+    WhiteNoiseMiddleware n'est que synchrone : Django fait alors passer chaque requête
+    par un thread, vues async comprises. Ici seules les requêtes sous STATIC_URL passent
+    par WhiteNoise (son __call__ public, dans un thread) ; les autres restent dans la boucle.
+    Les fichiers de WHITENOISE_ROOT (servis hors STATIC_URL) ne sont pas pris en charge.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_prefix = urlsplit(settings.STATIC_URL or "").path or None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Fichier statique introuvable : la requête continue dans la chaîne async
+            self.whitenoise = WhiteNoiseMiddleware(async_to_sync(get_response))
+        else:
+            self.whitenoise = WhiteNoiseMiddleware(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.whitenoise(request)
+
+    async def __acall__(self, request):
+        if self.static_prefix and request.path_info.startswith(self.static_prefix):
+            return await sync_to_async(self.whitenoise, thread_sensitive=False)(request)
+        return await self.get_response(request)
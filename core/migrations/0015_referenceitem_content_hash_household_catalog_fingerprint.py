@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-16 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_listitem_unit_price_referenceitem_default_unit_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='household',
+            name='catalog_fingerprint',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='referenceitem',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
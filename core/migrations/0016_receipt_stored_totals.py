@@ -0,0 +1,54 @@
+# Generated by Django 5.2.11 on 2026-10-16 22:48
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Receipt = apps.get_model("core", "Receipt")
+    ReceiptItem = apps.get_model("core", "ReceiptItem")
+
+    lines = ReceiptItem.objects.filter(receipt=models.OuterRef("pk")).order_by().values("receipt")
+    money = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def _agg(expr, default, output_field):
+        return Coalesce(
+            models.Subquery(lines.annotate(v=expr).values("v"), output_field=output_field),
+            models.Value(default, output_field=output_field),
+        )
+
+    Receipt.objects.update(
+        estimated_total=_agg(models.Sum("estimated_price"), Decimal("0.00"), money),
+        actual_total=_agg(models.Sum("actual_price"), Decimal("0.00"), money),
+        missing_actual_count=_agg(
+            models.Count("id", filter=models.Q(actual_price__isnull=True)), 0, models.IntegerField()
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_referenceitem_content_hash_household_catalog_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='actual_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='estimated_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='receipt',
+            name='missing_actual_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
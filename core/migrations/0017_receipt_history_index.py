@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_receipt_stored_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='receipt',
+            index=models.Index(fields=['household', '-purchased_at', '-id'], name='receipt_hh_purchased_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.11 on 2026-10-16 22:52
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    ShoppingList = apps.get_model("core", "ShoppingList")
+    ListItem = apps.get_model("core", "ListItem")
+
+    items = ListItem.objects.filter(shopping_list=models.OuterRef("pk")).order_by().values("shopping_list")
+    checked = models.Q(is_checked=True)
+    money = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def _agg(expr, default, output_field):
+        return Coalesce(
+            models.Subquery(items.annotate(v=expr).values("v"), output_field=output_field),
+            models.Value(default, output_field=output_field),
+        )
+
+    ShoppingList.objects.update(
+        item_count=_agg(models.Count("id"), 0, models.IntegerField()),
+        checked_count=_agg(models.Count("id", filter=checked), 0, models.IntegerField()),
+        missing_estimate_count=_agg(
+            models.Count("id", filter=checked & models.Q(estimated_price__isnull=True)), 0, models.IntegerField()
+        ),
+        running_total=_agg(models.Sum("estimated_price", filter=checked), Decimal("0.00"), money),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_receipt_history_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='checked_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='missing_estimate_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='running_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
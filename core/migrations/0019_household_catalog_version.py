@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-16 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_shoppinglist_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='household',
+            name='catalog_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-16 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_household_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.11 on 2026-10-16 23:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Tables journalisées : (type d'entrée, expression du foyer, jointure vers le parent)
+LOGGED_TABLES = {
+    "core_listitem": ("list_item", "p.household_id", "JOIN core_shoppinglist p ON p.id = t.shopping_list_id"),
+    "core_referenceitem": ("reference_item", "t.household_id", ""),
+    "core_receiptitem": ("receipt_item", "p.household_id", "JOIN core_receipt p ON p.id = t.receipt_id"),
+}
+
+# Triggers par instruction (tables de transition) : une écriture en masse coûte un seul
+# INSERT ensembliste dans le journal. Aucun verrou : id vient de la séquence de la table,
+# txid de la transaction qui écrit ; l'ordre de lecture (txid, id) et l'arrêt aux
+# transactions en cours sont assurés à la lecture (cf. core/sync.py).
+LOG_INSERT_SQL = """
+        INSERT INTO core_changelogentry (household_id, txid, kind, object_id, op, created_at)
+        SELECT {household}, pg_current_xact_id()::text::bigint, '{kind}', t.id, '{op}', now()
+        FROM {rows} t {join}
+        ORDER BY t.id;"""
+
+LOG_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION {table}_log_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN{log_delete}
+    ELSE{log_upsert}
+    END IF;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER {table}_log_insert AFTER INSERT ON {table}
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {table}_log_changes();
+CREATE TRIGGER {table}_log_update AFTER UPDATE ON {table}
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {table}_log_changes();
+CREATE TRIGGER {table}_log_delete AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION {table}_log_changes();
+"""
+
+# Les suppressions en cascade d'un foyer écrivent encore dans le journal : purge après coup
+PURGE_SQL = """
+CREATE OR REPLACE FUNCTION core_household_purge_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM core_changelogentry WHERE household_id IN (SELECT id FROM old_rows);
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER core_household_purge_changes AFTER DELETE ON core_household
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION core_household_purge_changes();
+"""
+
+
+def _log_sql() -> str:
+    parts = []
+    for table, (kind, household, join) in LOGGED_TABLES.items():
+        log = {"kind": kind, "household": household, "join": join}
+        parts.append(
+            LOG_FUNCTION_SQL.format(
+                table=table,
+                log_delete=LOG_INSERT_SQL.format(rows="old_rows", op="delete", **log),
+                log_upsert=LOG_INSERT_SQL.format(rows="new_rows", op="upsert", **log),
+            )
+        )
+    return "".join(parts) + PURGE_SQL
+
+
+def _drop_log_sql() -> str:
+    parts = [
+        f"DROP TRIGGER IF EXISTS {table}_log_{event} ON {table};"
+        for table in LOGGED_TABLES
+        for event in ("insert", "update", "delete")
+    ]
+    parts += [f"DROP FUNCTION IF EXISTS {table}_log_changes();" for table in LOGGED_TABLES]
+    parts += [
+        "DROP TRIGGER IF EXISTS core_household_purge_changes ON core_household;",
+        "DROP FUNCTION IF EXISTS core_household_purge_changes();",
+    ]
+    return "\n".join(parts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_shoppinglist_receipt_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('txid', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('list_item', 'Item de liste'), ('reference_item', 'Produit du catalogue'), ('receipt_item', 'Ligne de ticket')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Création / modification'), ('delete', 'Suppression')], max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('household', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='changes', to='core.household')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['household', 'txid', 'id'], name='changelog_household_txid_idx')],
+            },
+        ),
+        migrations.RunSQL(_log_sql(), _drop_log_sql()),
+    ]
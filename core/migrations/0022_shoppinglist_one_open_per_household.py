@@ -0,0 +1,37 @@
+# Generated by Django 5.2.11 on 2026-10-16 23:17
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def close_duplicate_open_lists(apps, schema_editor):
+    """
+    Foyers à plusieurs listes ouvertes : seule la plus récente reste ouverte
+    (celle que get_or_create_open_list renvoyait), les autres sont clôturées.
+    """
+    ShoppingList = apps.get_model("core", "ShoppingList")
+
+    open_lists = ShoppingList.objects.filter(closed_at__isnull=True)
+    newest = (
+        open_lists.filter(household=models.OuterRef("household"))
+        .order_by("-created_at", "-id")
+        .values("id")[:1]
+    )
+    open_lists.exclude(id=models.Subquery(newest)).update(
+        closed_at=timezone.now(), version=models.F("version") + 1
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_changelog'),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_open_lists, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(condition=models.Q(('closed_at__isnull', True)), fields=('household',), name='shoppinglist_one_open_per_household'),
+        ),
+    ]
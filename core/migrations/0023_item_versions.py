@@ -0,0 +1,28 @@
+# Generated by Django 5.2.11 on 2026-10-16 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_shoppinglist_one_open_per_household'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listitem',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='receiptitem',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='referenceitem',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
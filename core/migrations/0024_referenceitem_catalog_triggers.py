@@ -0,0 +1,72 @@
+# Generated by Django 5.2.11 on 2026-10-17 10:41
+
+from django.db import migrations
+
+
+# Colonnes de ReferenceItem.CATALOG_FIELDS : leur modification invalide l'empreinte du catalogue
+CATALOG_COLUMNS = [
+    "name",
+    "aisle",
+    "default_unit",
+    "default_qty_value",
+    "default_note",
+    "default_unit_price",
+    "is_active",
+]
+
+# Triggers par instruction, comme le journal (0021) : toute écriture dans le catalogue, y compris
+# update(), delete() en masse, cascades et import COPY, incrémente catalog_version des foyers
+# touchés (clé du cache de la page catalogue) et vide leur empreinte d'import. Une modification
+# qui ne touche aucune colonne du catalogue (sélection, content_hash) garde l'empreinte.
+CATALOG_SQL = """
+CREATE OR REPLACE FUNCTION core_referenceitem_bump_catalog() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE core_household h SET catalog_version = h.catalog_version + 1, catalog_fingerprint = ''
+        WHERE h.id IN (SELECT household_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE core_household h SET catalog_version = h.catalog_version + 1, catalog_fingerprint = ''
+        WHERE h.id IN (SELECT household_id FROM old_rows);
+    ELSE
+        UPDATE core_household h
+        SET catalog_version = h.catalog_version + 1,
+            catalog_fingerprint = CASE WHEN c.catalog_changed THEN '' ELSE h.catalog_fingerprint END
+        FROM (
+            SELECT n.household_id, bool_or(({old_columns}) IS DISTINCT FROM ({new_columns})) AS catalog_changed
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            GROUP BY n.household_id
+        ) c
+        WHERE h.id = c.household_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER core_referenceitem_catalog_insert AFTER INSERT ON core_referenceitem
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION core_referenceitem_bump_catalog();
+CREATE TRIGGER core_referenceitem_catalog_update AFTER UPDATE ON core_referenceitem
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_referenceitem_bump_catalog();
+CREATE TRIGGER core_referenceitem_catalog_delete AFTER DELETE ON core_referenceitem
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION core_referenceitem_bump_catalog();
+""".format(
+    old_columns=", ".join(f"o.{column}" for column in CATALOG_COLUMNS),
+    new_columns=", ".join(f"n.{column}" for column in CATALOG_COLUMNS),
+)
+
+DROP_CATALOG_SQL = """
+DROP TRIGGER IF EXISTS core_referenceitem_catalog_insert ON core_referenceitem;
+DROP TRIGGER IF EXISTS core_referenceitem_catalog_update ON core_referenceitem;
+DROP TRIGGER IF EXISTS core_referenceitem_catalog_delete ON core_referenceitem;
+DROP FUNCTION IF EXISTS core_referenceitem_bump_catalog();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_item_versions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CATALOG_SQL, DROP_CATALOG_SQL),
+    ]
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import hashlib
+import operator
 from decimal import Decimal, ROUND_HALF_UP
+from functools import reduce
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
@@ -39,6 +42,255 @@ def _money_2(d: Decimal) -> Decimal:
     return d.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
+def reference_content_hash(aisle, default_unit, default_qty_value, default_note, default_unit_price) -> str:
+    """
+    Empreinte du contenu importable d'un ReferenceItem (indépendante de l'échelle des décimaux).
+    """
+    parts = [
+        aisle or "",
+        default_unit or "",
+        "" if default_qty_value is None else _format_decimal_human(Decimal(default_qty_value)),
+        default_note or "",
+        "" if default_unit_price is None else _format_decimal_human(Decimal(default_unit_price)),
+    ]
+    return hashlib.blake2b("\x1f".join(parts).encode(), digest_size=16).hexdigest()
+
+
+# =========================================================
+# QuerySets : accès restreint aux foyers d'un utilisateur
+# =========================================================
+class HouseholdScopedQuerySet(models.QuerySet):
+    """
+    for_user(user) filtre sur les foyers dont l'utilisateur est membre, dans la
+    même requête que le chargement, et charge les relations utiles aux vues.
+    Les ids des foyers viennent du cache d'appartenance (cf. membership_cache).
+    """
+
+    # Chemin vers la FK household depuis le modèle
+    household_field = "household"
+    # Relations chargées avec l'objet (select_related)
+    user_related: tuple[str, ...] = ()
+
+    def for_user(self, user):
+        from .membership_cache import household_ids_for
+
+        return self.for_household_ids(household_ids_for(user))
+
+    def for_household_ids(self, household_ids):
+        """
+        for_user() à partir des ids de foyers déjà connus (vues async : ahousehold_ids_for).
+        """
+        qs = self.filter(**{f"{self.household_field}__in": household_ids})
+        if self.user_related:
+            qs = qs.select_related(*self.user_related)
+        return qs
+
+
+class VersionedQuerySetMixin:
+    """
+    Pour les modèles à champ `version` (ETag des pages de détail, écritures conditionnelles) :
+    incrémenté à chaque écriture.
+
+    Verrouillage optimiste : une écriture ne passe que si la ligne est encore à la version lue
+    (UPDATE ... WHERE version = n). Sinon l'appelant renvoie le conflit au client au lieu de
+    sérialiser les écritures derrière un verrou ; tant qu'elle passe, l'état lu est bien celui
+    remplacé, et les deltas calculés dessus (compteurs, totaux) restent exacts.
+    """
+
+    def bump_version(self, **fields) -> int:
+        """
+        Incrémente version ; `fields` sont mis à jour dans le même UPDATE.
+        """
+        return self.update(version=models.F("version") + 1, **fields)
+
+    def update_if_version(self, obj, fields) -> bool:
+        """
+        Écrit `fields` de obj si sa ligne est encore à obj.version, et incrémente version.
+        False si la ligne a changé (ou disparu) depuis sa lecture ; sinon obj.version suit la base.
+        """
+        values = {name: getattr(obj, obj._meta.get_field(name).attname) for name in fields}
+        if not self.filter(pk=obj.pk, version=obj.version).bump_version(**values):
+            return False
+        obj.version += 1
+        return True
+
+    def at_versions(self, objs):
+        """
+        Lignes encore à la version lue de chaque objet : base des écritures conditionnelles
+        groupées (bulk_update, delete), dont le nombre de lignes touchées révèle un conflit.
+        """
+        objs = list(objs)
+        if not objs:
+            return self.none()
+        return self.filter(reduce(operator.or_, (models.Q(pk=obj.pk, version=obj.version) for obj in objs)))
+
+    def changed_versions(self, versions: dict[int, int]) -> set[int]:
+        """
+        Parmi {id: version lue}, les ids dont la ligne a changé ou disparu depuis la lecture.
+        """
+        current = dict(self.filter(pk__in=list(versions)).values_list("pk", "version"))
+        return {pk for pk, version in versions.items() if current.get(pk) != version}
+
+
+class HouseholdQuerySet(HouseholdScopedQuerySet):
+    household_field = "pk"
+
+
+class ShoppingListQuerySet(VersionedQuerySetMixin, HouseholdScopedQuerySet):
+    user_related = ("household",)
+
+    def add_to_counters(
+        self, *, items: int = 0, checked: int = 0, missing: int = 0, total: Decimal = Decimal("0")
+    ) -> int:
+        """
+        Applique un delta aux compteurs stockés (UPDATE ... SET x = x + delta) et incrémente version.
+        """
+        return self.bump_version(
+            item_count=models.F("item_count") + items,
+            checked_count=models.F("checked_count") + checked,
+            missing_estimate_count=models.F("missing_estimate_count") + missing,
+            running_total=models.F("running_total") + total,
+        )
+
+    def recompute_counters(self) -> int:
+        """
+        Recalcule les compteurs stockés depuis les items, en une seule requête, pour les seules
+        listes qui ont dérivé : leur version est incrémentée (ETag, instantané). Renvoie leur nombre.
+        """
+        drifted = self.with_drifted_counters().values("pk")
+        return self.filter(pk__in=drifted).bump_version(**_list_counters_from_items())
+
+    def with_computed_counters(self):
+        """
+        Annote computed_item_count / computed_checked_count / computed_missing_estimate_count
+        / computed_running_total.
+        """
+        return self.annotate(**{f"computed_{name}": expr for name, expr in _list_counters_from_items().items()})
+
+    def with_drifted_counters(self):
+        """
+        Listes dont les compteurs stockés ne correspondent plus aux items.
+        """
+        return self.with_computed_counters().filter(
+            ~models.Q(item_count=models.F("computed_item_count"))
+            | ~models.Q(checked_count=models.F("computed_checked_count"))
+            | ~models.Q(missing_estimate_count=models.F("computed_missing_estimate_count"))
+            | ~models.Q(running_total=models.F("computed_running_total"))
+        )
+
+    def with_summary(self):
+        """
+        Ticket éventuel (select_related) et focus_missing_estimate_id (prochain item coché
+        sans prix) dans la même requête ; les compteurs sont stockés sur la liste.
+        """
+        checked_missing = ListItem.objects.filter(
+            shopping_list=models.OuterRef("pk"), is_checked=True, estimated_price__isnull=True
+        )
+        return self.select_related("receipt").annotate(
+            focus_missing_estimate_id=models.Subquery(
+                checked_missing.order_by("aisle", "created_at", "id").values("id")[:1]
+            )
+        )
+
+
+class ReferenceItemQuerySet(VersionedQuerySetMixin, HouseholdScopedQuerySet):
+    pass
+
+
+class ListItemQuerySet(VersionedQuerySetMixin, HouseholdScopedQuerySet):
+    household_field = "shopping_list__household"
+    user_related = ("shopping_list",)
+
+
+class ReceiptQuerySet(VersionedQuerySetMixin, HouseholdScopedQuerySet):
+    user_related = ("household", "shopping_list")
+
+    def add_to_totals(self, *, estimated: Decimal = Decimal("0"), actual: Decimal = Decimal("0"), missing: int = 0) -> int:
+        """
+        Applique un delta aux totaux stockés (UPDATE ... SET x = x + delta) et incrémente version.
+        """
+        return self.bump_version(
+            estimated_total=models.F("estimated_total") + estimated,
+            actual_total=models.F("actual_total") + actual,
+            missing_actual_count=models.F("missing_actual_count") + missing,
+        )
+
+    def recompute_totals(self) -> int:
+        """
+        Recalcule les totaux stockés depuis les lignes, en une seule requête, pour les seuls
+        tickets qui ont dérivé : leur version est incrémentée (ETag, instantané). Renvoie leur nombre.
+        """
+        drifted = self.with_drifted_totals().values("pk")
+        return self.filter(pk__in=drifted).bump_version(**_receipt_totals_from_lines())
+
+    def with_computed_totals(self):
+        """
+        Annote computed_estimated_total / computed_actual_total / computed_missing_actual_count.
+        """
+        return self.annotate(**{f"computed_{name}": expr for name, expr in _receipt_totals_from_lines().items()})
+
+    def with_drifted_totals(self):
+        """
+        Tickets dont les totaux stockés ne correspondent plus aux lignes.
+        """
+        return self.with_computed_totals().filter(
+            ~models.Q(estimated_total=models.F("computed_estimated_total"))
+            | ~models.Q(actual_total=models.F("computed_actual_total"))
+            | ~models.Q(missing_actual_count=models.F("computed_missing_actual_count"))
+        )
+
+
+def _receipt_totals_from_lines() -> dict[str, models.Expression]:
+    """
+    Sous-requêtes corrélées (sur OuterRef("pk") d'un Receipt) calculant les totaux des lignes.
+    """
+    lines = ReceiptItem.objects.filter(receipt=models.OuterRef("pk")).order_by().values("receipt")
+    money = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def _agg(expr, default, output_field):
+        return models.functions.Coalesce(
+            models.Subquery(lines.annotate(v=expr).values("v"), output_field=output_field),
+            models.Value(default, output_field=output_field),
+        )
+
+    return {
+        "estimated_total": _agg(models.Sum("estimated_price"), Decimal("0.00"), money),
+        "actual_total": _agg(models.Sum("actual_price"), Decimal("0.00"), money),
+        "missing_actual_count": _agg(
+            models.Count("id", filter=models.Q(actual_price__isnull=True)), 0, models.IntegerField()
+        ),
+    }
+
+
+def _list_counters_from_items() -> dict[str, models.Expression]:
+    """
+    Sous-requêtes corrélées (sur OuterRef("pk") d'une ShoppingList) calculant les compteurs.
+    """
+    items = ListItem.objects.filter(shopping_list=models.OuterRef("pk")).order_by().values("shopping_list")
+    checked = models.Q(is_checked=True)
+    money = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def _agg(expr, default, output_field):
+        return models.functions.Coalesce(
+            models.Subquery(items.annotate(v=expr).values("v"), output_field=output_field),
+            models.Value(default, output_field=output_field),
+        )
+
+    return {
+        "item_count": _agg(models.Count("id"), 0, models.IntegerField()),
+        "checked_count": _agg(models.Count("id", filter=checked), 0, models.IntegerField()),
+        "missing_estimate_count": _agg(
+            models.Count("id", filter=checked & models.Q(estimated_price__isnull=True)), 0, models.IntegerField()
+        ),
+        "running_total": _agg(models.Sum("estimated_price", filter=checked), Decimal("0.00"), money),
+    }
+
+
+class ReceiptItemQuerySet(VersionedQuerySetMixin, HouseholdScopedQuerySet):
+    household_field = "receipt__household"
+    user_related = ("receipt",)
+
+
 # =========================================================
 # Core models
 # =========================================================
@@ -47,6 +299,15 @@ class Household(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name="households_created")
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Empreinte du dernier catalogue importé, et catalog_version, sont tenues par des triggers
+    # sur core_referenceitem (migration 0024) : toute écriture, même update() ou delete() en masse,
+    # vide l'empreinte et incrémente la version.
+    catalog_fingerprint = models.CharField(max_length=32, blank=True, default="")
+    # Clé du cache des fragments de reference_list.html
+    catalog_version = models.PositiveIntegerField(default=0)
+
+    objects = HouseholdQuerySet.as_manager()
+
     def __str__(self) -> str:
         return self.name
 
@@ -133,12 +394,55 @@ class ReferenceItem(models.Model):
     is_selected = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Empreinte de (aisle, unité, qté, note, prix) : permet à l'import de sauter les lignes inchangées
+    content_hash = models.CharField(max_length=32, blank=True, default="", editable=False)
+
+    # Champs couverts par content_hash
+    CONTENT_FIELDS = frozenset(["aisle", "default_unit", "default_qty_value", "default_note", "default_unit_price"])
+    # Champs dont la modification invalide l'empreinte catalogue du foyer (cf. migration 0024)
+    CATALOG_FIELDS = CONTENT_FIELDS | {"name", "is_active"}
+
+    # Incrémentée à chaque écriture : les modifications sont conditionnelles (cf. VersionedQuerySetMixin)
+    version = models.PositiveIntegerField(default=0)
+
+    objects = ReferenceItemQuerySet.as_manager()
+
     class Meta:
         unique_together = [("household", "name")]
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.content_hash = self.compute_content_hash()
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and self.CONTENT_FIELDS.intersection(update_fields):
+            kwargs["update_fields"] = [*update_fields, "content_hash"]
+
+        super().save(*args, **kwargs)
+
+    def save_if_version(self, update_fields) -> bool:
+        """
+        save(update_fields=...) conditionnel (cf. VersionedQuerySetMixin.update_if_version) :
+        False, rien n'est écrit, si le produit a changé depuis sa lecture.
+        """
+        self.content_hash = self.compute_content_hash()
+        fields = list(update_fields)
+        if self.CONTENT_FIELDS.intersection(fields):
+            fields.append("content_hash")
+
+        return ReferenceItem.objects.update_if_version(self, fields)
+
+    def compute_content_hash(self) -> str:
+        return reference_content_hash(
+            self.aisle,
+            self.default_unit,
+            self.default_qty_value,
+            self.default_note,
+            self.default_unit_price,
+        )
+
     @property
     def unit_label(self) -> str:
         return dict(UNIT_CHOICES).get(self.default_unit, self.default_unit)
@@ -166,6 +470,28 @@ class ShoppingList(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     closed_at = models.DateTimeField(null=True, blank=True)
 
+    # Compteurs des items, maintenus par deltas à chaque ajout / cochage / modification /
+    # suppression de ListItem (cf. ShoppingListQuerySet.add_to_counters, commande check_list_counters)
+    item_count = models.IntegerField(default=0)
+    checked_count = models.IntegerField(default=0)
+    missing_estimate_count = models.IntegerField(default=0)
+    running_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+
+    # Incrémentée par toute vue qui modifie la liste ou ses items (ETag de shopping_list_detail)
+    version = models.PositiveIntegerField(default=0)
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Une seule liste ouverte par foyer (cf. get_or_create_open_lists : INSERT ... ON CONFLICT)
+            models.UniqueConstraint(
+                fields=["household"],
+                condition=models.Q(closed_at__isnull=True),
+                name="shoppinglist_one_open_per_household",
+            ),
+        ]
+
     def __str__(self) -> str:
         status = "ouverte" if self.closed_at is None else "clôturée"
         return f"{self.household.name} — {self.name} ({status})"
@@ -201,13 +527,18 @@ class ListItem(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.PROTECT, related_name="list_items_created")
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Incrémentée à chaque écriture : les modifications sont conditionnelles (cf. VersionedQuerySetMixin)
+    version = models.PositiveIntegerField(default=0)
+
+    objects = ListItemQuerySet.as_manager()
+
     def __str__(self) -> str:
         return self.name
 
-    def set_checked(self, user, checked: bool) -> None:
+    def set_checked(self, user, checked: bool, *, at=None) -> None:
         self.is_checked = checked
         if checked:
-            self.checked_at = timezone.now()
+            self.checked_at = at or timezone.now()
             self.checked_by = user
         else:
             self.checked_at = None
@@ -237,6 +568,19 @@ class ListItem(models.Model):
         total = self.compute_total()
         self.estimated_price = total
 
+    def counters_contribution(self) -> tuple[int, int, int, Decimal]:
+        """
+        Part de l'item dans les compteurs de la liste : (items, cochés, cochés sans prix, total coché).
+        """
+        if not self.is_checked:
+            return (1, 0, 0, Decimal("0"))
+        return (
+            1,
+            1,
+            1 if self.estimated_price is None else 0,
+            self.estimated_price or Decimal("0"),
+        )
+
 
 class Receipt(models.Model):
     household = models.ForeignKey(Household, on_delete=models.CASCADE, related_name="receipts")
@@ -248,28 +592,25 @@ class Receipt(models.Model):
     paper_total = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
-    def __str__(self) -> str:
-        return f"Receipt #{self.id} — {self.household.name}"
+    # Totaux des lignes, maintenus par deltas à chaque création / modification / suppression
+    # de ReceiptItem (cf. ReceiptQuerySet.add_to_totals, commande repair_receipt_totals)
+    estimated_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    actual_total = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal("0.00"))
+    missing_actual_count = models.IntegerField(default=0)
 
-    @property
-    def estimated_total(self) -> Decimal:
-        s = Decimal("0.00")
-        for it in self.items.all():
-            if it.estimated_price is not None:
-                s += it.estimated_price
-        return s
+    # Incrémentée par toute vue qui modifie le ticket ou ses lignes (ETag de receipt_detail)
+    version = models.PositiveIntegerField(default=0)
 
-    @property
-    def actual_total(self) -> Decimal:
-        s = Decimal("0.00")
-        for it in self.items.all():
-            if it.actual_price is not None:
-                s += it.actual_price
-        return s
+    objects = ReceiptQuerySet.as_manager()
 
-    @property
-    def missing_actual_count(self) -> int:
-        return sum(1 for it in self.items.all() if it.actual_price is None)
+    class Meta:
+        indexes = [
+            # Historique paginé par clé (receipt_list) : filtre foyer + tri (-purchased_at, -id)
+            models.Index(fields=["household", "-purchased_at", "-id"], name="receipt_hh_purchased_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Receipt #{self.id} — {self.household.name}"
 
 
 class ReceiptItem(models.Model):
@@ -284,8 +625,75 @@ class ReceiptItem(models.Model):
 
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Incrémentée à chaque écriture : les modifications sont conditionnelles (cf. VersionedQuerySetMixin)
+    version = models.PositiveIntegerField(default=0)
+
+    objects = ReceiptItemQuerySet.as_manager()
+
     class Meta:
         ordering = ["position", "id"]
 
     def __str__(self) -> str:
-        return f"{self.position}. {self.name}"
\ No newline at end of file
+        return f"{self.position}. {self.name}"
+
+    def totals_contribution(self) -> tuple[Decimal, Decimal, int]:
+        """
+        Part de la ligne dans les totaux du ticket : (estimé, réel, manquant).
+        """
+        return (
+            self.estimated_price or Decimal("0"),
+            self.actual_price or Decimal("0"),
+            1 if self.actual_price is None else 0,
+        )
+
+
+# =========================================================
+# Journal des modifications (synchronisation par deltas)
+# =========================================================
+class ChangeLogEntry(models.Model):
+    """
+    Journal append-only des écritures sur ListItem, ReferenceItem et ReceiptItem, par foyer.
+
+    Alimenté par des triggers PostgreSQL (migration 0021), pas par save() : update(),
+    bulk_update(), delete() en masse et l'import COPY du catalogue sont journalisés aussi.
+    Aucun verrou : id vient de la séquence de la table, txid est la transaction qui a écrit
+    (pg_current_xact_id). Le flux est lu dans l'ordre (txid, id), en s'arrêtant aux
+    transactions encore en cours (cf. sync.changes_since) : un client qui a lu jusqu'à une
+    position n'y verra jamais apparaître d'entrée antérieure.
+
+    Une entrée ne porte que (type, id, opération) : la synchronisation renvoie l'état courant
+    des objets modifiés.
+    """
+
+    KIND_LIST_ITEM = "list_item"
+    KIND_REFERENCE_ITEM = "reference_item"
+    KIND_RECEIPT_ITEM = "receipt_item"
+    KIND_CHOICES = [
+        (KIND_LIST_ITEM, "Item de liste"),
+        (KIND_REFERENCE_ITEM, "Produit du catalogue"),
+        (KIND_RECEIPT_ITEM, "Ligne de ticket"),
+    ]
+
+    OP_UPSERT = "upsert"
+    OP_DELETE = "delete"
+    OP_CHOICES = [(OP_UPSERT, "Création / modification"), (OP_DELETE, "Suppression")]
+
+    # Pas de contrainte FK : les entrées sont écrites par les triggers pendant la suppression
+    # du foyer lui-même (cascade) ; un trigger sur core_household les purge ensuite.
+    # Pas d'index propre : (household, txid, id) le couvre.
+    household = models.ForeignKey(
+        Household, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="changes"
+    )
+    txid = models.BigIntegerField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["household", "txid", "id"], name="changelog_household_txid_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"#{self.txid}.{self.id} {self.op} {self.kind} {self.object_id}"
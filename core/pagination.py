@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ApiCursorPagination(CursorPagination):
+    """
+    Pagination par curseur (?cursor=...) : coût constant quelle que soit la page,
+    pas de doublon ni de trou si des lignes sont insérées entre deux pages.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    ordering = "-id"
+
+
+class ReceiptCursorPagination(ApiCursorPagination):
+    # Même ordre que l'historique des tickets (index receipt_hh_purchased_idx)
+    ordering = ("-purchased_at", "-id")
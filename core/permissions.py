@@ -1,10 +1,34 @@
 from rest_framework.permissions import BasePermission
 
+from .membership_cache import household_ids_for
+from .models import Household
+
+
+def _household_id(obj) -> int | None:
+    # Household direct
+    if isinstance(obj, Household):
+        return obj.pk
+
+    # ShoppingList, Receipt, ReferenceItem -> household
+    if hasattr(obj, "household_id"):
+        return obj.household_id
+
+    # ListItem -> shopping_list -> household
+    if hasattr(obj, "shopping_list"):
+        return obj.shopping_list.household_id
+
+    # ReceiptItem -> receipt -> household
+    if hasattr(obj, "receipt"):
+        return obj.receipt.household_id
+
+    return None
+
 
 class IsHouseholdMember(BasePermission):
     """
     Autorise l'accès si l'utilisateur est membre du household lié à l'objet.
-    Supporte Household, ShoppingList, ListItem.
+    Supporte Household, ShoppingList, ListItem, Receipt, ReceiptItem, ReferenceItem.
+    L'appartenance est lue dans le cache (cf. membership_cache), sans requête en cas de hit.
     """
 
     def has_object_permission(self, request, view, obj):
@@ -12,16 +36,5 @@ class IsHouseholdMember(BasePermission):
         if not user or not user.is_authenticated:
             return False
 
-        # Household direct
-        if obj.__class__.__name__ == "Household":
-            return obj.memberships.filter(user=user).exists()
-
-        # ShoppingList -> household
-        if hasattr(obj, "household"):
-            return obj.household.memberships.filter(user=user).exists()
-
-        # ListItem -> shopping_list -> household
-        if hasattr(obj, "shopping_list"):
-            return obj.shopping_list.household.memberships.filter(user=user).exists()
-
-        return False
+        household_id = _household_id(obj)
+        return household_id is not None and household_id in household_ids_for(user)
@@ -1,12 +1,12 @@
 from rest_framework import serializers
-from .models import Household, Membership, ShoppingList, ListItem, ReferenceItem
+from .models import Household, Membership, ShoppingList, ListItem, ReferenceItem, Receipt, ReceiptItem
 
 
 class HouseholdSerializer(serializers.ModelSerializer):
     class Meta:
         model = Household
-        fields = ["id", "name", "created_by", "created_at"]
-        read_only_fields = ["created_by", "created_at"]
+        fields = ["id", "name", "created_by", "created_at", "catalog_version"]
+        read_only_fields = ["created_by", "created_at", "catalog_version"]
 
 
 class MembershipSerializer(serializers.ModelSerializer):
@@ -27,11 +27,13 @@ class ReferenceItemSerializer(serializers.ModelSerializer):
             "default_qty_value",
             "default_unit",
             "default_note",
+            "default_unit_price",
             "is_active",
             "is_selected",
             "created_at",
+            "version",
         ]
-        read_only_fields = ["created_at"]
+        read_only_fields = ["created_at", "version"]
 
 
 class ListItemSerializer(serializers.ModelSerializer):
@@ -48,17 +50,79 @@ class ListItemSerializer(serializers.ModelSerializer):
             "is_checked",
             "checked_at",
             "checked_by",
+            "unit_price",
             "estimated_price",
             "created_by",
             "created_at",
+            "version",
         ]
-        read_only_fields = ["checked_at", "checked_by", "created_by", "created_at"]
+        read_only_fields = ["checked_at", "checked_by", "created_by", "created_at", "version"]
 
 
 class ShoppingListSerializer(serializers.ModelSerializer):
+    # Lu depuis le prefetch de la vue (cf. ShoppingListViewSet) : pas de requête par liste
     items = ListItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = ShoppingList
-        fields = ["id", "household", "name", "created_at", "items"]
-        read_only_fields = ["created_at"]
\ No newline at end of file
+        fields = [
+            "id",
+            "household",
+            "name",
+            "created_at",
+            "closed_at",
+            "item_count",
+            "checked_count",
+            "missing_estimate_count",
+            "running_total",
+            "version",
+            "items",
+        ]
+        read_only_fields = [
+            "created_at",
+            "closed_at",
+            "item_count",
+            "checked_count",
+            "missing_estimate_count",
+            "running_total",
+            "version",
+        ]
+
+
+class ReceiptItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReceiptItem
+        fields = [
+            "id",
+            "receipt",
+            "list_item",
+            "position",
+            "name",
+            "estimated_price",
+            "actual_price",
+            "created_at",
+            "version",
+        ]
+        read_only_fields = ["created_at", "version"]
+
+
+class ReceiptSerializer(serializers.ModelSerializer):
+    items = ReceiptItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Receipt
+        fields = [
+            "id",
+            "household",
+            "shopping_list",
+            "store_name",
+            "purchased_at",
+            "paper_total",
+            "created_at",
+            "estimated_total",
+            "actual_total",
+            "missing_actual_count",
+            "version",
+            "items",
+        ]
+        read_only_fields = ["created_at", "estimated_total", "actual_total", "missing_actual_count", "version"]
@@ -0,0 +1,24 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import membership_cache
+from .live import broadcast
+from .models import Membership
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def invalidate_membership_cache(sender, instance: Membership, **kwargs):
+    membership_cache.invalidate(instance.user_id)
+    # Connexions temps réel ouvertes : droits revérifiés une fois le changement visible
+    user_id = instance.user_id
+    transaction.on_commit(lambda: broadcast.recheck_user(user_id))
+
+
+@receiver(user_logged_out)
+def end_live_connections(sender, request, user, **kwargs):
+    session_key = getattr(getattr(request, "session", None), "session_key", None)
+    if session_key:
+        broadcast.end_session(session_key)
@@ -0,0 +1,128 @@
+# core/sync.py
+"""
+Synchronisation par deltas à partir du journal des modifications (ChangeLogEntry).
+
+Le client garde le curseur reçu ; il récupère l'instantané du foyer au premier lancement
+(il en donne le curseur de départ), puis seulement les objets modifiés depuis. Les entrées
+d'une page sont réduites à la dernière opération par objet : l'état courant des objets
+créés / modifiés, les ids des objets supprimés.
+
+Curseur "<txid>.<id>" : position dans le journal, lu dans l'ordre (transaction, entrée).
+Les entrées ne sont numérotées sous aucun verrou, elles deviennent donc visibles dans
+l'ordre des commits et non des numéros. Une page ne contient que les entrées des
+transactions antérieures au xmin de l'instantané PostgreSQL courant (plus ancienne
+transaction encore en cours) : toute entrée qui apparaîtra plus tard aura un txid
+supérieur ou égal, donc après le curseur. Une transaction longue (import) retarde
+ainsi le flux de tous les foyers jusqu'à son commit, sans rien faire perdre.
+"""
+from __future__ import annotations
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import ChangeLogEntry, Household, ListItem, ReceiptItem, ReferenceItem
+from .serializers import ListItemSerializer, ReceiptItemSerializer, ReferenceItemSerializer
+
+
+SYNC_PAGE_SIZE = 500
+
+# Type d'entrée -> (modèle, sérialiseur, chemin vers l'id du foyer)
+SYNC_KINDS = {
+    ChangeLogEntry.KIND_LIST_ITEM: (ListItem, ListItemSerializer, "shopping_list__household_id"),
+    ChangeLogEntry.KIND_REFERENCE_ITEM: (ReferenceItem, ReferenceItemSerializer, "household_id"),
+    ChangeLogEntry.KIND_RECEIPT_ITEM: (ReceiptItem, ReceiptItemSerializer, "receipt__household_id"),
+}
+
+# Plus ancienne transaction encore en cours (les entrées de txid inférieur sont définitives)
+_SNAPSHOT_XMIN_SQL = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+Cursor = tuple[int, int]
+START_CURSOR: Cursor = (0, 0)
+
+
+def parse_cursor(raw) -> Cursor | None:
+    """
+    "<txid>.<id>" → (txid, id) ; "0" (ou rien) : début du journal. None si invalide.
+    """
+    raw = str(raw if raw is not None else "0").strip()
+    if raw == "0":
+        return START_CURSOR
+    txid, sep, entry_id = raw.partition(".")
+    if not (sep and txid.isdigit() and entry_id.isdigit()):
+        return None
+    return int(txid), int(entry_id)
+
+
+def format_cursor(cursor: Cursor) -> str:
+    return "0" if cursor == START_CURSOR else f"{cursor[0]}.{cursor[1]}"
+
+
+def snapshot_cursor() -> str:
+    """
+    Curseur d'un instantané lu après cet appel : les transactions antérieures au xmin courant
+    y figurent toutes ; celles d'après seront renvoyées par la synchronisation (au pire
+    une seconde fois, sans effet : elle renvoie l'état courant).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {_SNAPSHOT_XMIN_SQL}")
+        (xmin,) = cursor.fetchone()
+    return format_cursor((xmin, 0))
+
+
+def _after(cursor: Cursor) -> Q:
+    txid, entry_id = cursor
+    return Q(txid__gt=txid) | Q(txid=txid, id__gt=entry_id)
+
+
+def changes_since(household: Household, since: Cursor, *, limit: int = SYNC_PAGE_SIZE) -> dict:
+    """
+    Modifications du foyer après `since`, au plus `limit` entrées du journal.
+    cursor : position de la dernière entrée lue (à renvoyer au prochain appel) ;
+    has_more : d'autres entrées suivent, rappeler avec ce curseur.
+    """
+    entries = list(
+        ChangeLogEntry.objects.filter(_after(since), household=household)
+        .filter(txid__lt=RawSQL(_SNAPSHOT_XMIN_SQL, []))
+        .order_by("txid", "id")
+        .values_list("txid", "id", "kind", "object_id", "op")[: limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Dernière opération par objet (ordre du journal)
+    latest: dict[tuple[str, int], str] = {}
+    for _txid, _id, kind, object_id, op in entries:
+        latest[(kind, object_id)] = op
+
+    changes = {}
+    for kind, (model, serializer, household_lookup) in SYNC_KINDS.items():
+        upserted_ids = [oid for (k, oid), op in latest.items() if k == kind and op == ChangeLogEntry.OP_UPSERT]
+        deleted_ids = {oid for (k, oid), op in latest.items() if k == kind and op == ChangeLogEntry.OP_DELETE}
+
+        rows = []
+        if upserted_ids:
+            rows = list(
+                model.objects.filter(id__in=upserted_ids, **{household_lookup: household.id}).order_by("id")
+            )
+            # Supprimé par une entrée au-delà de cette page : on l'annonce déjà comme tel
+            deleted_ids.update(set(upserted_ids) - {row.id for row in rows})
+
+        changes[kind] = {"upserted": serializer(rows, many=True).data, "deleted": sorted(deleted_ids)}
+
+    return {
+        "since": format_cursor(since),
+        "cursor": format_cursor(entries[-1][:2] if entries else since),
+        "has_more": has_more,
+        "changes": changes,
+    }
+
+
+def changed_since(household_id: int, kind: str, object_ids, since: Cursor) -> set[int]:
+    """
+    Parmi object_ids, ceux modifiés après `since` (détection de conflit d'une mutation hors ligne).
+    """
+    return set(
+        ChangeLogEntry.objects.filter(_after(since), household_id=household_id, kind=kind, object_id__in=object_ids)
+        .values_list("object_id", flat=True)
+    )
@@ -1,3 +1,1871 @@
-from django.test import TestCase
+from __future__ import annotations
 
-# Create your tests here.
+import asyncio
+import json
+import re
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.http import Http404
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import membership_cache
+from .catalog import import_catalog_rows, normalize_row
+from .live import CLOSE_FORBIDDEN, broadcast, list_events, list_websocket
+from .models import ChangeLogEntry, Household, ListItem, Membership, Receipt, ReceiptItem, ReferenceItem, ShoppingList
+from .views_common import (
+    CONFLICT_MESSAGE,
+    get_or_create_open_list,
+    get_or_create_open_lists,
+    user_item_or_404,
+    user_list_or_404,
+)
+from .views_reference import _catalogue_fragment_key
+
+
+# =========================================================
+# Outils
+# =========================================================
+def make_user(username: str):
+    return get_user_model().objects.create_user(username=username, password="pw")
+
+
+def make_household(user, name: str = "Maison") -> Household:
+    household = Household.objects.create(name=name, created_by=user)
+    Membership.objects.create(user=user, household=household, role=Membership.ROLE_OWNER)
+    return household
+
+
+def catalog_rows(*entries: dict) -> list[dict]:
+    return [normalize_row(entry) for entry in entries]
+
+
+def add_list_item(shopping_list: ShoppingList, user, name: str, *, unit_price=None, qty_value=None, checked=False):
+    """
+    Item créé directement en base, compteurs de la liste recalculés.
+    """
+    item = ListItem(
+        shopping_list=shopping_list,
+        name=name,
+        unit_price=None if unit_price is None else Decimal(unit_price),
+        qty_value=None if qty_value is None else Decimal(qty_value),
+        created_by=user,
+    )
+    item.recompute_estimated_price()
+    item.set_checked(user, checked)
+    item.save()
+    ShoppingList.objects.filter(id=shopping_list.id).recompute_counters()
+    return item
+
+
+class MemberMixin:
+    """
+    Un membre connecté (self.client), son foyer et sa liste ouverte.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("alice")
+        self.household = make_household(self.user)
+        self.shopping_list = get_or_create_open_list(self.household)
+        self.client.force_login(self.user)
+
+    def add_item(self, name: str, **fields) -> ListItem:
+        return add_list_item(self.shopping_list, self.user, name, **fields)
+
+    def post_json(self, url: str, data: dict | None = None, **extra):
+        return self.client.post(url, data or {}, HTTP_ACCEPT="application/json", **extra)
+
+    def create_receipt(self) -> Receipt:
+        """
+        Ticket de la liste, créé par la vue à partir des items cochés.
+        """
+        self.client.post(reverse("create_receipt", args=[self.shopping_list.id]))
+        return Receipt.objects.get(shopping_list=self.shopping_list)
+
+
+class MemberTestCase(MemberMixin, TestCase):
+    pass
+
+
+class OpenTransaction(threading.Thread):
+    """
+    Exécute fn() dans une transaction d'une autre connexion, laissée ouverte jusqu'à la sortie
+    du bloc with (commit) : simule un autre membre en cours d'écriture.
+    """
+
+    def __init__(self, fn):
+        super().__init__(daemon=True)
+        self.fn = fn
+        self.ready = threading.Event()
+        self.release = threading.Event()
+        self.error = None
+
+    def run(self):
+        try:
+            with transaction.atomic():
+                self.fn()
+                self.ready.set()
+                self.release.wait(10)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.set()
+            connection.close()
+
+    def __enter__(self):
+        self.start()
+        self.ready.wait(10)
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def __exit__(self, *exc):
+        self.release.set()
+        self.join(10)
+
+
+class CatalogFileMixin:
+    """
+    Fichiers catalogue temporaires (supprimés en fin de test).
+    """
+
+    def write_catalog(self, name: str, content: str) -> Path:
+        if not hasattr(self, "_catalog_dir"):
+            self._catalog_dir = tempfile.TemporaryDirectory()
+            self.addCleanup(self._catalog_dir.cleanup)
+        path = Path(self._catalog_dir.name) / name
+        path.write_text(content, encoding="utf-8")
+        return path
+
+    def write_json_catalog(self, *entries: dict) -> Path:
+        return self.write_catalog("catalog.json", json.dumps({"items": list(entries)}))
+
+
+# =========================================================
+# Import de catalogue : écritures par lots
+# =========================================================
+class CatalogBatchImportTests(TestCase):
+    def setUp(self):
+        self.user = make_user("alice")
+        self.household = make_household(self.user)
+
+    def _import(self, *entries, **options):
+        return import_catalog_rows(self.household.id, catalog_rows(*entries), **options)
+
+    def _item(self, name: str) -> ReferenceItem:
+        return ReferenceItem.objects.get(household=self.household, name=name)
+
+    def test_inserts_are_written_per_batch(self):
+        entries = [{"name": f"Produit {n}"} for n in range(5)]
+        table = ReferenceItem._meta.db_table
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = self._import(*entries, batch_size=2)
+
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith(f'INSERT INTO "{table}"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual((result.created, result.rows), (5, 5))
+
+    def test_existing_price_is_kept_unless_overwritten(self):
+        self._import({"name": "Lait", "default_unit_price": "1.20"})
+
+        self._import({"name": "Lait", "default_unit_price": "1.50"})
+        self.assertEqual(self._item("Lait").default_unit_price, Decimal("1.20"))
+
+        self._import({"name": "Lait", "default_unit_price": "1.50"}, overwrite_price=True)
+        self.assertEqual(self._item("Lait").default_unit_price, Decimal("1.50"))
+
+    def test_updates_are_written_together(self):
+        self._import({"name": "Lait"}, {"name": "Pain"})
+        table = ReferenceItem._meta.db_table
+
+        with CaptureQueriesContext(connection) as ctx:
+            result = self._import({"name": "Lait", "default_note": "bio"}, {"name": "Pain", "default_note": "frais"})
+
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith(f'UPDATE "{table}"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(result.updated, 2)
+        self.assertEqual(self._item("Lait").default_note, "bio")
+
+    def test_update_bumps_item_and_catalogue_versions(self):
+        self._import({"name": "Lait"})
+        self.household.refresh_from_db()
+        catalog_version = self.household.catalog_version
+
+        self._import({"name": "Lait", "default_note": "bio"})
+
+        lait = self._item("Lait")
+        self.household.refresh_from_db()
+        self.assertEqual((lait.default_note, lait.version), ("bio", 1))
+        self.assertGreater(self.household.catalog_version, catalog_version)
+
+    def test_replace_mode_rebuilds_catalogue(self):
+        self._import({"name": "Lait"}, {"name": "Pain"})
+
+        result = self._import({"name": "Beurre"}, mode="replace")
+
+        self.assertEqual((result.deleted, result.created), (2, 1))
+        self.assertEqual(
+            list(ReferenceItem.objects.filter(household=self.household).values_list("name", flat=True)), ["Beurre"]
+        )
+
+
+# =========================================================
+# Import de catalogue : formats lus en flux
+# =========================================================
+class CatalogFileFormatTests(CatalogFileMixin, TestCase):
+    def setUp(self):
+        self.user = make_user("alice")
+        self.household = make_household(self.user)
+
+    def _call(self, path: Path, **options) -> str:
+        out = StringIO()
+        call_command("import_catalog", str(path), household_id=[str(self.household.id)], stdout=out, **options)
+        return out.getvalue()
+
+    def _catalog(self) -> dict[str, tuple]:
+        return {
+            item.name: (item.aisle, item.default_qty_value, item.default_unit_price)
+            for item in ReferenceItem.objects.filter(household=self.household)
+        }
+
+    def test_json_is_read_in_small_chunks(self):
+        path = self.write_catalog(
+            "catalog.json",
+            json.dumps({
+                "version": 3,
+                "meta": {"source": "test", "items": "pas ici"},
+                "items": [
+                    {"name": "Lait", "aisle": "al_dairy", "default_unit_price": 1.25},
+                    {"name": "Pain", "default_qty_value": 12345},
+                ],
+            }),
+        )
+
+        # Tampon minuscule : clés, objets et nombres coupés entre deux lectures
+        with mock.patch("core.catalog._READ_SIZE", 7):
+            self._call(path)
+
+        self.assertEqual(self._catalog(), {
+            "Lait": ("al_dairy", None, Decimal("1.25")),
+            "Pain": (ReferenceItem.AISLE_AL_FRUITS_VEG, Decimal("12345"), None),
+        })
+
+    def test_ndjson_skips_blank_lines(self):
+        path = self.write_catalog("catalog.ndjson", '{"name": "Lait"}\n\n{"name": "Pain"}\n')
+
+        self._call(path)
+
+        self.assertEqual(sorted(self._catalog()), ["Lait", "Pain"])
+
+    def test_ndjson_error_reports_line(self):
+        path = self.write_catalog("catalog.jsonl", '{"name": "Lait"}\n{"name": \n')
+
+        with self.assertRaisesMessage(CommandError, "ligne 2"):
+            self._call(path)
+
+    def test_french_csv_export(self):
+        path = self.write_catalog(
+            "catalog.csv",
+            "\ufeffname;aisle;default_unit_price\nLait;al_dairy;1,25\nPain;;\n",
+        )
+
+        self._call(path)
+
+        self.assertEqual(self._catalog(), {
+            "Lait": ("al_dairy", None, Decimal("1.25")),
+            "Pain": (ReferenceItem.AISLE_AL_FRUITS_VEG, None, None),
+        })
+
+    def test_format_option_overrides_extension(self):
+        path = self.write_catalog("catalog.txt", "name\nLait\n")
+
+        self._call(path, format="csv")
+
+        self.assertEqual(list(self._catalog()), ["Lait"])
+
+    def test_csv_without_name_column_is_refused(self):
+        path = self.write_catalog("catalog.csv", "nom;rayon\nLait;al_dairy\n")
+
+        with self.assertRaisesMessage(CommandError, "colonne 'name'"):
+            self._call(path)
+
+    def test_json_without_items_is_refused(self):
+        path = self.write_catalog("catalog.json", '{"produits": []}')
+
+        with self.assertRaisesMessage(CommandError, "'items'"):
+            self._call(path)
+
+
+# =========================================================
+# Import de catalogue : plusieurs foyers en parallèle
+# =========================================================
+class CatalogMultiHouseholdImportTests(CatalogFileMixin, TransactionTestCase):
+    """
+    Hors transaction de test : les processus fils lisent les foyers avec leur propre connexion.
+    """
+
+    def setUp(self):
+        self.user = make_user("alice")
+        self.households = [make_household(self.user, name=f"Foyer {n}") for n in range(3)]
+        self.path = self.write_json_catalog({"name": "Lait", "aisle": "al_dairy"}, {"name": "Pain"})
+
+    def _names(self, household) -> list[str]:
+        return sorted(ReferenceItem.objects.filter(household=household).values_list("name", flat=True))
+
+    def test_file_is_imported_into_each_household(self):
+        first, last = self.households[0].id, self.households[-1].id
+        out = StringIO()
+
+        call_command("import_catalog", str(self.path), household_id=[f"{first}-{last}"], jobs=2, stdout=out)
+
+        self.assertIn("3/3 foyers", out.getvalue())
+        for household in self.households:
+            self.assertEqual(self._names(household), ["Lait", "Pain"])
+
+    def test_failed_household_does_not_stop_the_others(self):
+        from . import catalog
+
+        failing = self.households[1].id
+        real_import = catalog.import_catalog_rows
+
+        def import_or_fail(household_id, rows, **options):
+            if household_id == failing:
+                raise RuntimeError("disque plein")
+            return real_import(household_id, rows, **options)
+
+        out = StringIO()
+        # Un seul processus : le remplacement ne dépend pas du mode de démarrage des fils
+        with mock.patch.object(catalog, "import_catalog_rows", import_or_fail):
+            with self.assertRaisesMessage(CommandError, f"household={failing}"):
+                call_command("import_catalog", str(self.path), all=True, jobs=1, stdout=out)
+
+        self.assertIn("ÉCHEC RuntimeError: disque plein", out.getvalue())
+        self.assertEqual([len(self._names(h)) for h in self.households], [2, 0, 2])
+
+    def test_household_id_specs(self):
+        from .management.commands.import_catalog import _parse_household_ids
+
+        self.assertEqual(_parse_household_ids(["2,5", "7-9", "5"]), [2, 5, 7, 8, 9])
+        with self.assertRaises(CommandError):
+            _parse_household_ids(["9-7"])
+
+
+# =========================================================
+# Import de catalogue : empreintes de contenu
+# =========================================================
+class CatalogContentHashTests(CatalogFileMixin, TestCase):
+    def setUp(self):
+        self.user = make_user("alice")
+        self.household = make_household(self.user)
+
+    def _import(self, *entries, **options):
+        return import_catalog_rows(self.household.id, catalog_rows(*entries), **options)
+
+    def test_unchanged_rows_are_skipped(self):
+        self._import({"name": "Lait", "aisle": "al_dairy"}, {"name": "Pain", "aisle": "al_bakery"})
+        lait = ReferenceItem.objects.get(household=self.household, name="Lait")
+
+        result = self._import({"name": "Lait", "aisle": "al_dairy"}, {"name": "Pain", "aisle": "al_meat"})
+
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 1, 1))
+        lait.refresh_from_db()
+        self.assertEqual(lait.version, 0)
+        self.assertEqual(ReferenceItem.objects.get(household=self.household, name="Pain").aisle, "al_meat")
+
+    def test_archived_product_in_file_is_reactivated(self):
+        self._import({"name": "Lait"}, {"name": "Pain"})
+        self._import({"name": "Lait"}, deactivate_missing=True)
+        pain = ReferenceItem.objects.get(household=self.household, name="Pain")
+        self.assertFalse(pain.is_active)
+
+        result = self._import({"name": "Lait"}, {"name": "Pain"})
+
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 1, 1))
+        pain.refresh_from_db()
+        self.assertTrue(pain.is_active)
+
+    def test_dry_run_diff_lists_each_name_once(self):
+        self._import({"name": "Lait"}, {"name": "Pain"}, {"name": "Beurre"})
+
+        result = self._import(
+            {"name": "Lait", "aisle": "al_dairy"},
+            {"name": "Lait", "aisle": "al_dairy", "default_note": "demi-écrémé"},
+            {"name": "Oeufs"},
+            {"name": "Oeufs", "default_qty_value": "6"},
+            {"name": "Pain"},
+            dry_run=True,
+        )
+
+        self.assertEqual(result.diff, {"insert": ["Oeufs"], "update": ["Lait"], "deactivate": ["Beurre"]})
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 1, 1))
+        self.assertFalse(ReferenceItem.objects.filter(household=self.household, name="Oeufs").exists())
+
+    def test_same_file_twice_is_skipped_and_read_once(self):
+        path = self.write_json_catalog({"name": "Lait", "aisle": "al_dairy"}, {"name": "Pain"})
+        call_command("import_catalog", str(path), household_id=[str(self.household.id)], stdout=StringIO())
+        self.household.refresh_from_db()
+        catalog_version = self.household.catalog_version
+
+        from .management.commands import import_catalog as command
+
+        with mock.patch.object(command, "iter_catalog_rows", wraps=command.iter_catalog_rows) as reader:
+            out = StringIO()
+            call_command("import_catalog", str(path), household_id=[str(self.household.id)], stdout=out)
+
+        self.assertEqual(reader.call_count, 1)
+        self.assertIn("Catalogue inchangé", out.getvalue())
+        self.household.refresh_from_db()
+        self.assertEqual(self.household.catalog_version, catalog_version)
+
+    def test_manual_edit_clears_fingerprint(self):
+        self._import({"name": "Lait"})
+        self.household.refresh_from_db()
+        self.assertTrue(self.household.catalog_fingerprint)
+
+        lait = ReferenceItem.objects.get(household=self.household, name="Lait")
+        lait.default_note = "bio"
+        lait.save(update_fields=["default_note"])
+
+        self.household.refresh_from_db()
+        self.assertEqual(self.household.catalog_fingerprint, "")
+        result = self._import({"name": "Lait"})
+        self.assertFalse(result.skipped)
+
+    def test_same_file_after_bulk_delete_recreates_item(self):
+        for fast in (False, True):
+            with self.subTest(fast=fast):
+                self._import({"name": "Lait"}, {"name": "Pain"}, fast=fast)
+                # Suppression en masse (admin) : pas de ReferenceItem.delete()
+                ReferenceItem.objects.filter(household=self.household, name="Pain").delete()
+
+                result = self._import({"name": "Lait"}, {"name": "Pain"}, fast=fast)
+
+                self.assertFalse(result.skipped)
+                self.assertEqual((result.created, result.unchanged), (1, 1))
+                self.assertTrue(ReferenceItem.objects.filter(household=self.household, name="Pain").exists())
+
+    def test_rows_written_are_reported_even_if_fingerprint_matches(self):
+        self._import({"name": "Lait"}, {"name": "Pain"})
+        self.household.refresh_from_db()
+        fingerprint = self.household.catalog_fingerprint
+        ReferenceItem.objects.filter(household=self.household, name="Pain").delete()
+        # Empreinte restée en place malgré l'écriture (ex : base restaurée sans ses triggers)
+        Household.objects.filter(id=self.household.id).update(catalog_fingerprint=fingerprint)
+
+        result = self._import({"name": "Lait"}, {"name": "Pain"})
+
+        self.assertFalse(result.skipped)
+        self.assertEqual(result.created, 1)
+
+
+# =========================================================
+# Import de catalogue : mode rapide COPY
+# =========================================================
+class CatalogFastImportTests(TestCase):
+    def setUp(self):
+        self.user = make_user("alice")
+        self.household = make_household(self.user)
+
+    def _import(self, *entries, **options):
+        return import_catalog_rows(self.household.id, catalog_rows(*entries), fast=True, **options)
+
+    def _catalog(self, household=None) -> dict[str, tuple]:
+        return {
+            item.name: (item.aisle, item.default_unit, item.default_qty_value, item.default_note,
+                        item.default_unit_price, item.is_active)
+            for item in ReferenceItem.objects.filter(household=household or self.household)
+        }
+
+    def test_merge_matches_orm_import(self):
+        base = ({"name": "Lait", "default_unit_price": "1.2"}, {"name": "Pain"}, {"name": "Beurre"})
+        update = (
+            {"name": "Lait", "aisle": "al_dairy", "default_unit_price": "1.5"},
+            {"name": "Pain", "default_note": "complet"},
+            {"name": "Oeufs", "default_qty_value": "6"},
+        )
+        other = make_household(self.user, name="Autre")
+        for household, fast in ((self.household, True), (other, False)):
+            import_catalog_rows(household.id, catalog_rows(*base), fast=fast)
+            import_catalog_rows(household.id, catalog_rows(*update), fast=fast, deactivate_missing=True)
+
+        self.assertEqual(self._catalog(), self._catalog(other))
+        self.assertEqual(self._catalog()["Lait"][4], Decimal("1.200"))
+        self.assertFalse(self._catalog()["Beurre"][5])
+
+    def test_counts_are_per_distinct_name(self):
+        self._import({"name": "Lait"}, {"name": "Pain"})
+
+        result = self._import(
+            {"name": "Lait"}, {"name": "Lait"}, {"name": "Pain", "aisle": "al_bakery"}, {"name": "Oeufs"}, {"name": "Oeufs"}
+        )
+
+        self.assertEqual(result.rows, 5)
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 1, 1))
+
+    def test_duplicate_name_keeps_last_row(self):
+        self._import({"name": "Lait", "aisle": "al_dairy"}, {"name": "Lait", "aisle": "al_meat"})
+
+        self.assertEqual(ReferenceItem.objects.get(household=self.household, name="Lait").aisle, "al_meat")
+
+    def test_updates_bump_item_version(self):
+        self._import({"name": "Lait"}, {"name": "Pain"})
+
+        self._import({"name": "Lait", "aisle": "al_dairy"}, {"name": "Pain"})
+
+        versions = dict(ReferenceItem.objects.filter(household=self.household).values_list("name", "version"))
+        self.assertEqual(versions, {"Lait": 1, "Pain": 0})
+
+    def test_repeated_imports_in_one_transaction(self):
+        # ON COMMIT DROP ne s'applique qu'au COMMIT final : la table de transit doit être supprimée avant
+        self._import({"name": "Lait"})
+        self._import({"name": "Lait"}, {"name": "Pain"})
+
+        self.assertEqual(set(self._catalog()), {"Lait", "Pain"})
+
+    def test_archived_product_is_reactivated_by_fast_import(self):
+        self._import({"name": "Lait"}, {"name": "Pain"})
+        self._import({"name": "Lait"}, deactivate_missing=True)
+        self.assertFalse(ReferenceItem.objects.get(household=self.household, name="Pain").is_active)
+
+        result = self._import({"name": "Lait"}, {"name": "Pain"})
+
+        self.assertEqual(result.updated, 1)
+        self.assertTrue(ReferenceItem.objects.get(household=self.household, name="Pain").is_active)
+
+
+# =========================================================
+# Accès aux objets d'un foyer en une requête
+# =========================================================
+class HouseholdScopedFetchTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lait = self.add_item("Lait")
+        self.outsider = make_user("bob")
+        make_household(self.outsider, name="Autre")
+
+    def test_member_fetch_is_one_query(self):
+        membership_cache.household_ids_for(self.user)
+        with self.assertNumQueries(1):
+            item = user_item_or_404(self.user, self.lait.id)
+            # Liste chargée avec l'item
+            self.assertEqual(item.shopping_list.household_id, self.household.id)
+
+    def test_outsider_gets_404(self):
+        with self.assertRaises(Http404):
+            user_item_or_404(self.outsider, self.lait.id)
+        with self.assertRaises(Http404):
+            user_list_or_404(self.outsider, self.shopping_list.id)
+
+    def test_outsider_write_is_refused(self):
+        self.client.force_login(self.outsider)
+
+        response = self.post_json(reverse("toggle_list_item", args=[self.lait.id]))
+
+        self.assertEqual(response.status_code, 404)
+        self.lait.refresh_from_db()
+        self.assertFalse(self.lait.is_checked)
+
+
+# =========================================================
+# Cache d'appartenance aux foyers
+# =========================================================
+class MembershipCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("alice")
+        self.household = make_household(self.user)
+
+    def test_second_read_is_served_from_cache(self):
+        self.assertEqual(membership_cache.household_ids_for(self.user), {self.household.id})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(membership_cache.household_ids_for(self.user), {self.household.id})
+
+    def test_membership_removal_invalidates(self):
+        membership_cache.household_ids_for(self.user)
+
+        Membership.objects.filter(user=self.user, household=self.household).get().delete()
+
+        self.assertEqual(membership_cache.household_ids_for(self.user), frozenset())
+
+    def test_process_local_cache_keeps_entries_briefly(self):
+        with mock.patch.object(membership_cache.cache, "set") as cache_set:
+            membership_cache.household_ids_for(self.user)
+
+        self.assertEqual(cache_set.call_args.args[2], membership_cache.LOCAL_CACHE_TIMEOUT)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "t"}})
+    def test_shared_cache_keeps_entries_longer(self):
+        self.assertFalse(membership_cache.is_process_local())
+        self.assertEqual(membership_cache._timeout(), membership_cache.CACHE_TIMEOUT)
+
+
+# =========================================================
+# Totaux des tickets maintenus par deltas
+# =========================================================
+class ReceiptTotalsTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lait = self.add_item("Lait", unit_price="1.20", qty_value="2", checked=True)
+        self.pain = self.add_item("Pain", checked=True)
+        self.receipt = self.create_receipt()
+        self.lines = {line.name: line for line in self.receipt.items.all()}
+
+    def _totals(self) -> tuple:
+        self.receipt.refresh_from_db()
+        return self.receipt.estimated_total, self.receipt.actual_total, self.receipt.missing_actual_count
+
+    def _set_price(self, name: str, price: str):
+        return self.client.post(reverse("update_receipt_item_price", args=[self.lines[name].id]), {"actual_price": price})
+
+    def test_receipt_is_created_with_its_totals(self):
+        self.assertEqual(self._totals(), (Decimal("2.40"), Decimal("2.40"), 1))
+
+    def test_price_edits_apply_deltas(self):
+        self._set_price("Pain", "1,10")
+        self._set_price("Lait", "2.00")
+        self._set_price("Lait", "")
+
+        self.assertEqual(self._totals(), (Decimal("2.40"), Decimal("1.10"), 1))
+        self.assertFalse(Receipt.objects.with_drifted_totals().exists())
+
+    def test_repair_command_fixes_drift(self):
+        Receipt.objects.filter(id=self.receipt.id).update(actual_total=Decimal("99.00"), missing_actual_count=0)
+
+        out = StringIO()
+        call_command("repair_receipt_totals", check=True, stdout=out)
+        self.assertIn("incohérents: 1", out.getvalue())
+
+        call_command("repair_receipt_totals", stdout=StringIO())
+        self.assertEqual(self._totals(), (Decimal("2.40"), Decimal("2.40"), 1))
+
+    def test_repair_bumps_version_of_repaired_receipts_only(self):
+        self.receipt.refresh_from_db()
+        url = reverse("receipt_detail", args=[self.receipt.id])
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+        version = self.receipt.version
+        Receipt.objects.filter(id=self.receipt.id).update(actual_total=Decimal("99.00"))
+
+        out = StringIO()
+        call_command("repair_receipt_totals", stdout=out)
+        self.assertIn("pour 1 tickets", out.getvalue())
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.version, version + 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Totaux déjà justes : rien n'est réécrit, l'ETag reste valable
+        call_command("repair_receipt_totals", stdout=StringIO())
+        self.receipt.refresh_from_db()
+        self.assertEqual(self.receipt.version, version + 1)
+
+
+# =========================================================
+# Historique des tickets paginé par clé
+# =========================================================
+class ReceiptHistoryTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        # Deux tickets à la même date : départagés par id
+        offsets = [0, 1, 1, 3, 40]
+        self.receipts = [self._receipt(timedelta(days=days), lines=n) for n, days in enumerate(offsets)]
+
+    def _receipt(self, age, *, lines: int = 0) -> Receipt:
+        shopping_list = ShoppingList.objects.create(household=self.household, closed_at=self.now - age)
+        receipt = Receipt.objects.create(household=self.household, shopping_list=shopping_list, purchased_at=self.now - age)
+        for n in range(lines):
+            item = add_list_item(shopping_list, self.user, f"Produit {n}", checked=True)
+            ReceiptItem.objects.create(receipt=receipt, list_item=item, position=n + 1, name=item.name)
+        return receipt
+
+    def _pages(self, query: str = "") -> list[list[int]]:
+        pages = []
+        while query is not None:
+            response = self.client.get(f"{reverse('receipt_list')}?{query}")
+            self.assertEqual(response.status_code, 200)
+            pages.append([r.id for r in response.context["receipts"]])
+            query = response.context["next_query"]
+        return pages
+
+    def test_pages_follow_purchase_order_without_gaps(self):
+        with mock.patch("core.views_receipt.RECEIPTS_PAGE_SIZE", 2):
+            pages = self._pages()
+
+        expected = [r.id for r in sorted(self.receipts, key=lambda r: (r.purchased_at, r.id), reverse=True)]
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_page_cost_does_not_grow_with_history(self):
+        url = reverse("receipt_list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as short:
+            self.client.get(url)
+        for n in range(10):
+            self._receipt(timedelta(days=100 + n), lines=2)
+        with CaptureQueriesContext(connection) as long:
+            response = self.client.get(url)
+
+        self.assertEqual(len(long.captured_queries), len(short.captured_queries))
+        counts = {r.id: r.lines_count for r in response.context["receipts"]}
+        self.assertEqual(counts[self.receipts[4].id], 4)
+
+    def test_period_filter_is_inclusive(self):
+        day = timezone.localdate(self.now - timedelta(days=1)).isoformat()
+
+        pages = self._pages(f"from={day}&to={day}")
+
+        self.assertEqual(sorted(sum(pages, [])), [self.receipts[1].id, self.receipts[2].id])
+
+
+# =========================================================
+# Page d'une liste : résumé lu avec la liste
+# =========================================================
+class ShoppingListSummaryTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("shopping_list_detail", args=[self.shopping_list.id])
+
+    def _page_queries(self) -> tuple[int, dict]:
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.context
+
+    def test_summary_and_focus(self):
+        self.add_item("Lait", unit_price="1.20", qty_value="2", checked=True)
+        pain = self.add_item("Pain", checked=True)
+        self.add_item("Beurre", unit_price="3")
+
+        _, context = self._page_queries()
+
+        self.assertEqual(
+            (context["running_total"], context["checked_count"], context["missing_estimate_count"]),
+            (Decimal("2.40"), 2, 1),
+        )
+        self.assertEqual(context["focus_price_id"], pain.id)
+        self.assertIsNone(context["receipt"])
+
+    def test_query_count_does_not_depend_on_items(self):
+        self.add_item("Lait", checked=True)
+        self._page_queries()
+        few, _ = self._page_queries()
+        for n in range(10):
+            self.add_item(f"Produit {n}", unit_price="1", checked=n % 2 == 0)
+
+        many, _ = self._page_queries()
+
+        self.assertEqual(many, few)
+
+
+# =========================================================
+# Compteurs stockés des listes
+# =========================================================
+class ListCountersTests(MemberTestCase):
+    def _counters(self) -> tuple:
+        self.shopping_list.refresh_from_db()
+        sl = self.shopping_list
+        return sl.item_count, sl.checked_count, sl.missing_estimate_count, sl.running_total
+
+    def test_item_views_keep_counters_exact(self):
+        self.client.post(
+            reverse("add_list_item", args=[self.shopping_list.id]),
+            {"name": "Lait", "aisle": "al_dairy", "qty_value": "2", "unit_price": "1.20"},
+        )
+        self.client.post(reverse("add_list_item", args=[self.shopping_list.id]), {"name": "Pain", "aisle": "al_bakery"})
+        lait = ListItem.objects.get(shopping_list=self.shopping_list, name="Lait")
+        pain = ListItem.objects.get(shopping_list=self.shopping_list, name="Pain")
+
+        self.client.post(reverse("toggle_list_item", args=[lait.id]))
+        self.client.post(reverse("toggle_list_item", args=[pain.id]))
+        self.assertEqual(self._counters(), (2, 2, 1, Decimal("2.40")))
+
+        pain.refresh_from_db()
+        self.client.post(
+            reverse("update_item_details", args=[pain.id]),
+            {"qty_value": "1", "unit_price": "0.90", "version": pain.version},
+        )
+        self.client.post(reverse("delete_list_item", args=[lait.id]))
+
+        self.assertEqual(self._counters(), (1, 1, 0, Decimal("0.90")))
+        self.assertFalse(ShoppingList.objects.with_drifted_counters().exists())
+
+    def test_check_command_reports_and_fixes_drift(self):
+        self.add_item("Lait", unit_price="1.50", checked=True)
+        ShoppingList.objects.filter(id=self.shopping_list.id).update(checked_count=5, running_total=Decimal("0"))
+
+        out = StringIO()
+        call_command("check_list_counters", stdout=out, verbosity=2)
+        self.assertIn("incohérents: 1", out.getvalue())
+        self.assertIn(f"ids: {self.shopping_list.id}", out.getvalue())
+        self.assertEqual(self._counters(), (1, 5, 0, Decimal("0.00")))
+
+        call_command("check_list_counters", fix=True, stdout=StringIO())
+        self.assertEqual(self._counters(), (1, 1, 0, Decimal("1.50")))
+
+    def test_fix_bumps_version_of_fixed_lists_only(self):
+        self.add_item("Lait", unit_price="1.50", checked=True)
+        other = ShoppingList.objects.create(household=make_household(self.user, name="Autre"))
+        url = reverse("shopping_list_detail", args=[self.shopping_list.id])
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+        self.shopping_list.refresh_from_db()
+        version = self.shopping_list.version
+        ShoppingList.objects.filter(id=self.shopping_list.id).update(checked_count=5)
+
+        call_command("check_list_counters", fix=True, stdout=StringIO())
+
+        self.shopping_list.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.shopping_list.version, other.version), (version + 1, 0))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+# =========================================================
+# Page catalogue : fragments en cache par version
+# =========================================================
+class ReferenceListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.household = make_household(self.alice)
+        Membership.objects.create(user=self.bob, household=self.household, role=Membership.ROLE_MEMBER)
+        import_catalog_rows(self.household.id, catalog_rows({"name": "Lait", "aisle": "al_dairy"}, {"name": "Pain"}))
+        self.url = reverse("reference_list", args=[self.household.id])
+
+    def _client(self, user) -> Client:
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(user)
+        return client
+
+    def _catalogue_queries(self, client) -> tuple[int, str]:
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        table = ReferenceItem._meta.db_table
+        return sum(f'FROM "{table}"' in q["sql"] for q in ctx.captured_queries), response.content.decode()
+
+    def test_catalogue_is_read_once_for_all_members(self):
+        first, _ = self._catalogue_queries(self._client(self.alice))
+        second, _ = self._catalogue_queries(self._client(self.bob))
+
+        self.assertEqual((first, second), (1, 0))
+
+    def test_cached_forms_carry_the_visitor_token(self):
+        self._client(self.alice).get(self.url)
+        bob = self._client(self.bob)
+        _, html = self._catalogue_queries(bob)
+
+        self.assertNotIn("<!--csrf-token-->", html)
+        lait = ReferenceItem.objects.get(household=self.household, name="Lait")
+        action = reverse("reference_toggle_selected", args=[lait.id])
+        form = html[html.index(f'action="{action}"'):]
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', form).group(1)
+        response = bob.post(
+            action,
+            {"version": lait.version, "csrfmiddlewaretoken": token},
+        )
+        self.assertEqual(response.status_code, 302)
+        lait.refresh_from_db()
+        self.assertTrue(lait.is_selected)
+
+    def test_write_invalidates_fragments(self):
+        client = self._client(self.alice)
+        client.get(self.url)
+        lait = ReferenceItem.objects.get(household=self.household, name="Lait")
+        lait.is_selected = True
+        lait.save(update_fields=["is_selected"])
+
+        queries, html = self._catalogue_queries(client)
+
+        self.assertEqual(queries, 1)
+        self.assertIn("À acheter : <strong>1</strong>", html)
+
+    def test_bulk_delete_invalidates_fragments(self):
+        client = self._client(self.alice)
+        client.get(self.url)
+        # Suppression en masse de l'admin : queryset.delete(), sans ReferenceItem.delete()
+        ReferenceItem.objects.filter(household=self.household, name="Pain").delete()
+
+        _, html = self._catalogue_queries(client)
+
+        self.assertNotIn('<div class="item-title">Pain</div>', html)
+        self.assertIn("Actifs : <strong>1</strong>", html)
+
+    def test_queryset_update_invalidates_fragments(self):
+        client = self._client(self.alice)
+        client.get(self.url)
+        ReferenceItem.objects.filter(household=self.household).update(is_active=False)
+
+        _, html = self._catalogue_queries(client)
+
+        self.assertIn("Actifs : <strong>0</strong>", html)
+
+    def test_single_expired_fragment_is_rendered_from_one_read(self):
+        client = self._client(self.alice)
+        client.get(self.url)
+        self.household.refresh_from_db()
+        # Expiré entre deux requêtes (ou entre la lecture du cache et le rendu d'avant)
+        cache.delete(_catalogue_fragment_key("catalogue_items", self.household))
+
+        queries, html = self._catalogue_queries(client)
+
+        self.assertEqual(queries, 1)
+        self.assertIn("Lait", html)
+        self.assertIn("Actifs : <strong>2</strong>", html)
+
+
+# =========================================================
+# GET conditionnels des pages liste et ticket
+# =========================================================
+class ConditionalGetTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        self.item = self.add_item("Lait", unit_price="1.20")
+        self.url = reverse("shopping_list_detail", args=[self.shopping_list.id])
+        # Première visite : le navigateur reçoit son cookie CSRF
+        self.client.get(self.url)
+
+    def test_unchanged_list_answers_304(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_item_write_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.post_json(reverse("toggle_list_item", args=[self.item.id]))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_new_csrf_secret_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        # Reconnexion : rotate_token donne un nouveau secret au navigateur
+        self.client.cookies["csrftoken"] = "a" * 32
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_etag_without_csrf_cookie(self):
+        client = Client()
+        client.force_login(self.user)
+
+        self.assertFalse(client.get(self.url).has_header("ETag"))
+
+    def test_other_household_gets_404(self):
+        client = Client()
+        client.force_login(make_user("eve"))
+
+        self.assertEqual(client.get(self.url).status_code, 404)
+
+    def test_receipt_page_answers_304(self):
+        self.post_json(reverse("toggle_list_item", args=[self.item.id]))
+        self.client.post(reverse("create_receipt", args=[self.shopping_list.id]))
+        receipt = Receipt.objects.get(shopping_list=self.shopping_list)
+        url = reverse("receipt_detail", args=[receipt.id])
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+# =========================================================
+# Réponses partielles des vues POST
+# =========================================================
+class PartialResponseTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lait = self.add_item("Lait", unit_price="1.20")
+
+    def _toggle(self, **headers):
+        return self.client.post(reverse("toggle_list_item", args=[self.lait.id]), headers=headers)
+
+    def test_htmx_gets_row_and_out_of_band_summary(self):
+        response = self._toggle(**{"HX-Request": "true"})
+
+        html = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(html.startswith(f'<div id="item-{self.lait.id}"'))
+        self.assertIn('<div id="list-summary" hx-swap-oob="true">', html)
+        self.assertIn("Pris ✅ : <strong>1</strong>", html)
+
+    def test_json_gets_item_and_summary(self):
+        data = self._toggle(Accept="application/json").json()
+
+        self.assertEqual((data["item"]["id"], data["item"]["is_checked"]), (self.lait.id, True))
+        self.assertEqual(
+            (data["summary"]["checked_count"], data["summary"]["running_total"]), (1, "1.20")
+        )
+        self.assertEqual(data["focus_price_id"], self.lait.id)
+        self.assertIn(f'id="item-{self.lait.id}"', data["html"])
+
+    def test_plain_form_still_redirects(self):
+        response = self._toggle()
+
+        self.assertRedirects(
+            response, f"/shopping-lists/{self.shopping_list.id}/?focus_price={self.lait.id}", fetch_redirect_response=False
+        )
+
+    def test_closed_list_is_refused_in_the_requested_format(self):
+        ShoppingList.objects.filter(id=self.shopping_list.id).update(closed_at=timezone.now())
+
+        response = self._toggle(Accept="application/json")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("error", response.json())
+
+    def test_receipt_price_returns_line_and_totals(self):
+        self.add_item("Pain", unit_price="2", checked=True)
+        receipt = self.create_receipt()
+        line = receipt.items.get()
+
+        response = self.client.post(
+            reverse("update_receipt_item_price", args=[line.id]), {"actual_price": "2,50"}, headers={"HX-Request": "true"}
+        )
+
+        html = response.content.decode()
+        self.assertTrue(html.startswith(f'<div id="line-{line.id}"'))
+        self.assertIn('<div id="receipt-kpi" class="card" hx-swap-oob="true">', html)
+        self.assertIn('<div id="receipt-summary" class="card mt-12" hx-swap-oob="true">', html)
+        receipt.refresh_from_db()
+        self.assertEqual(receipt.actual_total, Decimal("2.50"))
+
+
+# =========================================================
+# Saisie groupée des prix d'un ticket
+# =========================================================
+class ReceiptBatchPricesTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ("Lait", "Pain", "Beurre"):
+            self.add_item(name, unit_price="1", checked=True)
+        self.receipt = self.create_receipt()
+        self.lines = {line.name: line for line in self.receipt.items.all()}
+        self.url = reverse("update_receipt_prices", args=[self.receipt.id])
+
+    def _post_prices(self, prices: dict):
+        body = {"prices": {str(self.lines[name].id): price for name, price in prices.items()}}
+        return self.client.post(self.url, body, content_type="application/json", headers={"Accept": "application/json"})
+
+    def _actual_prices(self) -> dict[str, Decimal | None]:
+        return dict(self.receipt.items.values_list("name", "actual_price"))
+
+    def test_prices_are_written_together(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._post_prices({"Lait": "1,35", "Pain": None, "Beurre": "1"})
+
+        data = response.json()
+        self.assertEqual(data["updated"], 2)
+        self.assertEqual(
+            (data["summary"]["actual_total"], data["summary"]["missing_actual_count"]), ("2.35", 1)
+        )
+        self.assertEqual(
+            self._actual_prices(), {"Lait": Decimal("1.35"), "Pain": None, "Beurre": Decimal("1.00")}
+        )
+        # Lignes modifiées écrites en un seul UPDATE
+        line_updates = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "core_receiptitem"')]
+        self.assertEqual(len(line_updates), 1)
+        self.assertFalse(Receipt.objects.with_drifted_totals().exists())
+
+    def test_one_invalid_price_writes_nothing(self):
+        response = self._post_prices({"Lait": "1,35", "Pain": "abc"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()["errors"]), [str(self.lines["Pain"].id)])
+        self.assertEqual(self._actual_prices()["Lait"], Decimal("1.00"))
+
+    def test_line_of_another_receipt_is_refused(self):
+        response = self.client.post(
+            self.url, {"prices": {"999999": "1"}}, content_type="application/json", headers={"Accept": "application/json"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_form_fields_are_accepted(self):
+        response = self.client.post(self.url, {f"actual_price_{self.lines['Pain'].id}": "0,80"})
+
+        self.assertRedirects(response, reverse("receipt_detail", args=[self.receipt.id]), fetch_redirect_response=False)
+        self.assertEqual(self._actual_prices()["Pain"], Decimal("0.80"))
+
+
+# =========================================================
+# Opérations groupées sur les items d'une liste
+# =========================================================
+class BatchListItemsTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lait = self.add_item("Lait", unit_price="1.20")
+        self.pain = self.add_item("Pain", checked=True)
+        self.beurre = self.add_item("Beurre", unit_price="2.50", checked=True)
+        self.url = reverse("batch_list_items", args=[self.shopping_list.id])
+
+    def _post(self, operations: list[dict], **headers):
+        return self.client.post(
+            self.url, {"operations": operations}, content_type="application/json",
+            headers={"Accept": "application/json", **headers},
+        )
+
+    def test_each_operation_gets_its_result(self):
+        response = self._post([
+            {"op": "check", "id": self.lait.id},
+            {"op": "update", "id": self.pain.id, "unit_price": "0,90", "qty_value": "2"},
+            {"op": "delete", "id": self.beurre.id},
+            {"op": "check", "id": self.pain.id},
+            {"op": "update", "id": self.pain.id, "unit": "barrique"},
+            {"op": "check", "id": 999999},
+            {"op": "archive", "id": self.lait.id},
+        ])
+
+        data = response.json()
+        self.assertEqual(
+            [r["status"] for r in data["results"]], ["ok", "ok", "ok", "noop", "error", "error", "error"]
+        )
+        self.assertEqual(
+            (data["summary"]["item_count"], data["summary"]["checked_count"], data["summary"]["running_total"]),
+            (2, 2, "3.00"),
+        )
+        self.assertFalse(ListItem.objects.filter(id=self.beurre.id).exists())
+        self.assertFalse(ShoppingList.objects.with_drifted_counters().exists())
+
+    def test_items_are_written_in_one_update(self):
+        items = [self.add_item(f"Produit {n}") for n in range(10)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            self._post([{"op": "check", "id": item.id} for item in items])
+
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "core_listitem"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(ListItem.objects.filter(id__in=[i.id for i in items], is_checked=True).count(), 10)
+
+    def test_htmx_removes_deleted_rows(self):
+        response = self._post([{"op": "delete", "id": self.pain.id}], **{"HX-Request": "true"})
+
+        html = response.content.decode()
+        self.assertIn(f'<div id="item-{self.pain.id}" hx-swap-oob="delete"></div>', html)
+        self.assertIn('<div id="list-summary" hx-swap-oob="true">', html)
+
+    def test_form_applies_one_operation_to_many_items(self):
+        response = self.client.post(self.url, {"op": "uncheck", "item": [self.pain.id, self.beurre.id]})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ListItem.objects.filter(shopping_list=self.shopping_list, is_checked=True).count(), 0)
+
+    def test_too_many_operations_are_refused(self):
+        with mock.patch("core.views_shopping.BATCH_MAX_OPERATIONS", 1):
+            response = self._post([{"op": "check", "id": self.lait.id}] * 2)
+
+        self.assertEqual(response.status_code, 400)
+        self.lait.refresh_from_db()
+        self.assertFalse(self.lait.is_checked)
+
+
+# =========================================================
+# API JSON v1 en lecture
+# =========================================================
+class ReadOnlyApiTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lait = self.add_item("Lait", unit_price="1.20")
+        outsider = make_user("bob")
+        other = make_household(outsider, name="Autre")
+        self.foreign_item = add_list_item(get_or_create_open_list(other), outsider, "Pain")
+
+    def _get(self, name: str, *args, **params):
+        return self.client.get(reverse(name, args=args), params)
+
+    def test_only_member_households_are_listed(self):
+        data = self._get("api-list-item-list").json()
+
+        self.assertEqual([row["id"] for row in data["results"]], [self.lait.id])
+        self.assertEqual(self._get("api-list-item-detail", self.foreign_item.id).status_code, 404)
+
+    def test_filters(self):
+        other_list = ShoppingList.objects.create(household=self.household, closed_at=timezone.now())
+        add_list_item(other_list, self.user, "Beurre")
+
+        by_list = self._get("api-list-item-list", shopping_list=self.shopping_list.id).json()
+        open_lists = self._get("api-shopping-list-list", open=1).json()
+
+        self.assertEqual([row["id"] for row in by_list["results"]], [self.lait.id])
+        self.assertEqual([row["id"] for row in open_lists["results"]], [self.shopping_list.id])
+
+    def test_list_items_are_prefetched_for_the_page(self):
+        self._get("api-shopping-list-list")
+        with CaptureQueriesContext(connection) as one:
+            self._get("api-shopping-list-list")
+        for n in range(3):
+            closed = ShoppingList.objects.create(household=self.household, closed_at=timezone.now())
+            add_list_item(closed, self.user, f"Produit {n}")
+
+        with CaptureQueriesContext(connection) as many:
+            data = self._get("api-shopping-list-list").json()
+
+        self.assertEqual(len(data["results"]), 4)
+        self.assertEqual(len(many.captured_queries), len(one.captured_queries))
+
+    def test_receipts_are_cursor_paginated(self):
+        now = timezone.now()
+        for days in (3, 1, 2):
+            shopping_list = ShoppingList.objects.create(household=self.household, closed_at=now)
+            Receipt.objects.create(household=self.household, shopping_list=shopping_list, purchased_at=now - timedelta(days=days))
+
+        first = self._get("api-receipt-list", page_size=2).json()
+        second = self.client.get(first["next"]).json()
+
+        dates = [row["purchased_at"] for row in first["results"] + second["results"]]
+        self.assertEqual(len(dates), 3)
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        self.assertIsNone(second["next"])
+
+    def test_api_is_read_only(self):
+        response = self.client.post(reverse("api-list-item-list"), {"name": "Beurre"})
+
+        self.assertEqual(response.status_code, 405)
+
+    def test_anonymous_is_refused(self):
+        self.client.logout()
+
+        self.assertIn(self._get("api-list-item-list").status_code, (401, 403))
+
+
+# =========================================================
+# Instantané d'un foyer
+# =========================================================
+class HouseholdSnapshotTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        import_catalog_rows(self.household.id, catalog_rows({"name": "Lait"}, {"name": "Pain"}))
+        ReferenceItem.objects.filter(household=self.household, name="Pain").update(is_active=False)
+        self.lait = self.add_item("Lait", unit_price="1.20", checked=True)
+        self.url = reverse("api-household-snapshot", args=[self.household.id])
+
+    def test_snapshot_content(self):
+        data = self.client.get(self.url).json()
+
+        self.assertEqual([row["name"] for row in data["catalogue"]], ["Lait"])
+        self.assertEqual(data["open_list"]["id"], self.shopping_list.id)
+        self.assertEqual([row["id"] for row in data["open_list"]["items"]], [self.lait.id])
+        self.assertEqual(data["open_list"]["running_total"], "1.20")
+        self.assertEqual(data["aisles"]["al_dairy"], dict(ReferenceItem.AISLE_CHOICES)["al_dairy"])
+        self.assertRegex(data["household"]["cursor"], r"^\d+\.0$")
+
+    def test_unchanged_snapshot_answers_304(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        # Versions seulement : ni catalogue ni items lus
+        tables = (ReferenceItem._meta.db_table, ListItem._meta.db_table)
+        self.assertFalse([q for q in ctx.captured_queries if any(f'FROM "{t}"' in q["sql"] for t in tables)])
+
+    def test_writes_change_the_etag(self):
+        etags = [self.client.get(self.url)["ETag"]]
+
+        self.post_json(reverse("toggle_list_item", args=[self.lait.id]))
+        etags.append(self.client.get(self.url)["ETag"])
+        lait = ReferenceItem.objects.get(household=self.household, name="Lait")
+        self.client.post(reverse("reference_toggle_selected", args=[lait.id]), {"version": lait.version})
+        etags.append(self.client.get(self.url)["ETag"])
+
+        self.assertEqual(len(set(etags)), 3)
+
+    def test_outsider_gets_404(self):
+        self.client.force_login(make_user("bob"))
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+# =========================================================
+# Journal des modifications et synchronisation
+# =========================================================
+class ChangeLogSyncTests(MemberMixin, TransactionTestCase):
+    """
+    Hors transaction de test : chaque écriture est commitée, comme en production
+    (le flux s'arrête aux transactions en cours).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.lait = self.add_item("Lait")
+        self.pain = self.add_item("Pain")
+        self.sync_url = reverse("api-household-sync", args=[self.household.id])
+        self.cursor = self.client.get(reverse("api-household-snapshot", args=[self.household.id])).json()[
+            "household"
+        ]["cursor"]
+
+    def _sync(self, since=None) -> dict:
+        response = self.client.get(self.sync_url, {"since": since or self.cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _upserted(self, data: dict, kind: str = "list_item") -> list[int]:
+        return [row["id"] for row in data["changes"][kind]["upserted"]]
+
+    def test_writes_after_snapshot_are_returned_once(self):
+        self.post_json(reverse("toggle_list_item", args=[self.lait.id]))
+
+        data = self._sync()
+        self.assertEqual(self._upserted(data), [self.lait.id])
+        again = self._sync(data["cursor"])
+        self.assertEqual(self._upserted(again), [])
+        self.assertEqual(again["cursor"], data["cursor"])
+
+    def test_delete_is_reported(self):
+        self.post_json(reverse("delete_list_item", args=[self.pain.id]))
+
+        self.assertEqual(self._sync()["changes"]["list_item"]["deleted"], [self.pain.id])
+
+    def test_catalogue_import_is_logged(self):
+        import_catalog_rows(self.household.id, catalog_rows({"name": "Beurre"}), fast=True)
+
+        beurre = ReferenceItem.objects.get(household=self.household, name="Beurre")
+        self.assertEqual(self._upserted(self._sync(), "reference_item"), [beurre.id])
+
+    def test_bulk_writes_are_logged_by_triggers(self):
+        # Écritures en masse, sans save() : journalisées par les triggers d'instruction
+        ListItem.objects.filter(id=self.lait.id).update(note="bio")
+        ListItem.objects.filter(id=self.pain.id).delete()
+
+        changes = self._sync()["changes"]["list_item"]
+        self.assertEqual(self._upserted({"changes": {"list_item": changes}}), [self.lait.id])
+        self.assertEqual(changes["deleted"], [self.pain.id])
+
+    def test_household_deletion_purges_its_entries(self):
+        self.post_json(reverse("toggle_list_item", args=[self.lait.id]))
+        self.assertTrue(ChangeLogEntry.objects.filter(household_id=self.household.id).exists())
+
+        Household.objects.filter(id=self.household.id).delete()
+
+        self.assertFalse(ChangeLogEntry.objects.filter(household_id=self.household.id).exists())
+
+    def test_pages_follow_the_cursor(self):
+        for item in (self.lait, self.pain):
+            self.post_json(reverse("toggle_list_item", args=[item.id]))
+
+        from . import sync
+
+        first = sync.changes_since(self.household, sync.parse_cursor(self.cursor), limit=1)
+        second = sync.changes_since(self.household, sync.parse_cursor(first["cursor"]), limit=1)
+        self.assertTrue(first["has_more"])
+        self.assertFalse(second["has_more"])
+        self.assertEqual(
+            [self._upserted(first), self._upserted(second)], [[self.lait.id], [self.pain.id]]
+        )
+
+    def test_uncommitted_writer_holds_back_later_commits(self):
+        def toggle_lait():
+            ListItem.objects.filter(id=self.lait.id).bump_version(is_checked=True)
+
+        with OpenTransaction(toggle_lait):
+            self.post_json(reverse("toggle_list_item", args=[self.pain.id]))
+            # Pain est commité, mais après une transaction encore ouverte : pas encore livré
+            pending = self._sync()
+            self.assertEqual(self._upserted(pending), [])
+            self.assertEqual(pending["cursor"], self.cursor)
+
+        self.assertEqual(sorted(self._upserted(self._sync())), sorted([self.lait.id, self.pain.id]))
+
+    def test_item_write_does_not_lock_household(self):
+        def toggle_lait():
+            ListItem.objects.filter(id=self.lait.id).bump_version(is_checked=True)
+
+        with OpenTransaction(toggle_lait):
+            with transaction.atomic():
+                # Échouerait (verrou de ligne) si le journal numérotait les entrées sur core_household
+                list(Household.objects.select_for_update(nowait=True).filter(id=self.household.id))
+                self.post_json(reverse("toggle_list_item", args=[self.pain.id]))
+
+    def test_invalid_cursor_is_refused(self):
+        self.assertEqual(self.client.get(self.sync_url, {"since": "12"}).status_code, 400)
+
+    def _post_sync(self, operations: list[dict], since=None):
+        return self.client.post(
+            self.sync_url, {"since": since or self.cursor, "operations": operations}, content_type="application/json"
+        )
+
+    def test_offline_operations_are_applied(self):
+        response = self._post_sync([{"shopping_list": self.shopping_list.id, "op": "check", "id": self.lait.id}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["status"], "ok")
+        self.lait.refresh_from_db()
+        self.assertTrue(self.lait.is_checked)
+
+    def test_item_changed_since_cursor_is_a_conflict(self):
+        self.post_json(reverse("toggle_list_item", args=[self.lait.id]))
+
+        response = self._post_sync([{"shopping_list": self.shopping_list.id, "op": "uncheck", "id": self.lait.id}])
+
+        self.assertEqual(response.json()["results"][0]["status"], "conflict")
+        self.lait.refresh_from_db()
+        self.assertTrue(self.lait.is_checked)
+
+    def test_other_operation_types_are_refused(self):
+        lait_ref = ReferenceItem.objects.create(household=self.household, name="Lait")
+
+        response = self._post_sync([
+            {"shopping_list": self.shopping_list.id, "op": "check", "id": self.lait.id},
+            {"type": "reference_item", "op": "update", "id": lait_ref.id, "aisle": "al_dairy"},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["indexes"], [1])
+        self.lait.refresh_from_db()
+        self.assertFalse(self.lait.is_checked)
+
+
+# =========================================================
+# Flux WebSocket des listes
+# =========================================================
+class LiveSocket:
+    """
+    Connexion WebSocket simulée sur live.list_websocket (ASGI), avec la session du client.
+    """
+
+    def __init__(self, client: Client, shopping_list_id: int, *, last_event_id: str | None = None):
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        self.scope = {
+            "type": "websocket",
+            "path": f"/ws/shopping-lists/{shopping_list_id}/",
+            "query_string": f"last_event_id={last_event_id}".encode() if last_event_id else b"",
+            "headers": [(b"cookie", cookie.encode())],
+        }
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        await self.inbox.put({"type": "websocket.connect"})
+        self.task = asyncio.create_task(list_websocket(self.scope, self.inbox.get, self.outbox.put))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.inbox.put({"type": "websocket.disconnect"})
+        await asyncio.wait_for(self.task, 5)
+
+    async def receive(self) -> dict:
+        return await asyncio.wait_for(self.outbox.get(), 5)
+
+    async def receive_event(self) -> dict:
+        message = await self.receive()
+        return json.loads(message["text"])
+
+
+class ListWebSocketTests(MemberMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lait = self.add_item("Lait")
+
+    def _toggle(self, item: ListItem):
+        return sync_to_async(self.post_json)(reverse("toggle_list_item", args=[item.id]))
+
+    def _leave_household(self):
+        return sync_to_async(lambda: Membership.objects.filter(user=self.user).delete())()
+
+    async def test_non_member_is_refused(self):
+        outsider = Client()
+        await sync_to_async(outsider.force_login)(await sync_to_async(make_user)("bob"))
+
+        async with LiveSocket(outsider, self.shopping_list.id) as socket:
+            self.assertEqual(await socket.receive(), {"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+
+    async def test_missed_events_are_replayed(self):
+        async with LiveSocket(self.client, self.shopping_list.id) as socket:
+            self.assertEqual((await socket.receive())["type"], "websocket.accept")
+            await self._toggle(self.lait)
+            first = await socket.receive_event()
+        self.assertEqual((first["type"], first["id"]), ("list_item", self.lait.id))
+
+        await self._toggle(self.lait)
+        async with LiveSocket(self.client, self.shopping_list.id, last_event_id=first["event_id"]) as socket:
+            await socket.receive()
+            missed = await socket.receive_event()
+        self.assertEqual(missed["id"], self.lait.id)
+        self.assertFalse(missed["data"]["is_checked"])
+
+    async def test_removed_member_is_disconnected(self):
+        async with LiveSocket(self.client, self.shopping_list.id) as socket:
+            await socket.receive()
+            await self._leave_household()
+            self.assertEqual(await socket.receive(), {"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+
+    async def test_logout_closes_connection(self):
+        async with LiveSocket(self.client, self.shopping_list.id) as socket:
+            await socket.receive()
+            await sync_to_async(self.client.logout)()
+            self.assertEqual(await socket.receive(), {"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+
+    async def test_access_is_rechecked_periodically(self):
+        # Retrait fait par un autre processus : aucun signal reçu ici
+        with mock.patch("core.live.ACCESS_RECHECK_SECONDS", 0.05), mock.patch.object(broadcast, "recheck_user"):
+            async with LiveSocket(self.client, self.shopping_list.id) as socket:
+                await socket.receive()
+                await self._leave_household()
+                self.assertEqual(await socket.receive(), {"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+
+
+# =========================================================
+# Flux Server-Sent Events des listes
+# =========================================================
+class LiveStream:
+    """
+    Requête SSE simulée sur live.list_events (ASGI), avec la session du client.
+    """
+
+    def __init__(self, client: Client, shopping_list_id: int, *, last_event_id: str | None = None):
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        headers = [(b"cookie", cookie.encode())]
+        if last_event_id:
+            headers.append((b"last-event-id", last_event_id.encode()))
+        self.scope = {
+            "type": "http",
+            "method": "GET",
+            "path": reverse("shopping_list_events", args=[shopping_list_id]),
+            "query_string": b"",
+            "headers": headers,
+        }
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+
+    async def __aenter__(self):
+        await self.inbox.put({"type": "http.request", "body": b"", "more_body": False})
+        self.task = asyncio.create_task(list_events(self.scope, self.inbox.get, self.outbox.put))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.inbox.put({"type": "http.disconnect"})
+        await asyncio.wait_for(self.task, 5)
+
+    async def receive(self) -> dict:
+        return await asyncio.wait_for(self.outbox.get(), 5)
+
+    async def open(self) -> dict:
+        """
+        En-tête de la réponse, puis le premier morceau (retry) d'un flux accepté.
+        """
+        start = await self.receive()
+        if start["status"] == 200:
+            assert (await self.read()) == "retry: 3000\n\n"
+        return start
+
+    async def read(self) -> str:
+        return (await self.receive())["body"].decode()
+
+    async def event(self) -> tuple[str, dict]:
+        fields = dict(line.split(": ", 1) for line in (await self.read()).strip().splitlines())
+        return fields["id"], json.loads(fields["data"])
+
+
+class ListEventStreamTests(MemberMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lait = self.add_item("Lait")
+
+    def _toggle(self):
+        return sync_to_async(self.post_json)(reverse("toggle_list_item", args=[self.lait.id]))
+
+    async def _assert_ended(self, stream: LiveStream):
+        self.assertEqual(await stream.receive(), {"type": "http.response.body", "body": b""})
+
+    async def test_stream_headers(self):
+        async with LiveStream(self.client, self.shopping_list.id) as stream:
+            start = await stream.open()
+
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream; charset=utf-8"), start["headers"])
+        self.assertIn((b"cache-control", b"no-cache"), start["headers"])
+
+    async def test_last_event_id_resumes_after_missed_events(self):
+        async with LiveStream(self.client, self.shopping_list.id) as stream:
+            await stream.open()
+            await self._toggle()
+            event_id, event = await stream.event()
+        self.assertEqual((event["type"], event["id"]), ("list_item", self.lait.id))
+
+        await self._toggle()
+        async with LiveStream(self.client, self.shopping_list.id, last_event_id=event_id) as stream:
+            await stream.open()
+            _, missed = await stream.event()
+        self.assertFalse(missed["data"]["is_checked"])
+
+    async def test_unknown_last_event_id_asks_for_resync(self):
+        async with LiveStream(self.client, self.shopping_list.id, last_event_id="autre-1") as stream:
+            await stream.open()
+            _, event = await stream.event()
+        self.assertEqual((event["type"], event["op"]), ("list", "resync"))
+
+    async def test_non_member_is_refused(self):
+        outsider = Client()
+        await sync_to_async(outsider.force_login)(await sync_to_async(make_user)("bob"))
+
+        async with LiveStream(outsider, self.shopping_list.id) as stream:
+            self.assertEqual((await stream.open())["status"], 403)
+
+    async def test_removed_member_stream_ends(self):
+        async with LiveStream(self.client, self.shopping_list.id) as stream:
+            await stream.open()
+            await sync_to_async(lambda: Membership.objects.filter(user=self.user).delete())()
+            await self._assert_ended(stream)
+
+    async def test_logout_ends_stream(self):
+        async with LiveStream(self.client, self.shopping_list.id) as stream:
+            await stream.open()
+            await sync_to_async(self.client.logout)()
+            await self._assert_ended(stream)
+
+    async def test_disconnect_unsubscribes(self):
+        async with LiveStream(self.client, self.shopping_list.id) as stream:
+            await stream.open()
+            self.assertEqual(broadcast.subscriber_count(self.shopping_list.id), 1)
+
+        self.assertEqual(broadcast.subscriber_count(self.shopping_list.id), 0)
+
+    async def test_idle_streams_hold_no_thread(self):
+        threads = threading.active_count()
+        streams = [LiveStream(self.client, self.shopping_list.id) for _ in range(20)]
+        for stream in streams:
+            await stream.__aenter__()
+            await stream.open()
+
+        self.assertLessEqual(threading.active_count(), threads + 1)
+        for stream in streams:
+            await stream.__aexit__(None, None, None)
+
+    def test_wsgi_request_is_refused(self):
+        response = self.client.get(reverse("shopping_list_events", args=[self.shopping_list.id]))
+
+        self.assertEqual(response.status_code, 501)
+
+
+# =========================================================
+# Pages de lecture async
+# =========================================================
+class AsyncPagesTests(MemberTestCase):
+    """
+    Pages de lecture servies en async (AsyncClient : chaîne ASGI, sans passage par un thread).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.add_item("Lait", unit_price="1.20", checked=True)
+        self.add_item("Pain", unit_price="2")
+        self.receipt = self.create_receipt()
+        self.async_client = AsyncClient()
+        self.async_client.force_login(self.user)
+
+    async def test_read_pages_render(self):
+        urls = [
+            reverse("shopping_lists"),
+            reverse("shopping_list_detail", args=[self.shopping_list.id]),
+            reverse("receipt_list"),
+            reverse("receipt_detail", args=[self.receipt.id]),
+            reverse("reference_list", args=[self.household.id]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    async def test_shopping_lists_creates_missing_open_list(self):
+        await ShoppingList.objects.filter(id=self.shopping_list.id).aupdate(closed_at=timezone.now())
+
+        response = await self.async_client.get(reverse("shopping_lists"))
+
+        self.assertEqual(response.status_code, 200)
+        open_list = await ShoppingList.objects.filter(household=self.household, closed_at__isnull=True).afirst()
+        self.assertIsNotNone(open_list)
+        self.assertNotEqual(open_list.id, self.shopping_list.id)
+
+    async def test_unchanged_receipt_answers_304(self):
+        url = reverse("receipt_detail", args=[self.receipt.id])
+        # Première visite : cookie CSRF (il entre dans l'ETag)
+        await self.async_client.get(url)
+        etag = (await self.async_client.get(url))["ETag"]
+
+        response = await self.async_client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    async def test_other_household_gets_404(self):
+        client = AsyncClient()
+        await client.aforce_login(await sync_to_async(make_user)("eve"))
+
+        for url in (
+            reverse("shopping_list_detail", args=[self.shopping_list.id]),
+            reverse("receipt_detail", args=[self.receipt.id]),
+            reverse("reference_list", args=[self.household.id]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual((await client.get(url)).status_code, 404)
+
+
+# =========================================================
+# Fichiers statiques dans la chaîne async
+# =========================================================
+@override_settings(WHITENOISE_USE_FINDERS=True, WHITENOISE_AUTOREFRESH=True)
+class AsyncStaticFilesTests(TestCase):
+    async def test_static_file_is_served(self):
+        response = await AsyncClient().get("/static/core/css/app.css")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/css; charset=\"utf-8\"")
+
+    async def test_missing_static_file_reaches_django(self):
+        response = await AsyncClient().get("/static/core/absent.css")
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_other_requests_skip_whitenoise(self):
+        with mock.patch.object(WhiteNoiseMiddleware, "__call__") as whitenoise:
+            response = await AsyncClient().get(reverse("reference_list", args=[1]))
+
+        self.assertEqual(response.status_code, 302)
+        whitenoise.assert_not_called()
+
+
+# =========================================================
+# Une liste ouverte par foyer, sans verrou
+# =========================================================
+class OpenListTests(MemberTestCase):
+    def test_open_list_is_reused(self):
+        with CaptureQueriesContext(connection) as queries:
+            open_list = get_or_create_open_list(self.household)
+
+        self.assertEqual(open_list.id, self.shopping_list.id)
+        self.assertFalse(any("FOR UPDATE" in q["sql"] for q in queries.captured_queries))
+
+    def test_second_open_list_is_refused(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ShoppingList.objects.create(household=self.household, name="Doublon")
+
+    def test_closed_list_is_replaced(self):
+        ShoppingList.objects.filter(id=self.shopping_list.id).update(closed_at=timezone.now())
+
+        open_list = get_or_create_open_list(self.household)
+
+        self.assertNotEqual(open_list.id, self.shopping_list.id)
+        self.assertEqual(ShoppingList.objects.filter(household=self.household, closed_at__isnull=True).count(), 1)
+
+    def test_missing_lists_are_created_together(self):
+        others = [make_household(self.user, name=f"Foyer {n}") for n in range(3)]
+
+        with self.assertNumQueries(3):
+            lists = get_or_create_open_lists([self.household, *others])
+
+        self.assertEqual(lists[self.household.id].id, self.shopping_list.id)
+        self.assertEqual({sl.household_id for sl in lists.values()}, {h.id for h in [self.household, *others]})
+
+    def test_list_created_meanwhile_is_fetched(self):
+        household = make_household(self.user, name="Chalet")
+        real_bulk_create = ShoppingList.objects.bulk_create
+        meanwhile = []
+
+        def bulk_create_after_other_member(objs, **kwargs):
+            # Un autre membre crée la liste entre la lecture et l'INSERT
+            meanwhile.append(ShoppingList.objects.create(household=household, name="Créée ailleurs"))
+            return real_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(ShoppingList.objects, "bulk_create", side_effect=bulk_create_after_other_member):
+            open_list = get_or_create_open_list(household)
+
+        self.assertEqual(open_list.id, meanwhile[0].id)
+        self.assertEqual(ShoppingList.objects.filter(household=household).count(), 1)
+
+
+# =========================================================
+# Concurrence optimiste : versions des lignes
+# =========================================================
+class VersionConflictTests(MemberTestCase):
+    def setUp(self):
+        super().setUp()
+        self.item = self.add_item("Lait", unit_price="1.20")
+        self.stale_version = self.item.version
+        # Un autre membre a modifié l'item depuis sa lecture
+        ListItem.objects.filter(id=self.item.id).update(note="bio", version=self.stale_version + 1)
+        self.toggle_url = reverse("toggle_list_item", args=[self.item.id])
+
+    def test_stale_toggle_answers_409_with_current_item(self):
+        response = self.post_json(self.toggle_url, {"version": self.stale_version})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["item"]["version"], self.stale_version + 1)
+        self.assertFalse(ListItem.objects.get(id=self.item.id).is_checked)
+
+    def test_stale_toggle_from_htmx_answers_409(self):
+        response = self.client.post(self.toggle_url, {"version": self.stale_version}, HTTP_HX_REQUEST="true")
+
+        self.assertEqual(response.status_code, 409)
+
+    def test_stale_toggle_from_form_redirects_with_message(self):
+        response = self.client.post(self.toggle_url, {"version": self.stale_version}, follow=True)
+
+        self.assertRedirects(response, reverse("shopping_list_detail", args=[self.shopping_list.id]))
+        self.assertIn(CONFLICT_MESSAGE, [str(m) for m in response.context["messages"]])
+        self.assertFalse(ListItem.objects.get(id=self.item.id).is_checked)
+
+    def test_write_after_stale_read_is_refused(self):
+        # Version lue par la vue déjà dépassée au moment de l'UPDATE conditionnel
+        stale_item = ListItem.objects.select_related("shopping_list").get(id=self.item.id)
+        stale_item.version = self.stale_version
+        with mock.patch("core.views_shopping.user_item_or_404", return_value=stale_item):
+            response = self.post_json(self.toggle_url)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(ListItem.objects.get(id=self.item.id).is_checked)
+        self.assertFalse(ShoppingList.objects.with_drifted_counters().exists())
+
+    def test_current_version_is_accepted(self):
+        response = self.post_json(self.toggle_url, {"version": self.stale_version + 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ListItem.objects.get(id=self.item.id).version, self.stale_version + 2)
+
+    def test_stale_receipt_prices_write_nothing(self):
+        self.add_item("Pain", unit_price="2", checked=True)
+        receipt = self.create_receipt()
+        line = receipt.items.get()
+        ReceiptItem.objects.filter(id=line.id).update(version=line.version + 1)
+
+        response = self.client.post(
+            reverse("update_receipt_prices", args=[receipt.id]),
+            {"prices": {str(line.id): "2,50"}, "versions": {str(line.id): line.version}},
+            content_type="application/json",
+            headers={"Accept": "application/json"},
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([it["id"] for it in response.json()["items"]], [line.id])
+        self.assertEqual(ReceiptItem.objects.get(id=line.id).actual_price, line.actual_price)
+
+    def test_stale_reference_item_update_redirects(self):
+        ref = ReferenceItem.objects.create(household=self.household, name="Lait")
+        ReferenceItem.objects.filter(id=ref.id).update(version=ref.version + 1)
+
+        response = self.client.post(reverse("reference_toggle_active", args=[ref.id]), {"version": ref.version})
+
+        self.assertRedirects(response, reverse("reference_list", args=[self.household.id]), fetch_redirect_response=False)
+        self.assertTrue(ReferenceItem.objects.get(id=ref.id).is_active)
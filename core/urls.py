@@ -1,9 +1,19 @@
-from django.urls import path
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
 
 from . import views
 from . import views_reference
 from . import views_shopping
 from . import views_receipt
+from . import views_api
+
+
+api_router = DefaultRouter()
+api_router.register("households", views_api.HouseholdViewSet, basename="api-household")
+api_router.register("catalogue", views_api.ReferenceItemViewSet, basename="api-reference-item")
+api_router.register("shopping-lists", views_api.ShoppingListViewSet, basename="api-shopping-list")
+api_router.register("items", views_api.ListItemViewSet, basename="api-list-item")
+api_router.register("receipts", views_api.ReceiptViewSet, basename="api-receipt")
 
 
 urlpatterns = [
@@ -11,12 +21,15 @@ urlpatterns = [
 
     path("foyers/", views.my_households, name="my_households"),
     path("foyers/creer/", views.create_household, name="create_household"),
+    path("cache/foyers/stats/", views.membership_cache_stats, name="membership_cache_stats"),
 
     path("listes-de-courses/", views_shopping.shopping_lists, name="shopping_lists"),
     path("shopping-lists/", views_shopping.shopping_lists, name="shopping_lists_en"),
     path("shopping-lists/<int:shopping_list_id>/", views_shopping.shopping_list_detail, name="shopping_list_detail"),
+    path("shopping-lists/<int:shopping_list_id>/events/", views_shopping.shopping_list_events, name="shopping_list_events"),
     path("shopping-lists/<int:shopping_list_id>/items/add/", views_shopping.add_list_item, name="add_list_item"),
     path("items/<int:item_id>/toggle/", views_shopping.toggle_list_item, name="toggle_list_item"),
+    path("shopping-lists/<int:shopping_list_id>/items/batch/", views_shopping.batch_list_items, name="batch_list_items"),
 
     # ✅ NEW: update qty/unit/note/unit_price
     path("items/<int:item_id>/update/", views_shopping.update_item_details, name="update_item_details"),
@@ -39,5 +52,9 @@ urlpatterns = [
     path("tickets/<int:receipt_id>/", views_receipt.receipt_detail, name="receipt_detail"),
     path("tickets/<int:receipt_id>/update/", views_receipt.update_receipt_header, name="update_receipt_header"),
     path("ticket-items/<int:item_id>/price/", views_receipt.update_receipt_item_price, name="update_receipt_item_price"),
+    path("tickets/<int:receipt_id>/prices/", views_receipt.update_receipt_prices, name="update_receipt_prices"),
     path("tickets/<int:receipt_id>/validate/", views_receipt.validate_receipt, name="validate_receipt"),
+
+    # API JSON
+    path("api/v1/", include(api_router.urls)),
 ]
\ No newline at end of file
@@ -1,6 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
 from django.shortcuts import redirect, render
 
+from . import membership_cache
 from .models import Household, Membership
 
 
@@ -29,3 +32,11 @@ def create_household(request):
             return redirect("my_households")
 
     return render(request, "core/create_household.html")
+
+
+@staff_member_required
+def membership_cache_stats(request):
+    """
+    Compteurs hit / miss du cache d'appartenance (processus courant).
+    """
+    return JsonResponse(membership_cache.stats())
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db.models import Prefetch
+from django.utils.cache import get_conditional_response
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .models import ChangeLogEntry, Household, ListItem, Receipt, ReceiptItem, ReferenceItem, ShoppingList, UNIT_CHOICES
+from .pagination import ReceiptCursorPagination
+from .permissions import IsHouseholdMember
+from .sync import changed_since, changes_since, parse_cursor, snapshot_cursor
+from .views_common import decimal_or_none
+from .views_shopping import BATCH_MAX_OPERATIONS, apply_list_item_operations
+from .serializers import (
+    HouseholdSerializer,
+    ListItemSerializer,
+    ReceiptSerializer,
+    ReferenceItemSerializer,
+    ShoppingListSerializer,
+)
+
+
+# =========================================================
+# API JSON v1 (lecture) : /api/v1/...
+# Les écritures passent par les endpoints POST existants, qui maintiennent
+# compteurs, totaux et versions (réponses JSON via Accept: application/json).
+# =========================================================
+def _query_int(request, name: str) -> int | None:
+    raw = request.query_params.get(name, "")
+    return int(raw) if raw.isdigit() else None
+
+
+# Type des opérations acceptées par sync (POST)
+SYNC_OPERATION_TYPE = ChangeLogEntry.KIND_LIST_ITEM
+
+
+def _operation_error(index: int, operation: dict, message: str) -> dict:
+    return {"index": index, "op": operation.get("op"), "id": operation.get("id"), "status": "error", "error": message}
+
+
+class _HouseholdScopedViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Base des viewsets : queryset restreint aux foyers de l'utilisateur (for_user),
+    filtre optionnel ?household=<id>.
+    """
+
+    permission_classes = [IsAuthenticated, IsHouseholdMember]
+    model = None
+    # Chemin vers la FK household pour le filtre ?household=
+    household_lookup = "household_id"
+
+    def get_queryset(self):
+        qs = self.model.objects.for_user(self.request.user)
+        household_id = _query_int(self.request, "household")
+        if household_id is not None:
+            qs = qs.filter(**{self.household_lookup: household_id})
+        return qs
+
+
+# Instantané d'un foyer (démarrage à froid du client)
+SNAPSHOT_RECEIPTS = 5
+SNAPSHOT_REFERENCE_FIELDS = (
+    "id", "name", "aisle", "default_qty_value", "default_unit", "default_note", "default_unit_price", "is_selected",
+    "version",
+)
+SNAPSHOT_ITEM_FIELDS = (
+    "id", "name", "aisle", "qty_value", "unit", "note", "is_checked", "unit_price", "estimated_price", "version",
+)
+SNAPSHOT_RECEIPT_FIELDS = (
+    "id", "store_name", "purchased_at", "paper_total",
+    "estimated_total", "actual_total", "missing_actual_count", "version",
+)
+
+
+def _snapshot_rows(qs, fields: tuple[str, ...]) -> list[dict]:
+    """
+    Lignes en dict (colonnes utiles seulement), décimaux en chaîne comme dans les sérialiseurs.
+    """
+    rows = []
+    for row in qs.values(*fields):
+        rows.append({k: decimal_or_none(v) if isinstance(v, Decimal) else v for k, v in row.items()})
+    return rows
+
+
+class HouseholdViewSet(_HouseholdScopedViewSet):
+    model = Household
+    serializer_class = HouseholdSerializer
+    household_lookup = "pk"
+
+    @action(detail=True)
+    def snapshot(self, request, pk=None):
+        """
+        Liste ouverte, catalogue actif et derniers tickets du foyer en une réponse.
+        Rayons et unités : codes dans les lignes, libellés une seule fois (aisles / units).
+
+        ETag = versions de ce qui compose l'instantané (catalog_version, version de la liste
+        ouverte et des derniers tickets) : lues avant le catalogue et les items ;
+        un instantané inchangé coûte un 304 (le client garde alors son curseur, toujours valable).
+        """
+        household = self.get_object()
+        # Avant toute lecture : ce qui a pu changer pendant l'instantané sera renvoyé par sync
+        cursor = snapshot_cursor()
+        open_list = (
+            ShoppingList.objects.filter(household=household, closed_at__isnull=True)
+            .order_by("-created_at", "-id")
+            .first()
+        )
+        # Quelques lignes : lues en entier tout de suite, elles servent aussi à l'ETag
+        receipts = _snapshot_rows(
+            Receipt.objects.filter(household=household).order_by("-purchased_at", "-id")[:SNAPSHOT_RECEIPTS],
+            SNAPSHOT_RECEIPT_FIELDS,
+        )
+
+        etag = "snapshot-h{}-c{}-l{}-r{}".format(
+            household.id,
+            household.catalog_version,
+            f"{open_list.id}.{open_list.version}" if open_list else "0",
+            ".".join(f"{r['id']}:{r['version']}" for r in receipts) or "0",
+        )
+        etag = f'"{etag}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+        data = {
+            "household": {
+                "id": household.id,
+                "name": household.name,
+                "catalog_version": household.catalog_version,
+                # Curseur de départ de la synchronisation (cf. sync)
+                "cursor": cursor,
+            },
+            "aisles": dict(ReferenceItem.AISLE_CHOICES),
+            "units": dict(UNIT_CHOICES),
+            "catalogue": _snapshot_rows(
+                ReferenceItem.objects.filter(household=household, is_active=True).order_by("aisle", "name"),
+                SNAPSHOT_REFERENCE_FIELDS,
+            ),
+            "open_list": None,
+            "receipts": receipts,
+        }
+        if open_list is not None:
+            data["open_list"] = {
+                "id": open_list.id,
+                "name": open_list.name,
+                "created_at": open_list.created_at,
+                "item_count": open_list.item_count,
+                "checked_count": open_list.checked_count,
+                "missing_estimate_count": open_list.missing_estimate_count,
+                "running_total": decimal_or_none(open_list.running_total),
+                "version": open_list.version,
+                "items": _snapshot_rows(open_list.items.order_by("aisle", "name", "id"), SNAPSHOT_ITEM_FIELDS),
+            }
+
+        response = Response(data)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    @action(detail=True, methods=["get", "post"])
+    def sync(self, request, pk=None):
+        """
+        GET ?since=<curseur> : modifications du foyer depuis le curseur (cf. sync.changes_since).
+
+        POST {"since": <curseur>, "operations": [{"shopping_list": 3, "op": "check", "id": 12}, ...]} :
+        mutations faites hors ligne sur les items de liste (opérations du batch de liste).
+        Seuls les items de liste sont acceptés ("type": "list_item", valeur par défaut) : une
+        requête qui porte une opération d'un autre type (catalogue, ligne de ticket) est refusée
+        en entier (400), ces modifications passent par leurs endpoints en ligne.
+        Un item modifié sur le serveur après `since` (ou dont la "version" envoyée n'est plus
+        la sienne) est en conflit : son opération est refusée (status "conflict") et son état
+        courant figure dans les modifications renvoyées.
+        La réponse porte le résultat de chaque opération puis les modifications depuis `since`.
+        """
+        household = self.get_object()
+        params = request.data if request.method == "POST" else request.query_params
+        since = parse_cursor(params.get("since"))
+        if since is None:
+            return Response({"error": "Curseur invalide."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == "GET":
+            return Response(changes_since(household, since))
+
+        operations = request.data.get("operations")
+        if (
+            not isinstance(operations, list)
+            or len(operations) > BATCH_MAX_OPERATIONS
+            or not all(isinstance(op, dict) for op in operations)
+        ):
+            return Response(
+                {"error": f"Requête invalide (au plus {BATCH_MAX_OPERATIONS} opérations)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        unsupported = [
+            index for index, op in enumerate(operations) if op.get("type", SYNC_OPERATION_TYPE) != SYNC_OPERATION_TYPE
+        ]
+        if unsupported:
+            return Response(
+                {
+                    "error": "Seules les opérations sur les items de liste (type list_item) sont synchronisables.",
+                    "indexes": unsupported,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Regroupement par liste (ordre conservé dans chaque liste)
+        by_list: dict[int, list[int]] = {}
+        results: list[dict | None] = [None] * len(operations)
+        for index, op in enumerate(operations):
+            raw = str(op.get("shopping_list", ""))
+            if raw.isdigit():
+                by_list.setdefault(int(raw), []).append(index)
+            else:
+                results[index] = _operation_error(index, op, "Liste manquante.")
+
+        lists = ShoppingList.objects.filter(household=household, id__in=by_list).in_bulk()
+
+        def conflicts(ids: set[int]) -> set[int]:
+            return changed_since(household.id, ChangeLogEntry.KIND_LIST_ITEM, ids, since)
+
+        for shopping_list_id, indexes in by_list.items():
+            shopping_list = lists.get(shopping_list_id)
+            if shopping_list is None or shopping_list.closed_at is not None:
+                error = "Liste introuvable." if shopping_list is None else "Liste clôturée."
+                for index in indexes:
+                    results[index] = _operation_error(index, operations[index], error)
+                continue
+
+            list_results, _items, _deleted = apply_list_item_operations(
+                request.user, shopping_list, [operations[i] for i in indexes], conflicts=conflicts
+            )
+            for index, result in zip(indexes, list_results):
+                results[index] = {**result, "index": index}
+
+        return Response({"results": results, **changes_since(household, since)})
+
+
+class ReferenceItemViewSet(_HouseholdScopedViewSet):
+    model = ReferenceItem
+    serializer_class = ReferenceItemSerializer
+
+
+class ShoppingListViewSet(_HouseholdScopedViewSet):
+    """
+    ?open=1 : listes non clôturées seulement. Les items sont chargés en une requête
+    pour toute la page (prefetch), dans l'ordre d'affichage de la liste.
+    """
+
+    model = ShoppingList
+    serializer_class = ShoppingListSerializer
+
+    def get_queryset(self):
+        qs = super().get_queryset().prefetch_related(
+            Prefetch("items", queryset=ListItem.objects.order_by("aisle", "name", "id"))
+        )
+        if self.request.query_params.get("open") == "1":
+            qs = qs.filter(closed_at__isnull=True)
+        return qs
+
+
+class ListItemViewSet(_HouseholdScopedViewSet):
+    """
+    ?shopping_list=<id> : items d'une liste.
+    """
+
+    model = ListItem
+    serializer_class = ListItemSerializer
+    household_lookup = "shopping_list__household_id"
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        shopping_list_id = _query_int(self.request, "shopping_list")
+        if shopping_list_id is not None:
+            qs = qs.filter(shopping_list_id=shopping_list_id)
+        return qs
+
+
+class ReceiptViewSet(_HouseholdScopedViewSet):
+    model = Receipt
+    serializer_class = ReceiptSerializer
+    pagination_class = ReceiptCursorPagination
+
+    def get_queryset(self):
+        return super().get_queryset().prefetch_related(
+            Prefetch("items", queryset=ReceiptItem.objects.order_by("position", "id"))
+        )
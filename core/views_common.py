@@ -1,44 +1,188 @@
 # core/views_common.py
 from __future__ import annotations
 
+import hashlib
 from contextlib import contextmanager
+from decimal import Decimal
+from functools import wraps
 
+from django.contrib import messages
 from django.db import transaction
-from django.http import Http404
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 
-from .models import Household, Membership, ShoppingList
+from .membership_cache import ahousehold_ids_for
+from .models import Household, ListItem, Receipt, ReceiptItem, ReferenceItem, ShoppingList
 
 
+# Chaque helper vérifie l'appartenance au foyer dans la même requête que le chargement (cf. for_user)
 def user_household_or_404(user, household_id: int) -> Household:
-    household = get_object_or_404(Household, id=household_id)
-    if not Membership.objects.filter(user=user, household=household).exists():
-        raise Http404("Household not found")
-    return household
+    return get_object_or_404(Household.objects.for_user(user), id=household_id)
+
+
+def user_list_or_404(user, shopping_list_id: int) -> ShoppingList:
+    return get_object_or_404(ShoppingList.objects.for_user(user), id=shopping_list_id)
+
+
+def user_item_or_404(user, item_id: int) -> ListItem:
+    return get_object_or_404(ListItem.objects.for_user(user), id=item_id)
+
+
+def user_reference_item_or_404(user, item_id: int) -> ReferenceItem:
+    return get_object_or_404(ReferenceItem.objects.for_user(user), id=item_id)
+
+
+def user_receipt_or_404(user, receipt_id: int) -> Receipt:
+    return get_object_or_404(Receipt.objects.for_user(user), id=receipt_id)
+
+
+def user_receipt_item_or_404(user, item_id: int) -> ReceiptItem:
+    return get_object_or_404(ReceiptItem.objects.for_user(user), id=item_id)
+
+
+def versioned_etag(request, prefix: str, version: int | None) -> str | None:
+    """
+    ETag d'une page de détail : version de l'objet + utilisateur (le gabarit de base dépend de lui)
+    + empreinte du secret CSRF (les formulaires de la page portent un jeton qui en dépend : après
+    une reconnexion, rotate_token change le secret et une page en cache serait refusée en 403).
+    None (pas de 304) si l'objet est inaccessible, si le navigateur n'a pas encore de secret CSRF
+    ou si des messages attendent d'être affichés.
+    """
+    csrf_secret = request.META.get("CSRF_COOKIE")
+    if version is None or not csrf_secret or len(messages.get_messages(request)):
+        return None
+    csrf_digest = hashlib.blake2b(csrf_secret.encode(), digest_size=8).hexdigest()
+    return f"{prefix}-v{version}-u{request.user.pk}-c{csrf_digest}"
+
+
+# =========================================================
+# Vues async (lecture)
+# =========================================================
+async def auser_household_ids(request) -> frozenset[int]:
+    """
+    Ids des foyers de request.user dans une vue async (à passer à for_household_ids) :
+    utilisateur (session comprise) et foyers chargés sans bloquer. request.user est remplacé
+    par l'utilisateur chargé : messages, ETag, gabarits et context processors l'utilisent
+    ensuite sans requête.
+    """
+    request.user = await request.auser()
+    return await ahousehold_ids_for(request.user)
+
+
+async def alist(queryset) -> list:
+    return [obj async for obj in queryset]
+
+
+def async_etag(etag_func):
+    """
+    @etag pour une vue async : etag_func est une coroutine (ORM async), que le décorateur
+    de Django (synchrone) ne sait pas attendre.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = None
+            if request.method in ("GET", "HEAD"):
+                etag = await etag_func(request, *args, **kwargs)
+                etag = quote_etag(etag) if etag is not None else None
+                response = get_conditional_response(request, etag=etag)
+                if response is not None:
+                    return response
+
+            response = await view(request, *args, **kwargs)
+            if etag is not None and request.method in ("GET", "HEAD"):
+                response.headers.setdefault("ETag", etag)
+            return response
+
+        return inner
+
+    return decorator
+
+
+# =========================================================
+# Réponses partielles (htmx / JSON) des vues POST
+# =========================================================
+def partial_format(request) -> str | None:
+    """
+    "html" pour une requête htmx (en-tête HX-Request), "json" si le client accepte
+    application/json, sinon None : la vue garde son POST → redirection (sans JS).
+    """
+    if request.headers.get("HX-Request") == "true":
+        return "html"
+    if "application/json" in request.headers.get("Accept", ""):
+        return "json"
+    return None
+
+
+def partial_error(fmt: str, message: str, *, status: int) -> HttpResponse:
+    if fmt == "json":
+        return JsonResponse({"error": message}, status=status)
+    return HttpResponse(message, status=status, content_type="text/plain; charset=utf-8")
+
+
+def decimal_or_none(value: Decimal | None) -> str | None:
+    """
+    Décimal sérialisé en chaîne (pas de float en JSON pour des montants).
+    """
+    return None if value is None else str(value)
+
+
+# =========================================================
+# Écritures conditionnelles (verrouillage optimiste, cf. VersionedQuerySetMixin)
+# =========================================================
+CONFLICT_MESSAGE = "Modifié entre-temps par un autre membre : vérifiez puis recommencez."
+
+
+def version_matches(request, obj, field: str = "version") -> bool:
+    """
+    False si le client a envoyé la version de l'objet qu'il a lue (champ `field`) et qu'elle
+    n'est plus la version courante : il a agi sur un état périmé. Sans version envoyée,
+    l'écriture reste conditionnelle à la version lue par la vue.
+    """
+    raw = (request.POST.get(field) or "").strip()
+    return not raw.isdigit() or int(raw) == obj.version
 
 
 @contextmanager
 def lock_household(household: Household):
     """
-    Verrou pessimiste sur le foyer pour éviter deux listes ouvertes créées en parallèle.
+    Verrou pessimiste sur le foyer : sérialise les écritures qui remplacent la liste ouverte
+    (génération depuis le catalogue). La lecture de la liste ouverte n'en a pas besoin.
     """
     with transaction.atomic():
         Household.objects.select_for_update().filter(id=household.id).first()
         yield
 
 
-def get_or_create_open_list(household: Household, *, name: str = "Liste magasin") -> ShoppingList:
+def get_or_create_open_lists(households, *, name: str = "Liste magasin") -> dict[int, ShoppingList]:
     """
-    Retourne la ShoppingList ouverte (closed_at IS NULL) la plus récente.
-    Sinon en crée une nouvelle.
+    {household_id: liste ouverte} pour plusieurs foyers : une requête, sans verrou.
+    Les foyers sans liste ouverte en reçoivent une (un INSERT groupé puis une relecture).
+
+    L'unicité vient de l'index partiel shoppinglist_one_open_per_household : l'INSERT
+    ignore les conflits (ON CONFLICT DO NOTHING), une liste créée en parallèle est relue.
     """
-    with lock_household(household):
-        sl = (
-            ShoppingList.objects
-            .filter(household=household, closed_at__isnull=True)
-            .order_by("-created_at", "-id")
-            .first()
+    households = {h.id: h for h in households}
+    open_lists = ShoppingList.objects.filter(closed_at__isnull=True)
+
+    lists = {sl.household_id: sl for sl in open_lists.filter(household_id__in=households)}
+    missing = [hid for hid in households if hid not in lists]
+    if missing:
+        ShoppingList.objects.bulk_create(
+            [ShoppingList(household=households[hid], name=name) for hid in missing], ignore_conflicts=True
         )
-        if sl:
-            return sl
-        return ShoppingList.objects.create(household=household, name=name)
+        lists.update((sl.household_id, sl) for sl in open_lists.filter(household_id__in=missing))
+
+    for sl in lists.values():
+        sl.household = households[sl.household_id]
+    return lists
+
+
+def get_or_create_open_list(household: Household, *, name: str = "Liste magasin") -> ShoppingList:
+    """
+    Retourne la ShoppingList ouverte (closed_at IS NULL) du foyer, créée au besoin.
+    """
+    return get_or_create_open_lists([household], name=name)[household.id]
@@ -1,37 +1,48 @@
 from __future__ import annotations
 
-from decimal import Decimal, InvalidOperation
+import asyncio
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from urllib.parse import urlencode
 
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.http import Http404, HttpRequest, HttpResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.db.models import Count, Q
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
 from django.views.decorators.http import require_POST
 
-from .models import Membership, ShoppingList, Receipt, ReceiptItem
+from .live import publish_list_event
+from .models import Household, Receipt, ReceiptItem, ShoppingList
+from .views_common import (
+    CONFLICT_MESSAGE,
+    alist,
+    async_etag,
+    auser_household_ids,
+    decimal_or_none,
+    partial_error,
+    partial_format,
+    user_list_or_404,
+    user_receipt_item_or_404,
+    user_receipt_or_404,
+    version_matches,
+    versioned_etag,
+)
 
 TOLERANCE = Decimal("0.02")
-
-
-def _user_list_or_404(user, shopping_list_id: int) -> ShoppingList:
-    sl = get_object_or_404(ShoppingList, id=shopping_list_id)
-    if not Membership.objects.filter(user=user, household=sl.household).exists():
-        raise Http404("ShoppingList not found")
-    return sl
-
-
-def _user_receipt_or_404(user, receipt_id: int) -> Receipt:
-    receipt = get_object_or_404(Receipt, id=receipt_id)
-    if not Membership.objects.filter(user=user, household=receipt.household).exists():
-        raise Http404("Receipt not found")
-    return receipt
+RECEIPTS_PAGE_SIZE = 30
+# Borne des prix saisis (DecimalField max_digits=10, decimal_places=2)
+MAX_PRICE = Decimal("100000000")
 
 
 def _enrich_receipt_for_ui(r: Receipt) -> Receipt:
-    r.lines_count = len(r.items.all())
+    # lines_count vient de l'annotation (Count), les totaux sont stockés sur le ticket
     r.actual_total_ui = r.actual_total
     r.estimated_total_ui = r.estimated_total
 
@@ -43,23 +54,97 @@ def _enrich_receipt_for_ui(r: Receipt) -> Receipt:
     return r
 
 
+def _parse_date_or_none(raw: str | None) -> date | None:
+    try:
+        return date.fromisoformat((raw or "").strip())
+    except ValueError:
+        return None
+
+
+def _start_of_day(d: date) -> datetime:
+    return timezone.make_aware(datetime.combine(d, time.min), timezone.get_current_timezone())
+
+
+def _encode_cursor(r: Receipt) -> str:
+    return f"{r.purchased_at.isoformat()}|{r.id}"
+
+
+def _decode_cursor(raw: str | None) -> tuple[datetime, int] | None:
+    try:
+        ts, pk = (raw or "").rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(pk)
+    except ValueError:
+        return None
+
+
 @login_required
-def receipt_list(request: HttpRequest) -> HttpResponse:
+async def receipt_list(request: HttpRequest) -> HttpResponse:
+    """
+    Historique paginé par clé sur (-purchased_at, -id) : une page = une requête bornée,
+    quelle que soit la longueur de l'historique. Filtres : foyer et période (du / au inclus).
+    """
+    household_ids = await auser_household_ids(request)
+
     qs = (
-        Receipt.objects.filter(household__memberships__user=request.user)
-        .select_related("household", "shopping_list")
-        .prefetch_related("items")
-        .distinct()
+        Receipt.objects.for_household_ids(household_ids)
+        .annotate(lines_count=Count("items"))
         .order_by("-purchased_at", "-id")
     )
-    receipts = [_enrich_receipt_for_ui(r) for r in qs]
-    return render(request, "core/receipt_list.html", {"receipts": receipts, "tolerance": TOLERANCE})
+
+    household_raw = (request.GET.get("household") or "").strip()
+    household_id = int(household_raw) if household_raw.isdigit() else None
+    if household_id is not None:
+        qs = qs.filter(household_id=household_id)
+
+    # Bornes en datetime (et non purchased_at__date) pour rester sur l'index
+    date_from = _parse_date_or_none(request.GET.get("from"))
+    date_to = _parse_date_or_none(request.GET.get("to"))
+    if date_from is not None:
+        qs = qs.filter(purchased_at__gte=_start_of_day(date_from))
+    if date_to is not None:
+        qs = qs.filter(purchased_at__lt=_start_of_day(date_to + timedelta(days=1)))
+
+    cursor = _decode_cursor(request.GET.get("after"))
+    if cursor is not None:
+        ts, pk = cursor
+        qs = qs.filter(Q(purchased_at__lt=ts) | Q(purchased_at=ts, id__lt=pk))
+
+    # Une ligne de plus que la page : indique s'il existe une page suivante.
+    # Foyers (filtre) et page lus en parallèle
+    households, page = await asyncio.gather(
+        alist(Household.objects.for_household_ids(household_ids).order_by("name")),
+        alist(qs[: RECEIPTS_PAGE_SIZE + 1]),
+    )
+    has_next = len(page) > RECEIPTS_PAGE_SIZE
+    receipts = [_enrich_receipt_for_ui(r) for r in page[:RECEIPTS_PAGE_SIZE]]
+
+    filters = {
+        "household": household_id or "",
+        "from": date_from.isoformat() if date_from else "",
+        "to": date_to.isoformat() if date_to else "",
+    }
+    active_filters = {k: v for k, v in filters.items() if v}
+    next_query = urlencode({**active_filters, "after": _encode_cursor(receipts[-1])}) if has_next else None
+
+    return render(
+        request,
+        "core/receipt_list.html",
+        {
+            "receipts": receipts,
+            "tolerance": TOLERANCE,
+            "households": households,
+            "filters": filters,
+            "is_first_page": cursor is None,
+            "first_query": urlencode(active_filters),
+            "next_query": next_query,
+        },
+    )
 
 
 @login_required
 @require_POST
 def create_receipt(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
-    shopping_list = _user_list_or_404(request.user, shopping_list_id)
+    shopping_list = user_list_or_404(request.user, shopping_list_id)
 
     if shopping_list.closed_at is not None:
         messages.error(request, "Cette liste est clôturée. Démarre une nouvelle session.")
@@ -76,6 +161,28 @@ def create_receipt(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
         messages.error(request, "Coche au moins un produit pris en rayon avant de créer le ticket.")
         return redirect("shopping_list_detail", shopping_list_id=shopping_list.id)
 
+    lines: list[ReceiptItem] = []
+    for pos, it in enumerate(checked_items, start=1):
+        lines.append(
+            ReceiptItem(
+                list_item=it,
+                position=pos,
+                name=it.name,
+                estimated_price=it.estimated_price,
+                actual_price=it.estimated_price,
+            )
+        )
+
+    # Totaux calculés une fois ici : le ticket est créé avec ses totaux déjà justes
+    estimated_total = Decimal("0.00")
+    actual_total = Decimal("0.00")
+    missing_actual_count = 0
+    for line in lines:
+        estimated, actual, missing = line.totals_contribution()
+        estimated_total += estimated
+        actual_total += actual
+        missing_actual_count += missing
+
     with transaction.atomic():
         receipt = Receipt.objects.create(
             household=shopping_list.household,
@@ -83,21 +190,16 @@ def create_receipt(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
             store_name="",
             paper_total=None,
             purchased_at=timezone.now(),
+            estimated_total=estimated_total,
+            actual_total=actual_total,
+            missing_actual_count=missing_actual_count,
         )
-
-        lines: list[ReceiptItem] = []
-        for pos, it in enumerate(checked_items, start=1):
-            lines.append(
-                ReceiptItem(
-                    receipt=receipt,
-                    list_item=it,
-                    position=pos,
-                    name=it.name,
-                    estimated_price=it.estimated_price,
-                    actual_price=it.estimated_price,
-                )
-            )
+        for line in lines:
+            line.receipt = receipt
         ReceiptItem.objects.bulk_create(lines)
+        # La page de la liste affiche désormais son ticket
+        ShoppingList.objects.filter(id=shopping_list.id).bump_version()
+        publish_list_event(shopping_list.id, "list", "receipt", shopping_list.id, {"receipt_id": receipt.id})
 
     messages.success(
         request,
@@ -107,26 +209,185 @@ def create_receipt(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
     return redirect("receipt_detail", receipt_id=receipt.id)
 
 
-@login_required
-def receipt_detail(request: HttpRequest, receipt_id: int) -> HttpResponse:
-    receipt = _user_receipt_or_404(request.user, receipt_id)
-    items = receipt.items.all().order_by("position", "id")
-
-    estimated_total = receipt.estimated_total
-    actual_total = receipt.actual_total
+def _receipt_summary_context(receipt: Receipt, lines_count: int) -> dict:
+    """
+    Contexte de core/_receipt_kpi.html et core/_receipt_summary.html (totaux stockés du ticket).
+    """
     paper_total = receipt.paper_total
 
     delta = None
     ok = None
     if paper_total is not None:
-        delta = actual_total - paper_total
+        delta = receipt.actual_total - paper_total
         ok = abs(delta) <= TOLERANCE
 
     missing_actual_count = receipt.missing_actual_count
-    filled_actual_count = len([i for i in items if i.actual_price is not None])
-    can_validate = (paper_total is not None) and (missing_actual_count == 0)
+    return {
+        "receipt": receipt,
+        "estimated_total": receipt.estimated_total,
+        "actual_total": receipt.actual_total,
+        "paper_total": paper_total,
+        "delta": delta,
+        "ok": ok,
+        "tolerance": TOLERANCE,
+        "missing_actual_count": missing_actual_count,
+        "filled_actual_count": lines_count - missing_actual_count,
+        "lines_count": lines_count,
+        "can_validate": (paper_total is not None) and (missing_actual_count == 0),
+    }
+
+
+def _receipt_item_partial_response(request: HttpRequest, fmt: str, item: ReceiptItem) -> HttpResponse:
+    """
+    Ligne de ticket mise à jour + totaux rafraîchis.
+    htmx : fragment de ligne + résumés en hx-swap-oob ; JSON : données + fragment de ligne.
+    """
+    receipt = (
+        Receipt.objects.select_related("household", "shopping_list")
+        .annotate(lines_count=Count("items"))
+        .get(id=item.receipt_id)
+    )
+    context = _receipt_summary_context(receipt, receipt.lines_count)
+    row_html = render_to_string("core/_receipt_item_row.html", {**context, "it": item}, request=request)
+
+    if fmt == "html":
+        oob = {**context, "oob": True}
+        return HttpResponse(
+            row_html
+            + render_to_string("core/_receipt_kpi.html", oob, request=request)
+            + render_to_string("core/_receipt_summary.html", oob, request=request)
+        )
 
-    focus_paper = paper_total is None
+    return JsonResponse({
+        "item": _receipt_item_json(item),
+        "summary": _receipt_summary_json(context),
+        "html": row_html,
+    })
+
+
+def _receipt_item_json(item: ReceiptItem) -> dict:
+    return {
+        "id": item.id,
+        "estimated_price": decimal_or_none(item.estimated_price),
+        "actual_price": decimal_or_none(item.actual_price),
+        "version": item.version,
+    }
+
+
+def _receipt_conflict_response(request: HttpRequest, fmt: str | None, receipt_id: int, line_ids) -> HttpResponse:
+    """
+    Prix refusés, des lignes ont changé depuis leur lecture : 409 avec leur état courant
+    en JSON, sinon message + redirection vers le ticket à jour.
+    """
+    if fmt == "json":
+        current = ReceiptItem.objects.filter(id__in=list(line_ids)).order_by("id")
+        return JsonResponse(
+            {"error": CONFLICT_MESSAGE, "items": [_receipt_item_json(line) for line in current]}, status=409
+        )
+    if fmt:
+        return partial_error(fmt, CONFLICT_MESSAGE, status=409)
+    messages.error(request, CONFLICT_MESSAGE)
+    return redirect("receipt_detail", receipt_id=receipt_id)
+
+
+def _publish_receipt_item(receipt: Receipt, item: ReceiptItem) -> None:
+    publish_list_event(receipt.shopping_list_id, "receipt_item", "upsert", item.id, _receipt_item_json(item))
+
+
+def _receipt_summary_json(context: dict) -> dict:
+    return {
+        "estimated_total": decimal_or_none(context["estimated_total"]),
+        "actual_total": decimal_or_none(context["actual_total"]),
+        "paper_total": decimal_or_none(context["paper_total"]),
+        "delta": decimal_or_none(context["delta"]),
+        "ok": context["ok"],
+        "lines_count": context["lines_count"],
+        "missing_actual_count": context["missing_actual_count"],
+        "filled_actual_count": context["filled_actual_count"],
+        "can_validate": context["can_validate"],
+        "version": context["receipt"].version,
+    }
+
+
+def _parse_actual_price(raw: str | None) -> Decimal | None:
+    """
+    Prix réel saisi ("" = non renseigné), arrondi au centime comme en base. ValueError si invalide.
+    """
+    raw = (raw or "").strip().replace(",", ".")
+    if raw == "":
+        return None
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        raise ValueError(raw)
+    if not value.is_finite() or abs(value) >= MAX_PRICE:
+        raise ValueError(raw)
+    return value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _submitted_prices(request: HttpRequest) -> dict[int, str | None] | None:
+    """
+    {id de ligne: saisie brute} depuis un corps JSON {"prices": {"<id>": "1,23" | null}}
+    ou des champs de formulaire actual_price_<id>. None si la requête est mal formée.
+    """
+    if request.content_type == "application/json":
+        try:
+            prices = json.loads(request.body or b"{}")["prices"]
+            return {int(k): (None if v is None else str(v)) for k, v in prices.items()}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    prefix = "actual_price_"
+    return {
+        int(key[len(prefix):]): value
+        for key, value in request.POST.items()
+        if key.startswith(prefix) and key[len(prefix):].isdigit()
+    }
+
+
+def _submitted_versions(request: HttpRequest) -> dict[int, int]:
+    """
+    {id de ligne: version lue par le client} depuis un corps JSON {"versions": {"<id>": 3}}
+    ou des champs version_<id>. Les valeurs illisibles sont ignorées.
+    """
+    if request.content_type == "application/json":
+        try:
+            pairs = (json.loads(request.body or b"{}").get("versions") or {}).items()
+        except (ValueError, AttributeError):
+            return {}
+    else:
+        prefix = "version_"
+        pairs = [(key[len(prefix):], value) for key, value in request.POST.items() if key.startswith(prefix)]
+    return {int(k): int(v) for k, v in pairs if str(k).isdigit() and str(v).isdigit()}
+
+
+async def _receipt_etag(request: HttpRequest, receipt_id: int) -> str | None:
+    household_ids = await auser_household_ids(request)
+    version = await (
+        Receipt.objects.for_household_ids(household_ids)
+        .filter(id=receipt_id)
+        .values_list("version", flat=True)
+        .afirst()
+    )
+    return versioned_etag(request, f"receipt-{receipt_id}", version)
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@async_etag(_receipt_etag)
+async def receipt_detail(request: HttpRequest, receipt_id: int) -> HttpResponse:
+    # Ticket et lignes en parallèle (lignes ignorées si le ticket est inaccessible : 404)
+    household_ids = await auser_household_ids(request)
+    receipt, items = await asyncio.gather(
+        Receipt.objects.for_household_ids(household_ids).filter(id=receipt_id).afirst(),
+        alist(ReceiptItem.objects.filter(receipt_id=receipt_id).order_by("position", "id")),
+    )
+    if receipt is None:
+        raise Http404
+
+    summary = _receipt_summary_context(receipt, len(items))
+
+    focus_paper = receipt.paper_total is None
     focus_item_id = None
     if not focus_paper:
         missing = next((i for i in items if i.actual_price is None), None)
@@ -136,18 +397,8 @@ def receipt_detail(request: HttpRequest, receipt_id: int) -> HttpResponse:
         request,
         "core/receipt_detail.html",
         {
-            "receipt": receipt,
+            **summary,
             "items": items,
-            "estimated_total": estimated_total,
-            "actual_total": actual_total,
-            "paper_total": paper_total,
-            "delta": delta,
-            "ok": ok,
-            "tolerance": TOLERANCE,
-            "missing_actual_count": missing_actual_count,
-            "filled_actual_count": filled_actual_count,
-            "lines_count": len(items),
-            "can_validate": can_validate,
             "focus_paper": focus_paper,
             "focus_item_id": focus_item_id,
         },
@@ -157,7 +408,7 @@ def receipt_detail(request: HttpRequest, receipt_id: int) -> HttpResponse:
 @login_required
 @require_POST
 def update_receipt_header(request: HttpRequest, receipt_id: int) -> HttpResponse:
-    receipt = _user_receipt_or_404(request.user, receipt_id)
+    receipt = user_receipt_or_404(request.user, receipt_id)
 
     store_name = (request.POST.get("store_name") or "").strip()
     purchased_at_raw = (request.POST.get("purchased_at") or "").strip()
@@ -167,8 +418,6 @@ def update_receipt_header(request: HttpRequest, receipt_id: int) -> HttpResponse
 
     if purchased_at_raw:
         try:
-            from datetime import datetime
-
             dt = datetime.fromisoformat(purchased_at_raw)
             if timezone.is_naive(dt):
                 dt = timezone.make_aware(dt, timezone.get_current_timezone())
@@ -186,7 +435,11 @@ def update_receipt_header(request: HttpRequest, receipt_id: int) -> HttpResponse
             messages.error(request, "Montant total invalide.")
             return redirect("receipt_detail", receipt_id=receipt.id)
 
-    receipt.save(update_fields=["store_name", "purchased_at", "paper_total"])
+    Receipt.objects.filter(id=receipt.id).bump_version(
+        store_name=receipt.store_name,
+        purchased_at=receipt.purchased_at,
+        paper_total=receipt.paper_total,
+    )
     messages.success(request, "Ticket mis à jour.")
     return redirect("receipt_detail", receipt_id=receipt.id)
 
@@ -194,27 +447,159 @@ def update_receipt_header(request: HttpRequest, receipt_id: int) -> HttpResponse
 @login_required
 @require_POST
 def update_receipt_item_price(request: HttpRequest, item_id: int) -> HttpResponse:
-    item = get_object_or_404(ReceiptItem, id=item_id)
-    receipt = _user_receipt_or_404(request.user, item.receipt_id)
+    item = user_receipt_item_or_404(request.user, item_id)
+    receipt = item.receipt
+    fmt = partial_format(request)
 
-    raw = (request.POST.get("actual_price") or "").strip().replace(",", ".")
-    if raw == "":
-        item.actual_price = None
-    else:
-        try:
-            item.actual_price = Decimal(raw)
-        except (InvalidOperation, ValueError):
-            messages.error(request, f"Prix invalide pour « {item.name} ».")
-            return redirect("receipt_detail", receipt_id=receipt.id)
+    try:
+        actual_price = _parse_actual_price(request.POST.get("actual_price"))
+    except ValueError:
+        if fmt:
+            return partial_error(fmt, f"Prix invalide pour « {item.name} ».", status=400)
+        messages.error(request, f"Prix invalide pour « {item.name} ».")
+        return redirect("receipt_detail", receipt_id=receipt.id)
+
+    if not version_matches(request, item):
+        return _receipt_conflict_response(request, fmt, receipt.id, [item.id])
+
+    with transaction.atomic():
+        # Écriture conditionnelle à la version lue : le delta part de la valeur remplacée
+        _, old_actual, old_missing = item.totals_contribution()
+        item.actual_price = actual_price
+        if not ReceiptItem.objects.update_if_version(item, ["actual_price"]):
+            return _receipt_conflict_response(request, fmt, receipt.id, [item.id])
+        _, new_actual, new_missing = item.totals_contribution()
+        Receipt.objects.filter(id=receipt.id).add_to_totals(
+            actual=new_actual - old_actual,
+            missing=new_missing - old_missing,
+        )
+        _publish_receipt_item(receipt, item)
+
+    if fmt:
+        return _receipt_item_partial_response(request, fmt, item)
 
-    item.save(update_fields=["actual_price"])
     return redirect("receipt_detail", receipt_id=receipt.id)
 
 
+@login_required
+@require_POST
+def update_receipt_prices(request: HttpRequest, receipt_id: int) -> HttpResponse:
+    """
+    Saisie groupée des prix réels d'un ticket : toutes les valeurs sont validées ensemble
+    (rien n'est écrit si l'une est invalide), puis écrites en un bulk_update conditionnel
+    à la version lue de chaque ligne, avec un seul delta sur les totaux : si une ligne
+    modifiée a changé entre-temps, rien n'est écrit (409). Versions lues par le client
+    (facultatives) : {"versions": {"<id>": 3}} ou champs version_<id>.
+    Répond par les totaux recalculés (JSON / htmx) ou redirige.
+    """
+    receipt = user_receipt_or_404(request.user, receipt_id)
+    fmt = partial_format(request)
+
+    raw_prices = _submitted_prices(request)
+    if raw_prices is None:
+        if fmt:
+            return partial_error(fmt, "Requête invalide.", status=400)
+        messages.error(request, "Requête invalide.")
+        return redirect("receipt_detail", receipt_id=receipt.id)
+
+    expected_versions = _submitted_versions(request)
+    changed: list[ReceiptItem] = []
+    conflicted: set[int] = set()
+    # Versions lues des lignes d'une écriture annulée (une ligne a changé entre-temps)
+    failed_versions: dict[int, int] = {}
+    errors: dict[int, str] = {}
+    with transaction.atomic():
+        lines = {it.id: it for it in ReceiptItem.objects.filter(receipt=receipt, id__in=list(raw_prices))}
+
+        parsed: dict[int, Decimal | None] = {}
+        for line_id, raw in raw_prices.items():
+            line = lines.get(line_id)
+            if line is None:
+                errors[line_id] = f"Ligne {line_id} inconnue sur ce ticket."
+                continue
+            try:
+                parsed[line_id] = _parse_actual_price(raw)
+            except ValueError:
+                errors[line_id] = f"Prix invalide pour « {line.name} »."
+
+        if not errors:
+            actual_delta = Decimal("0")
+            missing_delta = 0
+            for line_id, actual_price in parsed.items():
+                line = lines[line_id]
+                if line.actual_price == actual_price:
+                    continue
+                # Seules les lignes écrites comptent : une valeur inchangée n'écrase rien
+                if expected_versions.get(line_id, line.version) != line.version:
+                    conflicted.add(line_id)
+                _, old_actual, old_missing = line.totals_contribution()
+                line.actual_price = actual_price
+                _, new_actual, new_missing = line.totals_contribution()
+                actual_delta += new_actual - old_actual
+                missing_delta += new_missing - old_missing
+                changed.append(line)
+
+            if changed and not conflicted:
+                read_versions = {line.id: line.version for line in changed}
+                at_read_versions = ReceiptItem.objects.at_versions(changed)
+                for line in changed:
+                    line.version += 1
+                if at_read_versions.bulk_update(changed, ["actual_price", "version"]) != len(changed):
+                    transaction.set_rollback(True)
+                    failed_versions = read_versions
+                else:
+                    Receipt.objects.filter(id=receipt.id).add_to_totals(actual=actual_delta, missing=missing_delta)
+                    for line in changed:
+                        _publish_receipt_item(receipt, line)
+
+    if failed_versions:
+        # Lues après l'annulation : les lignes réellement modifiées entre-temps
+        conflicted = ReceiptItem.objects.changed_versions(failed_versions) or set(failed_versions)
+
+    if conflicted:
+        return _receipt_conflict_response(request, fmt, receipt.id, conflicted)
+
+    if errors:
+        if fmt == "json":
+            return JsonResponse({"errors": {str(k): v for k, v in errors.items()}}, status=400)
+        if fmt:
+            return partial_error(fmt, " ".join(errors.values()), status=400)
+        for message in errors.values():
+            messages.error(request, message)
+        return redirect("receipt_detail", receipt_id=receipt.id)
+
+    if not fmt:
+        return redirect("receipt_detail", receipt_id=receipt.id)
+
+    receipt = (
+        Receipt.objects.select_related("household", "shopping_list")
+        .annotate(lines_count=Count("items"))
+        .get(id=receipt.id)
+    )
+    context = _receipt_summary_context(receipt, receipt.lines_count)
+
+    if fmt == "html":
+        oob = {**context, "oob": True}
+        rows = "".join(
+            render_to_string("core/_receipt_item_row.html", {**oob, "it": line}, request=request) for line in changed
+        )
+        return HttpResponse(
+            rows
+            + render_to_string("core/_receipt_kpi.html", oob, request=request)
+            + render_to_string("core/_receipt_summary.html", oob, request=request)
+        )
+
+    return JsonResponse({
+        "updated": len(changed),
+        "items": [_receipt_item_json(line) for line in changed],
+        "summary": _receipt_summary_json(context),
+    })
+
+
 @login_required
 @require_POST
 def validate_receipt(request: HttpRequest, receipt_id: int) -> HttpResponse:
-    receipt = _user_receipt_or_404(request.user, receipt_id)
+    receipt = user_receipt_or_404(request.user, receipt_id)
 
     if receipt.paper_total is None:
         messages.error(request, "Renseigne d’abord le montant total du ticket (caisse).")
@@ -230,8 +615,8 @@ def validate_receipt(request: HttpRequest, receipt_id: int) -> HttpResponse:
 
         if abs(delta) <= TOLERANCE:
             if receipt.shopping_list.closed_at is None:
-                receipt.shopping_list.closed_at = timezone.now()
-                receipt.shopping_list.save(update_fields=["closed_at"])
+                ShoppingList.objects.filter(id=receipt.shopping_list_id).bump_version(closed_at=timezone.now())
+                publish_list_event(receipt.shopping_list_id, "list", "closed", receipt.shopping_list_id)
 
             messages.success(request, f"Contrôle OK ✅ (écart {delta:.2f} €). Liste clôturée, ticket enregistré.")
             return redirect("receipt_list")
@@ -3,15 +3,131 @@ from __future__ import annotations
 from decimal import Decimal, InvalidOperation
 from typing import Any
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.db import transaction
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import Http404
+from django.middleware.csrf import get_token
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
 from django.views.decorators.http import require_POST
 
-from .models import ReferenceItem, ListItem, Receipt, UNIT_CHOICES, UNIT_UNIT
-from .views_common import user_household_or_404, get_or_create_open_list
+from .models import Household, ReferenceItem, ListItem, Receipt, ShoppingList, UNIT_CHOICES, UNIT_UNIT
+from .live import publish_list_event
+from .views_common import (
+    CONFLICT_MESSAGE,
+    alist,
+    auser_household_ids,
+    get_or_create_open_list,
+    lock_household,
+    user_household_or_404,
+    user_reference_item_or_404,
+    version_matches,
+)
+
+
+# Colonnes lues par reference_list.html
+REFERENCE_LIST_FIELDS = (
+    "name",
+    "aisle",
+    "is_active",
+    "is_selected",
+    "default_qty_value",
+    "default_unit",
+    "default_note",
+    "default_unit_price",
+    "version",
+)
+
+
+# Les clés de cache incluent catalog_version, incrémentée par trigger à toute écriture du catalogue
+# (migration 0024) : les anciens fragments deviennent inatteignables
+CATALOGUE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Fragments de reference_list.html communs aux membres du foyer : nom -> gabarit partiel
+CATALOGUE_FRAGMENTS = {
+    "catalogue_counts": "core/_catalogue_counts.html",
+    "catalogue_items": "core/_catalogue_items.html",
+}
+
+# Marque des formulaires dans les fragments en cache, remplacée après le rendu par le jeton
+# CSRF de la requête : un fragment sert à tous les navigateurs. Les textes des produits
+# sont échappés, ils ne peuvent pas la produire.
+CSRF_PLACEHOLDER = "<!--csrf-token-->"
+
+
+class _CataloguePage:
+    """
+    Données des fragments du catalogue, lues par aload() avant leur rendu (cache froid).
+
+    Une seule lecture du catalogue (colonnes utiles au template), triée par rayon puis nom :
+    partitions actifs / archivés, compteurs et groupes par rayon en découlent en un passage.
+    """
+
+    def __init__(self, household: Household):
+        self.household = household
+        self._loaded: dict[str, Any] | None = None
+
+    def _items(self):
+        return (
+            ReferenceItem.objects.filter(household=self.household)
+            .only(*REFERENCE_LIST_FIELDS)
+            .order_by("aisle", "name")
+        )
+
+    async def aload(self) -> None:
+        """
+        Lecture async du catalogue (vue async) : le rendu du gabarit ne touche plus la base.
+        """
+        self._loaded = self._partition(await alist(self._items()))
+
+    @property
+    def _partitions(self) -> dict[str, Any]:
+        # Jamais de lecture synchrone pendant le rendu (vue async)
+        if self._loaded is None:
+            raise RuntimeError("_CataloguePage : aload() doit être appelé avant le rendu")
+        return self._loaded
+
+    @staticmethod
+    def _partition(items) -> dict[str, Any]:
+        active_items: list[ReferenceItem] = []
+        archived_items: list[ReferenceItem] = []
+        selected_count = 0
+        for it in items:
+            if it.is_active:
+                active_items.append(it)
+                selected_count += it.is_selected
+            else:
+                archived_items.append(it)
+
+        # ✅ Groupes prêts à afficher (par rayon) : l'ordre (aisle, name) est conservé par la partition
+        return {
+            "active_count": len(active_items),
+            "selected_count": selected_count,
+            "grouped_active": _group_by_aisle(active_items),
+            "grouped_archived": _group_by_aisle(archived_items),
+        }
+
+    @property
+    def active_count(self) -> int:
+        return self._partitions["active_count"]
+
+    @property
+    def selected_count(self) -> int:
+        return self._partitions["selected_count"]
+
+    @property
+    def grouped_active(self) -> list[dict[str, Any]]:
+        return self._partitions["grouped_active"]
+
+    @property
+    def grouped_archived(self) -> list[dict[str, Any]]:
+        return self._partitions["grouped_archived"]
 
 
 def _parse_decimal_or_none(raw: str) -> Decimal | None:
@@ -86,93 +202,123 @@ def _group_by_aisle(items) -> list[dict[str, Any]]:
     return grouped
 
 
-@login_required
-def reference_list(request, household_id: int):
-    household = user_household_or_404(request.user, household_id)
+def _add_reference_item(request, household: Household):
+    name = (request.POST.get("name") or "").strip()
+    aisle = _normalize_aisle(request.POST.get("aisle"))
 
-    if request.method == "POST":
-        name = (request.POST.get("name") or "").strip()
-        aisle = _normalize_aisle(request.POST.get("aisle"))
+    qty_raw = request.POST.get("default_qty_value") or ""
+    unit = (request.POST.get("default_unit") or UNIT_UNIT).strip()
+    note = (request.POST.get("default_note") or "").strip()
 
-        qty_raw = request.POST.get("default_qty_value") or ""
-        unit = (request.POST.get("default_unit") or UNIT_UNIT).strip()
-        note = (request.POST.get("default_note") or "").strip()
+    price_raw = request.POST.get("default_unit_price") or ""
 
-        price_raw = request.POST.get("default_unit_price") or ""
+    default_qty_value = None
+    default_unit_price = None
 
+    try:
+        default_qty_value = _parse_decimal_or_none(qty_raw)
+    except (InvalidOperation, ValueError):
         default_qty_value = None
+
+    try:
+        default_unit_price = _parse_decimal_or_none(price_raw)
+    except (InvalidOperation, ValueError):
         default_unit_price = None
 
-        try:
-            default_qty_value = _parse_decimal_or_none(qty_raw)
-        except (InvalidOperation, ValueError):
-            default_qty_value = None
-
-        try:
-            default_unit_price = _parse_decimal_or_none(price_raw)
-        except (InvalidOperation, ValueError):
-            default_unit_price = None
-
-        default_qty_value, unit = _normalize_qty_unit(default_qty_value, unit)
-
-        if name:
-            ReferenceItem.objects.get_or_create(
-                household=household,
-                name=name,
-                defaults={
-                    "aisle": aisle,
-                    "default_qty_value": default_qty_value,
-                    "default_unit": unit,
-                    "default_note": note,
-                    "default_unit_price": default_unit_price,
-                },
-            )
+    default_qty_value, unit = _normalize_qty_unit(default_qty_value, unit)
+
+    if name:
+        ReferenceItem.objects.get_or_create(
+            household=household,
+            name=name,
+            defaults={
+                "aisle": aisle,
+                "default_qty_value": default_qty_value,
+                "default_unit": unit,
+                "default_note": note,
+                "default_unit_price": default_unit_price,
+            },
+        )
+
+    return redirect("reference_list", household_id=household.id)
+
+
+def _catalogue_fragment_key(name: str, household: Household) -> str:
+    return f"core:{name}:{household.id}:{household.catalog_version}"
 
-        return redirect("reference_list", household_id=household.id)
 
-    # ⚙️ Base queryset: tri pour groupement stable par rayon
-    items = ReferenceItem.objects.filter(household=household).order_by("is_active", "aisle", "name")
+async def _catalogue_fragments(household: Household) -> dict[str, str]:
+    """
+    HTML des fragments du catalogue, mis en cache par version du catalogue. Le catalogue est
+    lu (ORM async) dès qu'un fragment manque, et les fragments manquants rendus à partir
+    de cette lecture : le rendu de la page ne dépend plus de ce que contient le cache.
+    """
+    keys = {name: _catalogue_fragment_key(name, household) for name in CATALOGUE_FRAGMENTS}
+    cached = await cache.aget_many(keys.values())
+    fragments = {name: cached[key] for name, key in keys.items() if key in cached}
+
+    missing = [name for name in CATALOGUE_FRAGMENTS if name not in fragments]
+    if missing:
+        catalogue = _CataloguePage(household)
+        await catalogue.aload()
+        context = {
+            "catalogue": catalogue,
+            "aisle_choices": ReferenceItem.AISLE_CHOICES,
+            "unit_choices": UNIT_CHOICES,
+        }
+        for name in missing:
+            fragments[name] = render_to_string(CATALOGUE_FRAGMENTS[name], context)
+        await cache.aset_many({keys[name]: fragments[name] for name in missing}, CATALOGUE_CACHE_TIMEOUT)
+
+    return {name: mark_safe(html) for name, html in fragments.items()}
 
-    active_count = items.filter(is_active=True).count()
-    selected_count = items.filter(is_selected=True, is_active=True).count()
 
-    # ✅ Groupes prêts à afficher (par rayon)
-    active_items = items.filter(is_active=True).order_by("aisle", "name")
-    archived_items = items.filter(is_active=False).order_by("aisle", "name")
+@login_required
+async def reference_list(request, household_id: int):
+    household_ids = await auser_household_ids(request)
+    household = await Household.objects.for_household_ids(household_ids).filter(id=household_id).afirst()
+    if household is None:
+        raise Http404
 
-    grouped_active = _group_by_aisle(active_items)
-    grouped_archived = _group_by_aisle(archived_items)
+    if request.method == "POST":
+        return await sync_to_async(_add_reference_item)(request, household)
 
-    return render(
+    fragments = await _catalogue_fragments(household)
+    response = render(
         request,
         "core/reference_list.html",
         {
             "household": household,
-            # Compat: si ton template utilise encore "items"
-            "items": items,
-            "active_count": active_count,
-            "selected_count": selected_count,
+            **fragments,
             "aisle_choices": ReferenceItem.AISLE_CHOICES,
             "unit_choices": UNIT_CHOICES,
-            # ✅ Nouveaux contextes pour affichage par rayon
-            "grouped_active": grouped_active,
-            "grouped_archived": grouped_archived,
         },
     )
+    csrf_input = format_html('<input type="hidden" name="csrfmiddlewaretoken" value="{}">', get_token(request))
+    response.content = response.content.replace(CSRF_PLACEHOLDER.encode(), csrf_input.encode())
+    return response
+
+
+def _reference_conflict_response(request, item: ReferenceItem):
+    messages.error(request, CONFLICT_MESSAGE)
+    return redirect("reference_list", household_id=item.household_id)
 
 
 @login_required
 @require_POST
 def reference_toggle_active(request, item_id: int):
-    item = get_object_or_404(ReferenceItem, id=item_id)
-    user_household_or_404(request.user, item.household_id)
+    item = user_reference_item_or_404(request.user, item_id)
+    if not version_matches(request, item):
+        return _reference_conflict_response(request, item)
 
     item.is_active = not item.is_active
     if not item.is_active and item.is_selected:
         item.is_selected = False
-        item.save(update_fields=["is_active", "is_selected"])
+        saved = item.save_if_version(["is_active", "is_selected"])
     else:
-        item.save(update_fields=["is_active"])
+        saved = item.save_if_version(["is_active"])
+    if not saved:
+        return _reference_conflict_response(request, item)
 
     return redirect("reference_list", household_id=item.household_id)
 
@@ -180,23 +326,26 @@ def reference_toggle_active(request, item_id: int):
 @login_required
 @require_POST
 def reference_toggle_selected(request, item_id: int):
-    item = get_object_or_404(ReferenceItem, id=item_id)
-    user_household_or_404(request.user, item.household_id)
+    item = user_reference_item_or_404(request.user, item_id)
+    if not version_matches(request, item):
+        return _reference_conflict_response(request, item)
 
     if not item.is_active:
         messages.error(request, "Produit archivé : réactive-le pour pouvoir l’ajouter à la liste.")
         return redirect("reference_list", household_id=item.household_id)
 
     item.is_selected = not item.is_selected
-    item.save(update_fields=["is_selected"])
+    if not item.save_if_version(["is_selected"]):
+        return _reference_conflict_response(request, item)
     return redirect("reference_list", household_id=item.household_id)
 
 
 @login_required
 @require_POST
 def reference_update_details(request, item_id: int):
-    item = get_object_or_404(ReferenceItem, id=item_id)
-    user_household_or_404(request.user, item.household_id)
+    item = user_reference_item_or_404(request.user, item_id)
+    if not version_matches(request, item):
+        return _reference_conflict_response(request, item)
 
     qty_raw = request.POST.get("default_qty_value") or ""
     unit = (request.POST.get("default_unit") or UNIT_UNIT).strip()
@@ -225,7 +374,8 @@ def reference_update_details(request, item_id: int):
     item.aisle = aisle
     item.default_unit_price = unit_price
 
-    item.save(update_fields=["default_qty_value", "default_unit", "default_note", "aisle", "default_unit_price"])
+    if not item.save_if_version(["default_qty_value", "default_unit", "default_note", "aisle", "default_unit_price"]):
+        return _reference_conflict_response(request, item)
     messages.success(request, "Produit mis à jour.")
     return redirect("reference_list", household_id=item.household_id)
 
@@ -233,12 +383,17 @@ def reference_update_details(request, item_id: int):
 @login_required
 @require_POST
 def reference_delete(request, item_id: int):
-    item = get_object_or_404(ReferenceItem, id=item_id)
-    user_household_or_404(request.user, item.household_id)
+    item = user_reference_item_or_404(request.user, item_id)
+    if not version_matches(request, item):
+        return _reference_conflict_response(request, item)
 
     household_id = item.household_id
     name = item.name
-    item.delete()
+    with transaction.atomic():
+        # Réservé à la version lue (version suivante) : un produit modifié entre-temps n'est pas supprimé
+        if not ReferenceItem.objects.update_if_version(item, []):
+            return _reference_conflict_response(request, item)
+        item.delete()
 
     messages.success(request, f"Produit supprimé : {name}")
     return redirect("reference_list", household_id=household_id)
@@ -248,7 +403,7 @@ def reference_delete(request, item_id: int):
 @require_POST
 def reference_clear_selected(request, household_id: int):
     household = user_household_or_404(request.user, household_id)
-    ReferenceItem.objects.filter(household=household, is_selected=True).update(is_selected=False)
+    ReferenceItem.objects.filter(household=household, is_selected=True).bump_version(is_selected=False)
     messages.success(request, "Sélection vidée.")
     return redirect("reference_list", household_id=household.id)
 
@@ -263,13 +418,14 @@ def generate_shopping_list_from_reference(request, household_id: int):
     """
     household = user_household_or_404(request.user, household_id)
 
-    with transaction.atomic():
+    # Verrou du foyer : deux générations simultanées ne remplissent pas la liste deux fois
+    with lock_household(household):
         shopping_list = get_or_create_open_list(household)
 
         # Si un ticket existe déjà pour cette liste ouverte, on clôture et on en recrée une
         if Receipt.objects.filter(shopping_list=shopping_list).exists():
-            shopping_list.closed_at = timezone.now()
-            shopping_list.save(update_fields=["closed_at"])
+            ShoppingList.objects.filter(id=shopping_list.id).bump_version(closed_at=timezone.now())
+            publish_list_event(shopping_list.id, "list", "closed", shopping_list.id)
             shopping_list = get_or_create_open_list(household)
 
         # Reset items
@@ -298,5 +454,15 @@ def generate_shopping_list_from_reference(request, household_id: int):
 
         ListItem.objects.bulk_create(items_to_create)
 
+        # Items remplacés en bloc (tous décochés) : compteurs repartent de zéro
+        ShoppingList.objects.filter(id=shopping_list.id).bump_version(
+            item_count=len(items_to_create),
+            checked_count=0,
+            missing_estimate_count=0,
+            running_total=Decimal("0.00"),
+        )
+        # Items remplacés : les clients rechargent la liste plutôt que de rejouer chaque ligne
+        publish_list_event(shopping_list.id, "list", "reset", shopping_list.id)
+
     messages.success(request, "Liste générée (qté + prix unitaire copiés du catalogue).")
     return redirect("shopping_list_detail", shopping_list_id=shopping_list.id)
\ No newline at end of file
@@ -1,45 +1,161 @@
 from __future__ import annotations
 
+import asyncio
+import json
 from decimal import Decimal, InvalidOperation
+from typing import Callable
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import Http404, HttpRequest, HttpResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.db import transaction
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
 from django.views.decorators.http import require_POST
 
 from .models import (
     Household,
     ListItem,
-    Membership,
     ShoppingList,
     ReferenceItem,
     Receipt,
+    ReceiptItem,
     UNIT_CHOICES,
     UNIT_UNIT,
 )
-from .views_common import get_or_create_open_list
+from .live import publish_list_event
+from .views_common import (
+    CONFLICT_MESSAGE,
+    alist,
+    async_etag,
+    auser_household_ids,
+    decimal_or_none,
+    get_or_create_open_lists,
+    partial_error,
+    partial_format,
+    user_item_or_404,
+    user_list_or_404,
+    version_matches,
+    versioned_etag,
+)
 
+CLOSED_LIST_MESSAGE = "Cette liste est clôturée : aucune modification n'est autorisée."
 
-def _user_list_or_404(user, shopping_list_id: int) -> ShoppingList:
-    sl = get_object_or_404(ShoppingList, id=shopping_list_id)
-    if not Membership.objects.filter(user=user, household=sl.household).exists():
-        raise Http404("ShoppingList not found")
-    return sl
 
+def _closed_list_response(request: HttpRequest, shopping_list: ShoppingList, fmt: str | None) -> HttpResponse | None:
+    """
+    Réponse de refus si la liste est clôturée (409 en partiel, sinon message + redirection), None sinon.
+    """
+    if shopping_list.closed_at is None:
+        return None
+    if fmt:
+        return partial_error(fmt, CLOSED_LIST_MESSAGE, status=409)
+    messages.error(request, CLOSED_LIST_MESSAGE)
+    return redirect("shopping_list_detail", shopping_list_id=shopping_list.id)
 
-def _user_item_or_404(user, item_id: int) -> ListItem:
-    item = get_object_or_404(ListItem, id=item_id)
-    if not Membership.objects.filter(user=user, household=item.shopping_list.household).exists():
-        raise Http404("Item not found")
-    return item
 
+def _list_summary_context(shopping_list: ShoppingList) -> dict:
+    """
+    Contexte de core/_list_summary.html (liste chargée via with_summary()).
+    """
+    try:
+        receipt = shopping_list.receipt
+    except Receipt.DoesNotExist:
+        receipt = None
 
-def _reject_if_closed(request: HttpRequest, shopping_list: ShoppingList) -> bool:
-    if shopping_list.closed_at is not None:
-        messages.error(request, "Cette liste est clôturée : aucune modification n'est autorisée.")
-        return True
-    return False
+    return {
+        "shopping_list": shopping_list,
+        "receipt": receipt,
+        "is_closed": shopping_list.closed_at is not None,
+        "running_total": shopping_list.running_total,
+        "checked_count": shopping_list.checked_count,
+        "missing_estimate_count": shopping_list.missing_estimate_count,
+        "has_checked": shopping_list.checked_count > 0,
+    }
+
+
+def _list_item_json(item: ListItem) -> dict:
+    return {
+        "id": item.id,
+        "name": item.name,
+        "aisle": item.aisle,
+        "is_checked": item.is_checked,
+        "qty_value": decimal_or_none(item.qty_value),
+        "unit": item.unit,
+        "note": item.note,
+        "unit_price": decimal_or_none(item.unit_price),
+        "estimated_price": decimal_or_none(item.estimated_price),
+        "version": item.version,
+    }
+
+
+def _list_item_conflict_response(request: HttpRequest, fmt: str | None, item: ListItem) -> HttpResponse:
+    """
+    Écriture refusée, l'item a changé (ou disparu) depuis sa lecture : 409 avec son état
+    courant en partiel, sinon message + redirection vers la liste à jour.
+    """
+    if fmt == "json":
+        current = ListItem.objects.filter(id=item.id).first()
+        return JsonResponse(
+            {"error": CONFLICT_MESSAGE, "item": None if current is None else _list_item_json(current)}, status=409
+        )
+    if fmt:
+        return partial_error(fmt, CONFLICT_MESSAGE, status=409)
+    messages.error(request, CONFLICT_MESSAGE)
+    return redirect("shopping_list_detail", shopping_list_id=item.shopping_list_id)
+
+
+def _publish_item(shopping_list_id: int, item: ListItem | None, *, item_id: int | None = None) -> None:
+    """
+    Évènement temps réel après commit : état de l'item, ou suppression (item None, item_id).
+    """
+    if item is None:
+        publish_list_event(shopping_list_id, "list_item", "delete", item_id)
+    else:
+        publish_list_event(shopping_list_id, "list_item", "upsert", item.id, _list_item_json(item))
+
+
+def _list_item_partial_response(
+    request: HttpRequest,
+    fmt: str,
+    shopping_list_id: int,
+    item: ListItem | None,
+    *,
+    focus_price_id: int | None = None,
+) -> HttpResponse:
+    """
+    Ligne mise à jour (vide si supprimée) + résumé de la liste rafraîchi.
+    htmx : fragment de ligne + résumé en hx-swap-oob ; JSON : données + fragment de ligne.
+    """
+    shopping_list = ShoppingList.objects.select_related("household").with_summary().get(id=shopping_list_id)
+    context = {**_list_summary_context(shopping_list), "unit_choices": UNIT_CHOICES}
+    if focus_price_id is None:
+        focus_price_id = shopping_list.focus_missing_estimate_id
+
+    row_html = ""
+    if item is not None:
+        row_html = render_to_string("core/_list_item_row.html", {**context, "item": item}, request=request)
+
+    if fmt == "html":
+        summary_html = render_to_string("core/_list_summary.html", {**context, "oob": True}, request=request)
+        return HttpResponse(row_html + summary_html)
+
+    return JsonResponse({
+        "item": None if item is None else _list_item_json(item),
+        "summary": {
+            "item_count": shopping_list.item_count,
+            "checked_count": shopping_list.checked_count,
+            "missing_estimate_count": shopping_list.missing_estimate_count,
+            "running_total": decimal_or_none(shopping_list.running_total),
+            "has_checked": context["has_checked"],
+            "version": shopping_list.version,
+        },
+        "focus_price_id": focus_price_id,
+        "html": row_html,
+    })
 
 
 def _next_checked_missing_estimate(shopping_list: ShoppingList, exclude_id: int | None = None) -> ListItem | None:
@@ -49,6 +165,31 @@ def _next_checked_missing_estimate(shopping_list: ShoppingList, exclude_id: int
     return qs.order_by("aisle", "created_at", "id").first()
 
 
+def _apply_counters_delta(shopping_list_id: int, before: tuple | None, item: ListItem | None) -> None:
+    """
+    Reporte sur les compteurs de la liste le passage de l'item de `before` (None = ajout)
+    à son état courant (None = suppression).
+    """
+    old = before or (0, 0, 0, Decimal("0"))
+    new = item.counters_contribution() if item is not None else (0, 0, 0, Decimal("0"))
+    delta = [n - o for n, o in zip(new, old)]
+    # Toujours appelé (même delta nul) : incrémente aussi la version de la liste
+    ShoppingList.objects.filter(id=shopping_list_id).add_to_counters(
+        items=delta[0], checked=delta[1], missing=delta[2], total=delta[3]
+    )
+
+
+async def _shopping_list_etag(request: HttpRequest, shopping_list_id: int) -> str | None:
+    household_ids = await auser_household_ids(request)
+    version = await (
+        ShoppingList.objects.for_household_ids(household_ids)
+        .filter(id=shopping_list_id)
+        .values_list("version", flat=True)
+        .afirst()
+    )
+    return versioned_etag(request, f"list-{shopping_list_id}", version)
+
+
 def _parse_decimal_or_none(raw: str) -> Decimal | None:
     raw = (raw or "").strip().replace(",", ".")
     if raw == "":
@@ -64,69 +205,75 @@ def _normalize_qty_unit(qty: Decimal | None, unit: str) -> tuple[Decimal | None,
 
 
 @login_required
-def shopping_lists(request: HttpRequest) -> HttpResponse:
-    households = Household.objects.filter(memberships__user=request.user).distinct().order_by("name")
-    open_lists = [get_or_create_open_list(h) for h in households]
-    return render(request, "core/shopping_lists.html", {"lists": open_lists})
-
-
-@login_required
-def shopping_list_detail(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
-    shopping_list = _user_list_or_404(request.user, shopping_list_id)
-    items = shopping_list.items.all().order_by("is_checked", "aisle", "created_at", "id")
-
-    running_total = Decimal("0.00")
-    checked_count = 0
-    missing_estimate_count = 0
+async def shopping_lists(request: HttpRequest) -> HttpResponse:
+    # Foyers et listes ouvertes en parallèle : une requête chacun, quel que soit le nombre de foyers
+    household_ids = await auser_household_ids(request)
+    households, lists = await asyncio.gather(
+        alist(Household.objects.for_household_ids(household_ids).order_by("name")),
+        alist(ShoppingList.objects.for_household_ids(household_ids).filter(closed_at__isnull=True)),
+    )
+    open_by_household = {sl.household_id: sl for sl in lists}
 
-    for it in items:
-        if it.is_checked:
-            checked_count += 1
-            if it.estimated_price is None:
-                missing_estimate_count += 1
-            else:
-                running_total += it.estimated_price
+    missing = [h for h in households if h.id not in open_by_household]
+    if missing:
+        # Rare (nouveau foyer, liste juste clôturée) : création groupée, sans verrou
+        open_by_household.update(await sync_to_async(get_or_create_open_lists)(missing))
+    return render(request, "core/shopping_lists.html", {"lists": [open_by_household[h.id] for h in households]})
 
-    has_checked = checked_count > 0
 
-    try:
-        receipt = shopping_list.receipt
-    except Receipt.DoesNotExist:
-        receipt = None
-
-    is_closed = shopping_list.closed_at is not None
+@login_required
+@cache_control(private=True, no_cache=True)
+@async_etag(_shopping_list_etag)
+async def shopping_list_detail(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
+    # Résumé, ticket et item à compléter viennent de la même requête que la liste ; les items
+    # sont lus en parallèle (ignorés si la liste est inaccessible : 404)
+    household_ids = await auser_household_ids(request)
+    shopping_list, items = await asyncio.gather(
+        ShoppingList.objects.for_household_ids(household_ids).with_summary().filter(id=shopping_list_id).afirst(),
+        alist(
+            ListItem.objects.filter(shopping_list_id=shopping_list_id)
+            .order_by("is_checked", "aisle", "created_at", "id")
+        ),
+    )
+    if shopping_list is None:
+        raise Http404
 
     focus_price = (request.GET.get("focus_price") or "").strip()
-    focus_price_id = int(focus_price) if focus_price.isdigit() else None
-    if focus_price_id is None:
-        nxt = _next_checked_missing_estimate(shopping_list)
-        focus_price_id = nxt.id if nxt else None
+    focus_price_id = int(focus_price) if focus_price.isdigit() else shopping_list.focus_missing_estimate_id
 
     return render(
         request,
         "core/shopping_list_detail.html",
         {
-            "shopping_list": shopping_list,
+            **_list_summary_context(shopping_list),
             "items": items,
-            "running_total": running_total,
             "aisle_choices": ReferenceItem.AISLE_CHOICES,
             "unit_choices": UNIT_CHOICES,
-            "has_checked": has_checked,
-            "receipt": receipt,
-            "is_closed": is_closed,
-            "checked_count": checked_count,
-            "missing_estimate_count": missing_estimate_count,
             "focus_price_id": focus_price_id,
         },
     )
 
 
+def shopping_list_events(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
+    """
+    Flux Server-Sent Events de la liste : servi par le point d'entrée ASGI (live.list_events,
+    cf. config/asgi.py) avant d'arriver à Django. Une requête qui arrive ici vient d'un serveur
+    WSGI, où chaque flux ouvert occuperait un worker sans rien envoyer : 501.
+    """
+    return HttpResponse(
+        "Flux d'évènements disponible uniquement sous ASGI (daphne).",
+        status=501,
+        content_type="text/plain; charset=utf-8",
+    )
+
+
 @login_required
 @require_POST
 def add_list_item(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
-    shopping_list = _user_list_or_404(request.user, shopping_list_id)
-    if _reject_if_closed(request, shopping_list):
-        return redirect("shopping_list_detail", shopping_list_id=shopping_list.id)
+    shopping_list = user_list_or_404(request.user, shopping_list_id)
+    closed = _closed_list_response(request, shopping_list, None)
+    if closed is not None:
+        return closed
 
     name = (request.POST.get("name") or "").strip()
     aisle = (request.POST.get("aisle") or ReferenceItem.AISLE_GROCERY).strip()
@@ -153,18 +300,21 @@ def add_list_item(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
     qty, unit = _normalize_qty_unit(qty, unit)
 
     if name:
-        it = ListItem.objects.create(
-            shopping_list=shopping_list,
-            name=name,
-            aisle=aisle,
-            qty_value=qty,
-            unit=unit,
-            note=note,
-            unit_price=unit_price,
-            created_by=request.user,
-        )
-        it.recompute_estimated_price()
-        it.save(update_fields=["estimated_price"])
+        with transaction.atomic():
+            it = ListItem.objects.create(
+                shopping_list=shopping_list,
+                name=name,
+                aisle=aisle,
+                qty_value=qty,
+                unit=unit,
+                note=note,
+                unit_price=unit_price,
+                created_by=request.user,
+            )
+            it.recompute_estimated_price()
+            it.save(update_fields=["estimated_price"])
+            _apply_counters_delta(shopping_list.id, None, it)
+            _publish_item(shopping_list.id, it)
         messages.success(request, "Item ajouté.")
 
     return redirect("shopping_list_detail", shopping_list_id=shopping_list.id)
@@ -173,13 +323,30 @@ def add_list_item(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
 @login_required
 @require_POST
 def toggle_list_item(request: HttpRequest, item_id: int) -> HttpResponse:
-    item = _user_item_or_404(request.user, item_id)
-    if _reject_if_closed(request, item.shopping_list):
-        return redirect("shopping_list_detail", shopping_list_id=item.shopping_list_id)
-
-    new_state = not item.is_checked
-    item.set_checked(request.user, new_state)
-    item.save(update_fields=["is_checked", "checked_at", "checked_by"])
+    item = user_item_or_404(request.user, item_id)
+    fmt = partial_format(request)
+    closed = _closed_list_response(request, item.shopping_list, fmt)
+    if closed is not None:
+        return closed
+
+    if not version_matches(request, item):
+        return _list_item_conflict_response(request, fmt, item)
+
+    with transaction.atomic():
+        before = item.counters_contribution()
+        new_state = not item.is_checked
+        item.set_checked(request.user, new_state)
+        # Écriture conditionnelle, sans verrou : si un autre membre a coché entre-temps, conflit
+        # (le delta des compteurs part donc toujours de l'état remplacé)
+        if not ListItem.objects.update_if_version(item, ["is_checked", "checked_at", "checked_by"]):
+            return _list_item_conflict_response(request, fmt, item)
+        _apply_counters_delta(item.shopping_list_id, before, item)
+        _publish_item(item.shopping_list_id, item)
+
+    if fmt:
+        return _list_item_partial_response(
+            request, fmt, item.shopping_list_id, item, focus_price_id=item.id if new_state else None
+        )
 
     if new_state:
         # focus sur la saisie du prix unitaire
@@ -195,9 +362,11 @@ def update_item_details(request: HttpRequest, item_id: int) -> HttpResponse:
     ✅ Modifie : quantité + unité + note + prix unitaire
     ✅ Recalcule estimated_price = qty × unit_price
     """
-    item = _user_item_or_404(request.user, item_id)
-    if _reject_if_closed(request, item.shopping_list):
-        return redirect("shopping_list_detail", shopping_list_id=item.shopping_list_id)
+    item = user_item_or_404(request.user, item_id)
+    fmt = partial_format(request)
+    closed = _closed_list_response(request, item.shopping_list, fmt)
+    if closed is not None:
+        return closed
 
     qty_raw = request.POST.get("qty_value") or ""
     unit = (request.POST.get("unit") or UNIT_UNIT).strip()
@@ -219,16 +388,30 @@ def update_item_details(request: HttpRequest, item_id: int) -> HttpResponse:
 
     qty, unit = _normalize_qty_unit(qty, unit)
 
-    item.qty_value = qty
-    item.unit = unit
-    item.note = note
-    item.unit_price = unit_price
+    if not version_matches(request, item):
+        return _list_item_conflict_response(request, fmt, item)
 
-    item.recompute_estimated_price()
-    item.save(update_fields=["qty_value", "unit", "note", "unit_price", "estimated_price"])
+    shopping_list = item.shopping_list
+    with transaction.atomic():
+        before = item.counters_contribution()
+
+        item.qty_value = qty
+        item.unit = unit
+        item.note = note
+        item.unit_price = unit_price
+
+        item.recompute_estimated_price()
+        if not ListItem.objects.update_if_version(item, ITEM_DETAIL_FIELDS):
+            return _list_item_conflict_response(request, fmt, item)
+        _apply_counters_delta(item.shopping_list_id, before, item)
+        _publish_item(item.shopping_list_id, item)
+
+    if fmt:
+        # focus_price_id par défaut : premier item coché sans prix (résumé de la liste)
+        return _list_item_partial_response(request, fmt, item.shopping_list_id, item)
 
     # UX: après saisie, focus sur le prochain item coché sans prix
-    nxt = _next_checked_missing_estimate(item.shopping_list, exclude_id=item.id)
+    nxt = _next_checked_missing_estimate(shopping_list, exclude_id=item.id)
     if nxt:
         return redirect(f"/shopping-lists/{item.shopping_list_id}/?focus_price={nxt.id}")
 
@@ -238,11 +421,316 @@ def update_item_details(request: HttpRequest, item_id: int) -> HttpResponse:
 @login_required
 @require_POST
 def delete_list_item(request: HttpRequest, item_id: int) -> HttpResponse:
-    item = _user_item_or_404(request.user, item_id)
-    if _reject_if_closed(request, item.shopping_list):
-        return redirect("shopping_list_detail", shopping_list_id=item.shopping_list_id)
+    item = user_item_or_404(request.user, item_id)
+    fmt = partial_format(request)
+    closed = _closed_list_response(request, item.shopping_list, fmt)
+    if closed is not None:
+        return closed
+
+    if not version_matches(request, item):
+        return _list_item_conflict_response(request, fmt, item)
 
     shopping_list_id = item.shopping_list_id
-    item.delete()
+    with transaction.atomic():
+        before = item.counters_contribution()
+        # La ligne de ticket éventuelle part en cascade : on retire sa part des totaux du ticket.
+        # Item et ligne sont d'abord réservés (version suivante, conditionnelle à la version lue) :
+        # les deltas partent bien des valeurs supprimées
+        line = ReceiptItem.objects.filter(list_item=item).first()
+        if not ListItem.objects.update_if_version(item, []) or (
+            line is not None and not ReceiptItem.objects.update_if_version(line, [])
+        ):
+            transaction.set_rollback(True)
+            return _list_item_conflict_response(request, fmt, item)
+        item.delete()
+        _apply_counters_delta(shopping_list_id, before, None)
+        _publish_item(shopping_list_id, None, item_id=item_id)
+        if line is not None:
+            estimated, actual, missing = line.totals_contribution()
+            Receipt.objects.filter(id=line.receipt_id).add_to_totals(
+                estimated=-estimated, actual=-actual, missing=-missing
+            )
+
+    if fmt:
+        return _list_item_partial_response(request, fmt, shopping_list_id, None)
+
     messages.success(request, "Item supprimé.")
-    return redirect("shopping_list_detail", shopping_list_id=shopping_list_id)
\ No newline at end of file
+    return redirect("shopping_list_detail", shopping_list_id=shopping_list_id)
+
+
+# =========================================================
+# Opérations groupées sur les items d'une liste
+# =========================================================
+BATCH_OPERATIONS = ("check", "uncheck", "update", "delete")
+BATCH_MAX_OPERATIONS = 500
+ITEM_DETAIL_FIELDS = ["qty_value", "unit", "note", "unit_price", "estimated_price"]
+# Colonnes écrites par un lot (état final de chaque item touché, en un bulk_update)
+LIST_ITEM_WRITE_FIELDS = ["is_checked", "checked_at", "checked_by", *ITEM_DETAIL_FIELDS, "version"]
+
+
+def _submitted_operations(request: HttpRequest) -> list[dict] | None:
+    """
+    Opérations depuis un corps JSON {"operations": [{"op": "check", "id": 12, "version": 3}, ...]}
+    ou un formulaire op=<op> & item=<id> (répétable, même opération pour chaque item) avec,
+    facultatif, version_<id>. None si la requête est mal formée.
+    """
+    if request.content_type == "application/json":
+        try:
+            operations = json.loads(request.body or b"{}")["operations"]
+        except (ValueError, KeyError, TypeError):
+            return None
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            return None
+        return operations
+
+    op = (request.POST.get("op") or "").strip()
+    operations = []
+    for raw in request.POST.getlist("item"):
+        operation = {"op": op, "id": raw}
+        if request.POST.get(f"version_{raw}"):
+            operation["version"] = request.POST[f"version_{raw}"]
+        operations.append(operation)
+    return operations
+
+
+def _apply_update_operation(item: ListItem, operation: dict) -> None:
+    """
+    Applique les champs fournis (qty_value / unit / note / unit_price) ; ValueError si invalide.
+    """
+    qty = item.qty_value
+    unit = item.unit
+    if "qty_value" in operation:
+        qty = _parse_decimal_or_none(str(operation["qty_value"] or ""))
+    if "unit" in operation:
+        unit = str(operation["unit"] or UNIT_UNIT).strip()
+        if unit not in dict(UNIT_CHOICES):
+            raise ValueError(f"Unité inconnue : {unit}")
+    if "unit_price" in operation:
+        item.unit_price = _parse_decimal_or_none(str(operation["unit_price"] or ""))
+    if "note" in operation:
+        item.note = str(operation["note"] or "").strip()
+
+    item.qty_value, item.unit = _normalize_qty_unit(qty, unit)
+    item.recompute_estimated_price()
+
+
+class _VersionConflict(Exception):
+    """
+    Écriture conditionnelle qui n'a pas touché toutes ses lignes : annule le point de sauvegarde.
+    changed_item_ids(), appelé après l'annulation, donne les items qui ont changé depuis leur lecture.
+    """
+
+    def __init__(self, model, versions: dict[int, int], item_ids: dict[int, int]):
+        super().__init__()
+        self.model = model
+        self.versions = versions
+        self.item_ids = item_ids
+
+    def changed_item_ids(self) -> set[int]:
+        return {self.item_ids[pk] for pk in self.model.objects.changed_versions(self.versions)}
+
+
+def _replay_list_item_operations(
+    user, items: dict[int, ListItem], operations: list[dict], conflicted: set[int], now
+) -> tuple[list[dict], set[int]]:
+    """
+    Rejoue les opérations en mémoire sur les items lus. Retourne (résultats, ids supprimés).
+    """
+    results: list[dict] = []
+    deleted: set[int] = set()
+    read_versions = {item_id: it.version for item_id, it in items.items()}
+
+    for index, operation in enumerate(operations):
+        op = operation.get("op")
+        raw_id = str(operation.get("id", ""))
+        item = items.get(int(raw_id)) if raw_id.isdigit() else None
+        result = {"index": index, "op": op, "id": item.id if item else operation.get("id")}
+        results.append(result)
+
+        if op not in BATCH_OPERATIONS:
+            result.update(status="error", error=f"Opération inconnue : {op}")
+            continue
+        if item is None or item.id in deleted:
+            result.update(status="error", error="Item introuvable sur cette liste.")
+            continue
+        expected = str(operation.get("version", ""))
+        if item.id in conflicted or (expected.isdigit() and int(expected) != read_versions[item.id]):
+            result.update(status="conflict", error="Item modifié entre-temps.")
+            continue
+
+        if op in ("check", "uncheck"):
+            checked = op == "check"
+            if item.is_checked == checked:
+                result["status"] = "noop"
+                continue
+            item.set_checked(user, checked, at=now)
+        elif op == "update":
+            try:
+                _apply_update_operation(item, operation)
+            except (InvalidOperation, ValueError) as e:
+                result.update(status="error", error=str(e) or "Valeur invalide.")
+                continue
+        else:
+            deleted.add(item.id)
+        result["status"] = "ok"
+
+    return results, deleted
+
+
+def _write_list_item_operations(
+    shopping_list: ShoppingList,
+    items: dict[int, ListItem],
+    touched: set[int],
+    deleted: set[int],
+    before: dict[int, tuple],
+) -> None:
+    """
+    Écrit l'état final des items touchés : un bulk_update conditionnel à la version lue de
+    chaque item (les supprimés y sont réservés), puis un DELETE et un delta sur les compteurs.
+    _VersionConflict si une ligne a changé entre-temps.
+    """
+    changed = [items[item_id] for item_id in sorted(touched)]
+    if changed:
+        read_versions = {it.id: it.version for it in changed}
+        at_read_versions = ListItem.objects.at_versions(changed)
+        for it in changed:
+            it.version += 1
+        if at_read_versions.bulk_update(changed, LIST_ITEM_WRITE_FIELDS) != len(changed):
+            raise _VersionConflict(ListItem, read_versions, {item_id: item_id for item_id in read_versions})
+
+    if deleted:
+        # Les lignes de ticket partent en cascade : on retire leur part des totaux du ticket,
+        # calculée sur les valeurs lues (lignes réservées à leur version lue, comme les items)
+        lines = list(ReceiptItem.objects.filter(list_item_id__in=deleted))
+        if lines and ReceiptItem.objects.at_versions(lines).bump_version() != len(lines):
+            raise _VersionConflict(
+                ReceiptItem, {line.id: line.version for line in lines}, {line.id: line.list_item_id for line in lines}
+            )
+        receipt_deltas: dict[int, list] = {}
+        for line in lines:
+            acc = receipt_deltas.setdefault(line.receipt_id, [Decimal("0"), Decimal("0"), 0])
+            for i, v in enumerate(line.totals_contribution()):
+                acc[i] += v
+        ListItem.objects.filter(id__in=deleted).delete()
+        for receipt_id, (estimated, actual, missing) in receipt_deltas.items():
+            Receipt.objects.filter(id=receipt_id).add_to_totals(
+                estimated=-estimated, actual=-actual, missing=-missing
+            )
+
+    if not touched:
+        return
+
+    zero = (0, 0, 0, Decimal("0"))
+    delta = [0, 0, 0, Decimal("0")]
+    for item_id in touched:
+        after = zero if item_id in deleted else items[item_id].counters_contribution()
+        for i, (n, o) in enumerate(zip(after, before[item_id])):
+            delta[i] += n - o
+    ShoppingList.objects.filter(id=shopping_list.id).add_to_counters(
+        items=delta[0], checked=delta[1], missing=delta[2], total=delta[3]
+    )
+
+    for item_id in sorted(touched):
+        _publish_item(shopping_list.id, None if item_id in deleted else items[item_id], item_id=item_id)
+
+
+def apply_list_item_operations(
+    user,
+    shopping_list: ShoppingList,
+    operations: list[dict],
+    *,
+    conflicts: Callable[[set[int]], set[int]] | None = None,
+) -> tuple[list[dict], dict[int, ListItem], set[int]]:
+    """
+    Applique une suite d'opérations (check / uncheck / update / delete) aux items d'une liste,
+    dans une transaction et sans verrou : les opérations sont rejouées en mémoire sur les items
+    lus, puis l'état final est écrit en une écriture conditionnelle à la version lue de chaque
+    item (un bulk_update, un DELETE) avec un seul delta sur les compteurs.
+    Chaque opération reçoit son propre résultat (ok / noop / error / conflict) ; une opération
+    invalide n'empêche pas les autres. Une opération peut porter la version de l'item lue par
+    le client ("version") : si l'item a changé depuis, elle est en conflit. Un item modifié
+    entre la lecture et l'écriture met ses opérations en conflit et le lot est rejoué sans lui.
+
+    conflicts(ids lus) -> ids en conflit : leurs opérations sont refusées.
+    Retourne (résultats, items par id, ids supprimés).
+    """
+    ids = {int(op["id"]) for op in operations if str(op.get("id", "")).isdigit()}
+    now = timezone.now()
+    conflicted: set[int] = set()
+
+    with transaction.atomic():
+        while True:
+            items = {it.id: it for it in ListItem.objects.filter(shopping_list=shopping_list, id__in=ids)}
+            if conflicts is not None:
+                conflicted |= conflicts(set(items))
+            before = {item_id: it.counters_contribution() for item_id, it in items.items()}
+
+            results, deleted = _replay_list_item_operations(user, items, operations, conflicted, now)
+            touched = {r["id"] for r in results if r["status"] == "ok"}
+            try:
+                with transaction.atomic():
+                    _write_list_item_operations(shopping_list, items, touched, deleted, before)
+                break
+            except _VersionConflict as conflict:
+                # Les items qui ont changé sont écartés : l'ensemble ne fait que grandir, la boucle s'arrête
+                conflicted |= conflict.changed_item_ids() or set(conflict.item_ids.values())
+
+    return results, items, deleted
+
+
+@login_required
+@require_POST
+def batch_list_items(request: HttpRequest, shopping_list_id: int) -> HttpResponse:
+    """
+    Opérations groupées sur les items d'une liste (cf. apply_list_item_operations).
+    """
+    shopping_list = user_list_or_404(request.user, shopping_list_id)
+    fmt = partial_format(request)
+    closed = _closed_list_response(request, shopping_list, fmt)
+    if closed is not None:
+        return closed
+
+    operations = _submitted_operations(request)
+    if operations is None or len(operations) > BATCH_MAX_OPERATIONS:
+        message = f"Requête invalide (au plus {BATCH_MAX_OPERATIONS} opérations)."
+        if fmt:
+            return partial_error(fmt, message, status=400)
+        messages.error(request, message)
+        return redirect("shopping_list_detail", shopping_list_id=shopping_list.id)
+
+    results, items, deleted = apply_list_item_operations(request.user, shopping_list, operations)
+
+    done = sum(1 for r in results if r["status"] == "ok")
+    failed = [r for r in results if r["status"] == "error"]
+
+    if not fmt:
+        if done:
+            messages.success(request, f"{done} opération(s) appliquée(s).")
+        for r in failed:
+            messages.error(request, f"Item {r['id']} : {r['error']}")
+        return redirect("shopping_list_detail", shopping_list_id=shopping_list.id)
+
+    shopping_list = ShoppingList.objects.select_related("household").with_summary().get(id=shopping_list.id)
+    context = {**_list_summary_context(shopping_list), "unit_choices": UNIT_CHOICES}
+    touched = [items[r["id"]] for r in results if r["status"] == "ok" and r["id"] not in deleted]
+    touched = list({it.id: it for it in touched}.values())
+
+    if fmt == "html":
+        oob = {**context, "oob": True}
+        parts = [render_to_string("core/_list_item_row.html", {**oob, "item": it}, request=request) for it in touched]
+        parts += [f'<div id="item-{item_id}" hx-swap-oob="delete"></div>' for item_id in sorted(deleted)]
+        parts.append(render_to_string("core/_list_summary.html", oob, request=request))
+        return HttpResponse("".join(parts))
+
+    return JsonResponse({
+        "results": results,
+        "summary": {
+            "item_count": shopping_list.item_count,
+            "checked_count": shopping_list.checked_count,
+            "missing_estimate_count": shopping_list.missing_estimate_count,
+            "running_total": decimal_or_none(shopping_list.running_total),
+            "has_checked": context["has_checked"],
+            "version": shopping_list.version,
+        },
+        "focus_price_id": shopping_list.focus_missing_estimate_id,
+    })